@@ -4,14 +4,15 @@ import logging
 import os
 import pathlib
 import threading
-from collections import OrderedDict
-from functools import lru_cache
 
 import gi
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import Gdk, GdkPixbuf, Gio, GLib, Gtk, Pango
 
+from ks_includes.functions import get_cache_dir
+from ks_includes.image_cache import ImageCache
+from ks_includes.thumbnail_cache import ThumbnailCache
 from ks_includes.widgets.scroll import CustomScrolledWindow
 
 
@@ -36,15 +37,49 @@ def format_label(widget, lines=2):
         label.set_lines(lines)
 
 
+class ImageRequest:
+    """An image load waiting for a worker, the lowest priority value runs first
+
+    priority may be a callable, so callers can follow the distance of a widget
+    from the viewport without re-submitting the request.
+    """
+
+    def __init__(self, load, callback, priority=0):
+        self.load = load
+        self.callback = callback
+        self.priority = priority
+        self.cancelled = False
+
+    def get_priority(self):
+        return self.priority() if callable(self.priority) else self.priority
+
+    def cancel(self):
+        self.cancelled = True
+
+
 class KlippyGtk:
     labels = {}
+    IMAGE_WORKERS = 4
 
     def __init__(self, screen):
         self.screen = screen
-        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
-        self._http_pixbuf_cache = OrderedDict()
-        self._http_pixbuf_cache_lock = threading.Lock()
-        self._http_pixbuf_cache_max = 500
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.IMAGE_WORKERS)
+        self._image_requests = []
+        self._image_lock = threading.Lock()
+        self._image_workers = 0
+        self.image_stats = {"completed": 0, "cancelled": 0, "wasted": 0}
+        image_cache_size = screen._config.get_main_config().getint("image_cache_size", 32)
+        # Theme icons are shown all the time, scrolling thumbnails should not evict them
+        self.image_cache = ImageCache(image_cache_size * 1024 * 1024, protected=("icon",))
+        self.thumbnail_cache = None
+        cache_size = screen._config.get_main_config().getint("thumbnail_cache_size", 50)
+        if cache_size > 0:
+            try:
+                self.thumbnail_cache = ThumbnailCache(
+                    get_cache_dir("thumbnails"), cache_size * 1024 * 1024
+                )
+            except OSError as e:
+                logging.error(f"Thumbnail cache disabled: {e}")
         self.themedir = os.path.join(
             pathlib.Path(__file__).parent.resolve().parent, "styles", screen.theme, "images"
         )
@@ -59,6 +94,8 @@ class KlippyGtk:
         self.update_layout(screen.width, screen.height, screen.vertical_mode)
 
     def update_layout(self, width, height, vertical_mode):
+        # Icons are cached by size, the ones of the previous layout won't be used again
+        self.image_cache.clear("icon")
         self.width = width
         self.height = height
         self.ultra_tall = (height / width) >= 3
@@ -140,6 +177,7 @@ class KlippyGtk:
         return Gtk.Image.new_from_pixbuf(pixbuf) if pixbuf is not None else Gtk.Image()
 
     def update_themedir(self, theme):
+        self.image_cache.clear("icon")
         self.themedir = os.path.join(
             pathlib.Path(__file__).parent.resolve().parent, "styles", theme, "images"
         )
@@ -149,20 +187,30 @@ class KlippyGtk:
         height = height if height is not None else self.img_height
         return self._PixbufFromIcon(filename, self.themedir, int(width), int(height))
 
-    @staticmethod
-    @lru_cache(maxsize=500)
-    def _PixbufFromIcon(filename, themedir, width, height):
+    def _PixbufFromIcon(self, filename, themedir, width, height):
+        cache_key = ("icon", filename, themedir, width, height)
+        pixbuf = self.image_cache.get(cache_key)
+        if pixbuf is not None:
+            return pixbuf
         filename = os.path.join(themedir, filename)
         for ext in ["svg", "png"]:
             file = f"{filename}.{ext}"
-            pixbuf = KlippyGtk.PixbufFromFile(file, width, height) if os.path.exists(file) else None
+            pixbuf = self._PixbufFromFile(file, width, height) if os.path.exists(file) else None
             if pixbuf is not None:
+                self.image_cache.put(cache_key, pixbuf)
                 return pixbuf
         return None
 
+    def PixbufFromFile(self, filename, width=-1, height=-1):
+        cache_key = ("file", filename, int(width), int(height))
+        pixbuf = self.image_cache.get(cache_key)
+        if pixbuf is None:
+            pixbuf = self._PixbufFromFile(filename, width, height)
+            self.image_cache.put(cache_key, pixbuf)
+        return pixbuf
+
     @staticmethod
-    @lru_cache(maxsize=500)
-    def PixbufFromFile(filename, width=-1, height=-1):
+    def _PixbufFromFile(filename, width=-1, height=-1):
         try:
             return GdkPixbuf.Pixbuf.new_from_file_at_size(filename, int(width), int(height))
         except Exception as e:
@@ -171,37 +219,46 @@ class KlippyGtk:
             return None
 
     def clear_file_image_cache(self):
-        KlippyGtk.PixbufFromFile.cache_clear()
-        with self._http_pixbuf_cache_lock:
-            self._http_pixbuf_cache.clear()
-
-    def _http_pixbuf_cache_put(self, cache_key, pixbuf):
-        with self._http_pixbuf_cache_lock:
-            if cache_key in self._http_pixbuf_cache:
-                self._http_pixbuf_cache.move_to_end(cache_key)
-            self._http_pixbuf_cache[cache_key] = pixbuf
-            while len(self._http_pixbuf_cache) > self._http_pixbuf_cache_max:
-                self._http_pixbuf_cache.popitem(last=False)
-
-    def _http_pixbuf_cache_get(self, cache_key):
-        with self._http_pixbuf_cache_lock:
-            if cache_key in self._http_pixbuf_cache:
-                self._http_pixbuf_cache.move_to_end(cache_key)
-                return self._http_pixbuf_cache[cache_key]
+        self.image_cache.clear("file", "http")
+
+    def PixbufFromCache(self, thumbnail_key, width, height):
+        if thumbnail_key is None or self.thumbnail_cache is None:
+            return None
+        path = self.thumbnail_cache.get(thumbnail_key, width, height)
+        if path is None:
             return None
+        try:
+            return GdkPixbuf.Pixbuf.new_from_file(path)
+        except GLib.Error as e:
+            logging.debug(f"Unable to load cached thumbnail {path}: {e}")
+            return None
+
+    def store_thumbnail(self, thumbnail_key, width, height, pixbuf):
+        if thumbnail_key is not None and self.thumbnail_cache is not None and pixbuf is not None:
+            self.thumbnail_cache.put(thumbnail_key, width, height, pixbuf)
+
+    def evict_thumbnail(self, path):
+        if self.thumbnail_cache is not None:
+            self.thumbnail_cache.evict(path)
 
-    def PixbufFromHttpAsync(self, resource, width, height, callback):
-        cache_key = (resource, int(width), int(height))
-        cached = self._http_pixbuf_cache_get(cache_key)
+    def PixbufFromHttpAsync(
+        self, resource, width, height, callback, thumbnail_key=None, priority=0
+    ):
+        cache_key = ("http", resource, int(width), int(height))
+        cached = self.image_cache.get(cache_key)
         if cached is not None:
-            GLib.idle_add(callback, cached)
-            return
+            request = ImageRequest(None, callback, priority)
+            GLib.idle_add(self._image_done, request, cached)
+            return request
 
         def _load():
+            pixbuf = self.PixbufFromCache(thumbnail_key, width, height)
+            if pixbuf is not None:
+                self.image_cache.put(cache_key, pixbuf)
+                return pixbuf
             response = self.screen.restApi.get_thumbnail_stream(resource)
             if response is False:
-                GLib.idle_add(callback, None)
-                return
+                return None
             stream = Gio.MemoryInputStream.new_from_data(response, None)
             try:
                 pixbuf = GdkPixbuf.Pixbuf.new_from_stream_at_scale(
@@ -210,15 +267,59 @@ class KlippyGtk:
             except Exception as e:
                 logging.exception(e)
                 pixbuf = None
-                stream.close_async(2)
-                GLib.idle_add(callback, pixbuf)
-                return
             stream.close_async(2)
             if pixbuf is not None:
-                self._http_pixbuf_cache_put(cache_key, pixbuf)
-            GLib.idle_add(callback, pixbuf)
+                self.image_cache.put(cache_key, pixbuf)
+                self.store_thumbnail(thumbnail_key, width, height, pixbuf)
+            return pixbuf
+
+        return self.submit_image(_load, callback, priority)
+
+    def submit_image(self, load, callback=None, priority=0):
+        request = ImageRequest(load, callback, priority)
+        with self._image_lock:
+            self._image_requests.append(request)
+            start_worker = self._image_workers < self.IMAGE_WORKERS
+            if start_worker:
+                self._image_workers += 1
+        if start_worker:
+            self._executor.submit(self._image_worker)
+        return request
+
+    def _image_worker(self):
+        while True:
+            with self._image_lock:
+                pending = [r for r in self._image_requests if not r.cancelled]
+                self.image_stats["cancelled"] += len(self._image_requests) - len(pending)
+                if not pending:
+                    self._image_requests.clear()
+                    self._image_workers -= 1
+                    return
+                request = min(pending, key=ImageRequest.get_priority)
+                pending.remove(request)
+                self._image_requests = pending
+            try:
+                pixbuf = request.load()
+            except Exception as e:
+                logging.exception(e)
+                pixbuf = None
+            GLib.idle_add(self._image_done, request, pixbuf)
 
-        self._executor.submit(_load)
+    def _image_done(self, request, pixbuf):
+        if request.cancelled:
+            # Cancelled while it was being decoded
+            self.image_stats["wasted"] += 1
+        else:
+            self.image_stats["completed"] += 1
+            if request.callback:
+                request.callback(pixbuf)
+        return False
+
+    def get_image_stats(self):
+        with self._image_lock:
+            queued = len(self._image_requests)
+            workers = self._image_workers
+        return {"queued": queued, "workers": workers, **self.image_stats}
 
     def Button(
         self,
@@ -1,10 +1,20 @@
 import logging
-
-import requests
+import threading
 
 
 class KlippyRest:
-    def __init__(self, ip, port=7125, api_key=False, path="", ssl=None):
+    def __init__(
+        self,
+        ip,
+        port=7125,
+        api_key=False,
+        path="",
+        ssl=None,
+        retries=2,
+        timeout=4,
+        files_timeout=10,
+        pool_size=8,
+    ):
         self.ip = ip
         self.port = port
         self.path = f"/{path}" if path else ""
@@ -12,6 +22,15 @@ class KlippyRest:
         self.api_key = api_key
         self.ssl = int(self.port) in {443, 7130} if ssl is None else bool(ssl)
         self.status = ""
+        self.retries = max(int(retries), 0)
+        self.timeout = timeout
+        # Timeouts in seconds by endpoint prefix, the longest matching prefix wins
+        self.timeouts = {"server/files/": files_timeout}
+        # Pooled sessions keep connections alive between requests, one per retry count.
+        # They are shared with the thumbnail loader threads so the pools are sized for them
+        self.pool_size = pool_size
+        self.sessions = {}
+        self._lock = threading.Lock()
 
     @property
     def endpoint(self):
@@ -24,14 +43,58 @@ class KlippyRest:
     def get_thumbnail_stream(self, thumbnail):
         return self.send_request(f"server/files/gcodes/{thumbnail}", json=False)
 
+    def get_timeout(self, method):
+        prefix = max((p for p in self.timeouts if method.startswith(p)), key=len, default=None)
+        return self.timeout if prefix is None else self.timeouts[prefix]
+
+    def get_session(self, retries=None):
+        if retries is None:
+            # Every attempt made on the main loop blocks the UI, so only other threads retry
+            retries = 0 if threading.current_thread() is threading.main_thread() else self.retries
+        with self._lock:
+            if retries not in self.sessions:
+                self.sessions[retries] = self._new_session(retries)
+            return self.sessions[retries]
+
+    def _new_session(self, retries):
+        # requests takes a while to import, it's left out of the startup until a connection
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        if self.api_key:
+            session.headers.update({"x-api-key": self.api_key})
+        retry = Retry(
+            total=retries,
+            read=0,
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
     def _do_request(
-        self, method, request_method, data=None, json=None, json_response=True, timeout=3
+        self,
+        method,
+        request_method,
+        data=None,
+        json=None,
+        json_response=True,
+        timeout=None,
+        retries=None,
     ):
         url = f"{self.endpoint}/{method}"
-        headers = {"x-api-key": self.api_key} if self.api_key else {}
+        if timeout is None:
+            timeout = self.get_timeout(method)
         try:
-            callee = getattr(requests, request_method)
-            response = callee(url, json=json, data=data, headers=headers, timeout=timeout)
+            response = self.get_session(retries).request(
+                request_method, url, json=json, data=data, timeout=timeout
+            )
             response.raise_for_status()
             self.status = ""
             return response.json() if json_response else response.content
@@ -42,6 +105,13 @@ class KlippyRest:
     def post_request(self, method, data=None, json=None, json_response=True):
         return self._do_request(method, "post", data, json, json_response)
 
-    def send_request(self, method, json=True, timeout=4):
-        res = self._do_request(method, "get", json_response=json, timeout=timeout)
+    def send_request(self, method, json=True, timeout=None, retries=None):
+        """Failed GETs are retried off the main loop, unless `retries` gives the count"""
+        res = self._do_request(method, "get", json_response=json, timeout=timeout, retries=retries)
         return self.process_response(res) if json else res
+
+    def close(self):
+        with self._lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
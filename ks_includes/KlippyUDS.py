@@ -1,6 +1,5 @@
 #!/usr/bin/python
 
-import json
 import logging
 import os
 import socket
@@ -11,7 +10,40 @@ import gi
 gi.require_version("Gtk", "3.0")
 from gi.repository import GLib
 
+from ks_includes import json_codec
 from ks_includes.MoonrakerApi import MoonrakerApi
+from ks_includes.status_dispatcher import StatusDispatcher
+
+
+class FrameBuffer:
+    """Splits a byte stream into delimited frames, examining each byte once"""
+
+    def __init__(self, delimiter=b"\x03"):
+        self._delimiter = delimiter
+        self._buffer = bytearray()
+        self._scan = 0
+
+    def clear(self):
+        self._buffer.clear()
+        self._scan = 0
+
+    def feed(self, data):
+        buffer = self._buffer
+        buffer += data
+        frames = []
+        start = 0
+        with memoryview(buffer) as view:
+            while (end := buffer.find(self._delimiter, self._scan)) != -1:
+                if end > start:
+                    frame = bytes(view[start:end])
+                    if not frame.isspace():
+                        frames.append(frame)
+                start = self._scan = end + len(self._delimiter)
+        # Drop the consumed frames once per chunk and resume scanning where it stopped
+        if start:
+            del buffer[:start]
+        self._scan = max(len(buffer) - len(self._delimiter) + 1, 0)
+        return frames
 
 
 class KlippyUDS(threading.Thread):
@@ -19,18 +51,32 @@ class KlippyUDS(threading.Thread):
     connected = False
     connecting = False
     callback_table = {}
-
-    def __init__(self, callback, socket_path, port=None, api_key="", path="", ssl=None):
+    RECV_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        callback,
+        socket_path,
+        port=None,
+        api_key="",
+        path="",
+        ssl=None,
+        status_rate=10,
+        recorder=None,
+    ):
         threading.Thread.__init__(self)
         self._wst = None
         self._callback = callback
+        self.recorder = recorder
+        self.dispatcher = StatusDispatcher(callback.get("on_message"), status_rate)
         self.api = MoonrakerApi(self)
         self.sock = None
         self.closing = False
         self.socket_path = os.path.expanduser(socket_path)
         self.api_key = api_key
-        self._buffer = b""
         self._delimiter = "\x03"
+        self._frames = FrameBuffer(self._delimiter.encode("utf-8"))
+        self._recv_buffer = bytearray(self.RECV_SIZE)
 
     def initial_connect(self):
         logging.info("Starting UDS connection to %s", self.socket_path)
@@ -43,6 +89,7 @@ class KlippyUDS(threading.Thread):
         self.closing = False
         self.connecting = True
         logging.debug("Attempting to connect via UDS")
+        self._frames.clear()
 
         try:
             self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
@@ -78,18 +125,14 @@ class KlippyUDS(threading.Thread):
                 pass
 
     def _listen(self):
+        chunk = memoryview(self._recv_buffer)
         while not self.closing:
             try:
-                chunk = self.sock.recv(4096)
-                if not chunk:
+                size = self.sock.recv_into(self._recv_buffer)
+                if not size:
                     break
-                self._buffer += chunk
-                delimiter_bytes = self._delimiter.encode("utf-8")
-                while delimiter_bytes in self._buffer:
-                    frame, self._buffer = self._buffer.split(delimiter_bytes, 1)
-                    frame_str = frame.decode("utf-8", errors="replace").strip()
-                    if frame_str:
-                        self._on_message(frame_str)
+                for frame in self._frames.feed(chunk[:size]):
+                    self._on_message(frame)
             except (ConnectionResetError, BrokenPipeError, OSError):
                 break
             except Exception as e:
@@ -98,15 +141,18 @@ class KlippyUDS(threading.Thread):
 
         self.connected = False
         self.connecting = False
+        self.dispatcher.log_stats()
         if "on_close" in self._callback:
             GLib.idle_add(
                 self._callback["on_close"], "Connection closed", priority=GLib.PRIORITY_HIGH_IDLE
             )
 
     def _on_message(self, message):
+        if self.recorder is not None:
+            self.recorder.record("<", message)
         try:
-            response = json.loads(message)
-        except json.JSONDecodeError:
+            response = json_codec.loads(message)
+        except ValueError:
             logging.debug("UDS: Invalid JSON received: %s", message)
             return
 
@@ -126,11 +172,9 @@ class KlippyUDS(threading.Thread):
             return
 
         if "method" in response and "on_message" in self._callback:
-            args = (
-                response["method"],
-                response["params"][0] if "params" in response else {},
+            self.dispatcher.notify(
+                response["method"], response["params"][0] if "params" in response else {}
             )
-            GLib.idle_add(self._callback["on_message"], *args, priority=GLib.PRIORITY_HIGH_IDLE)
 
     def send_method(self, method, params=None, callback=None, *args):
         if not self.connected or self.closing:
@@ -143,7 +187,10 @@ class KlippyUDS(threading.Thread):
             self.callback_table[self._req_id] = [callback, method, params, [*args]]
 
         data = {"jsonrpc": "2.0", "method": method, "params": params, "id": self._req_id}
-        message = json.dumps(data) + self._delimiter
+        message = json_codec.dumps(data)
+        if self.recorder is not None:
+            self.recorder.record(">", message)
+        message += self._delimiter
         try:
             self.sock.sendall(message.encode("utf-8"))
         except Exception as e:
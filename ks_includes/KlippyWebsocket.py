@@ -1,16 +1,16 @@
 #!/usr/bin/python
 
-import json
 import logging
 import threading
 
 import gi
-import websocket
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import GLib
 
+from ks_includes import json_codec
 from ks_includes.MoonrakerApi import MoonrakerApi
+from ks_includes.status_dispatcher import StatusDispatcher
 
 
 class KlippyWebsocket(threading.Thread):
@@ -47,11 +47,15 @@ class KlippyWebsocket(threading.Thread):
             return f"Connection closed: {message}"
         return ""
 
-    def __init__(self, callback, host, port, api_key, path="", ssl=None):
+    def __init__(
+        self, callback, host, port, api_key, path="", ssl=None, status_rate=10, recorder=None
+    ):
         threading.Thread.__init__(self)
         self._wst = None
         self.ws_url = None
         self._callback = callback
+        self.recorder = recorder
+        self.dispatcher = StatusDispatcher(callback.get("on_message"), status_rate)
         self.api = MoonrakerApi(self)
         self.ws = None
         self.closing = False
@@ -82,6 +86,9 @@ class KlippyWebsocket(threading.Thread):
         self.connecting = True
         logging.debug("Attempting to connect")
 
+        # Only needed when connecting over TCP, not over the Unix socket
+        import websocket
+
         self.ws_url = f"{self.ws_proto}://{self._url}/websocket?token={self.api_key}"
         self.ws = websocket.WebSocketApp(
             self.ws_url,
@@ -91,7 +98,10 @@ class KlippyWebsocket(threading.Thread):
             on_open=self.on_open,
             header=self.header,
         )
-        self._wst = threading.Thread(target=self.ws.run_forever, daemon=True)
+        # The JSON decoder validates the text again, skip the pure Python UTF-8 check
+        self._wst = threading.Thread(
+            target=self.ws.run_forever, kwargs={"skip_utf8_validation": True}, daemon=True
+        )
         try:
             logging.debug("Starting websocket thread")
             self._wst.start()
@@ -110,7 +120,9 @@ class KlippyWebsocket(threading.Thread):
 
     def on_message(self, *args):
         message = args[1] if len(args) == 2 else args[0]
-        response = json.loads(message)
+        if self.recorder is not None:
+            self.recorder.record("<", message)
+        response = json_codec.loads(message)
         if "id" in response and response["id"] in self.callback_table:
             args = (
                 response,
@@ -125,8 +137,9 @@ class KlippyWebsocket(threading.Thread):
             return
 
         if "method" in response and "on_message" in self._callback:
-            args = (response["method"], response["params"][0] if "params" in response else {})
-            GLib.idle_add(self._callback["on_message"], *args, priority=GLib.PRIORITY_HIGH_IDLE)
+            self.dispatcher.notify(
+                response["method"], response["params"][0] if "params" in response else {}
+            )
         if self.closing:
             timer = threading.Timer(2, self.ws.close)
             timer.start()
@@ -143,7 +156,10 @@ class KlippyWebsocket(threading.Thread):
             self.callback_table[self._req_id] = [callback, method, params, [*args]]
 
         data = {"jsonrpc": "2.0", "method": method, "params": params, "id": self._req_id}
-        self.ws.send(json.dumps(data))
+        message = json_codec.dumps(data)
+        if self.recorder is not None:
+            self.recorder.record(">", message)
+        self.ws.send(message)
         return True
 
     def on_open(self, *args):
@@ -165,6 +181,7 @@ class KlippyWebsocket(threading.Thread):
         if "on_close" in self._callback:
             GLib.idle_add(self._callback["on_close"], info, priority=GLib.PRIORITY_HIGH_IDLE)
         logging.info("Moonraker Websocket Closed")
+        self.dispatcher.log_stats()
         self.connected = False
         self.connecting = False
 
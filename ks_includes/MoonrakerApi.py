@@ -45,9 +45,9 @@ class MoonrakerApi:
             "server.files.metadata", {"filename": filename}, callback, *args
         )
 
-    def object_subscription(self, updates):
+    def object_subscription(self, updates, callback=None, *args):
         logging.debug("Sending printer.objects.subscribe")
-        return self._ws.send_method("printer.objects.subscribe", updates)
+        return self._ws.send_method("printer.objects.subscribe", updates, callback, *args)
 
     def power_device_off(self, devices, callback=None, *args):
         result = {item: None for item in devices}
@@ -1,6 +1,7 @@
 import configparser
 import copy
 import gettext
+import hashlib
 import json
 import locale
 import logging
@@ -10,6 +11,9 @@ import re
 import traceback  # noqa
 from io import StringIO
 
+from ks_includes import json_codec
+from ks_includes.functions import get_cache_dir
+
 SCREEN_BLANKING_OPTIONS = [
     60,  # 1 Minute
     120,  # 2 Minutes
@@ -22,6 +26,8 @@ SCREEN_BLANKING_OPTIONS = [
 ]
 
 klipperscreendir = pathlib.Path(__file__).parent.resolve().parent
+# Format of the parsed config cache
+CONFIG_CACHE_VERSION = 1
 home = os.path.expanduser("~/")
 printer_data_config = os.path.join(home, "printer_data", "config")
 xdg_config = os.path.join(home, ".config", "KlipperScreen")
@@ -46,10 +52,56 @@ class KlipperScreenConfig:
         logging.debug(f"Config path location: {self.config_path}")
         self.user_cfg = None
         self.lang = None
+        self.lang_path = None
         self.langs = {}
+        # Files read to build the config, with their state, see _load_cache()
+        self.sources = {}
+
+        if not self._load_cache():
+            self._read_config()
+            self._save_cache()
 
+        printers = [i for i in self.config.sections() if i.startswith("printer ")]
+        if not printers:
+            printers.append("Printer Printer")
+        self.printers = [
+            {
+                printer[8:]: {
+                    "moonraker_host": self.config.get(
+                        printer, "moonraker_host", fallback="127.0.0.1"
+                    ),
+                    "moonraker_port": self.config.get(printer, "moonraker_port", fallback="7125"),
+                    "moonraker_path": self.config.get(printer, "moonraker_path", fallback="").strip(
+                        "/"
+                    ),
+                    "moonraker_ssl": self.config.getboolean(
+                        printer, "moonraker_ssl", fallback=None
+                    ),
+                    "moonraker_api_key": self.config.get(
+                        printer, "moonraker_api_key", fallback=""
+                    ).replace('"', ""),
+                }
+            }
+            for printer in printers
+        ]
+
+        conf_printers_debug = copy.deepcopy(self.printers)
+        for printer in conf_printers_debug:
+            name = list(printer)[0]
+            item = conf_printers_debug[conf_printers_debug.index(printer)]
+            if item[name]["moonraker_api_key"] != "":
+                item[name]["moonraker_api_key"] = "redacted"
+        logging.debug(f"Configured printers: {json.dumps(conf_printers_debug, indent=2)}")
+
+        self.create_translations()
+        self._create_configurable_options(screen)
+
+    def _read_config(self):
+        # The parsing and validation rules are part of the result
+        self._add_source(__file__)
         try:
             # parse defaults.conf
+            self._add_source(self.default_config_path)
             self.config.read(self.default_config_path)
             includes = [i[8:] for i in self.config.sections() if i.startswith("include ")]
             for include in includes:
@@ -58,6 +110,7 @@ class KlipperScreenConfig:
             self.validate_config(self.config)  # In case a user altered defaults
             # parse KlipperScreen.conf
             if self.config_path != self.default_config_path:
+                self._add_source(self.config_path)
                 user_def, saved_def = self.separate_saved_config(self.config_path)
                 self.user_cfg = configparser.ConfigParser()
                 self.user_cfg.read_string(user_def)
@@ -100,51 +153,89 @@ class KlipperScreenConfig:
             logging.exception(msg)
             self.errors.append(msg)
 
-        printers = [i for i in self.config.sections() if i.startswith("printer ")]
-        if not printers:
-            printers.append("Printer Printer")
-        self.printers = [
-            {
-                printer[8:]: {
-                    "moonraker_host": self.config.get(
-                        printer, "moonraker_host", fallback="127.0.0.1"
-                    ),
-                    "moonraker_port": self.config.get(printer, "moonraker_port", fallback="7125"),
-                    "moonraker_path": self.config.get(printer, "moonraker_path", fallback="").strip(
-                        "/"
-                    ),
-                    "moonraker_ssl": self.config.getboolean(
-                        printer, "moonraker_ssl", fallback=None
-                    ),
-                    "moonraker_api_key": self.config.get(
-                        printer, "moonraker_api_key", fallback=""
-                    ).replace('"', ""),
-                }
-            }
-            for printer in printers
-        ]
+    @staticmethod
+    def _get_source_state(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
 
-        conf_printers_debug = copy.deepcopy(self.printers)
-        for printer in conf_printers_debug:
-            name = list(printer)[0]
-            item = conf_printers_debug[conf_printers_debug.index(printer)]
-            if item[name]["moonraker_api_key"] != "":
-                item[name]["moonraker_api_key"] = "redacted"
-        logging.debug(f"Configured printers: {json.dumps(conf_printers_debug, indent=2)}")
+    def _add_source(self, path):
+        # Taken before reading, a change while parsing is found on the next start
+        self.sources[path] = self._get_source_state(path)
 
-        self.create_translations()
-        self._create_configurable_options(screen)
+    def _get_cache_path(self):
+        name = hashlib.sha1(os.path.abspath(self.config_path).encode()).hexdigest()[:16]
+        return os.path.join(get_cache_dir(), f"config-{name}.json")
+
+    def _load_cache(self):
+        """Restores the parsed config if none of the files it was built from changed"""
+        try:
+            with open(self._get_cache_path(), "rb") as f:
+                cache = json_codec.loads(f.read())
+            if cache["version"] != CONFIG_CACHE_VERSION or cache["path"] != self.config_path:
+                return False
+            for path, state in cache["sources"].items():
+                if self._get_source_state(path) != state:
+                    logging.info(f"Config changed: {path}")
+                    return False
+            self.config.read_dict(cache["config"])
+            if cache["user"] is not None:
+                self.user_cfg = configparser.ConfigParser()
+                self.user_cfg.read_dict(cache["user"])
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError, configparser.Error) as e:
+            logging.error(f"Unable to read the config cache: {e}")
+            self.config = configparser.ConfigParser()
+            self.user_cfg = None
+            return False
+        self.sources = cache["sources"]
+        logging.info(f"Config loaded from the cache of {len(self.sources)} files")
+        if self.user_cfg is not None:
+            self.log_config(self.user_cfg)
+        return True
+
+    def _save_cache(self):
+        if self.errors:
+            # The errors are shown on every start until they are fixed
+            return
+        path = self._get_cache_path()
+        cache = {
+            "version": CONFIG_CACHE_VERSION,
+            "path": self.config_path,
+            "sources": self.sources,
+            "config": self._config_to_dict(self.config),
+            "user": None if self.user_cfg is None else self._config_to_dict(self.user_cfg),
+        }
+        try:
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                f.write(json_codec.dumps(cache))
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logging.error(f"Unable to write the config cache: {e}")
+
+    @staticmethod
+    def _config_to_dict(config):
+        defaults = config.defaults()
+        data = {"DEFAULT": dict(defaults)} if defaults else {}
+        for section in config.sections():
+            data[section] = {
+                key: value
+                for key, value in config.items(section, raw=True)
+                if key not in defaults or value != defaults[key]
+            }
+        return data
 
     def create_translations(self):
-        lang_path = os.path.join(klipperscreendir, "ks_includes", "locales")
+        self.lang_path = os.path.join(klipperscreendir, "ks_includes", "locales")
         self.lang_list = [
-            d for d in os.listdir(lang_path) if not os.path.isfile(os.path.join(lang_path, d))
+            d
+            for d in os.listdir(self.lang_path)
+            if not os.path.isfile(os.path.join(self.lang_path, d))
         ]
         self.lang_list.sort()
-        for lng in self.lang_list:
-            self.langs[lng] = gettext.translation(
-                "KlipperScreen", localedir=lang_path, languages=[lng], fallback=True
-            )
 
         lang = self.get_main_config().get("language", "system_lang")
         logging.debug(f"Selected lang: {lang} OS lang: {locale.getlocale()[0]}")
@@ -166,6 +257,11 @@ class KlipperScreenConfig:
         if lang not in self.lang_list:
             lang = self.find_language(lang)
         logging.info(f"Using lang {lang}")
+        if lang not in self.langs:
+            # Catalogs are only loaded once they are used
+            self.langs[lang] = gettext.translation(
+                "KlipperScreen", localedir=self.lang_path, languages=[lang], fallback=True
+            )
         self.lang = self.langs[lang]
         self.lang.install(names=["gettext", "ngettext"])
 
@@ -202,6 +298,7 @@ class KlipperScreenConfig:
                     "auto_open_extrude",
                     "start_locked",
                     "keyboard_navigation",
+                    "instrumentation",
                 )
                 strs = (
                     "default_printer",
@@ -228,6 +325,13 @@ class KlipperScreenConfig:
                     "height",
                     "autolock_timeout",
                     "screensaver_wake_delay",
+                    "status_update_rate",
+                    "thumbnail_cache_size",
+                    "image_cache_size",
+                    "stall_threshold",
+                    "moonraker_retries",
+                    "moonraker_timeout",
+                    "moonraker_files_timeout",
                 )
             elif section.startswith("printer "):
                 bools = (
@@ -659,6 +763,8 @@ class KlipperScreenConfig:
 
         if "*" in full_path:
             parent_dir = os.path.dirname(full_path)
+            # Adding or removing a matching file changes the directory
+            self._add_source(parent_dir)
             pattern = re.escape(os.path.basename(full_path)).replace(r"\*", r".*")
             regex = re.compile(f"^{pattern}$")
 
@@ -670,12 +776,14 @@ class KlipperScreenConfig:
                 logging.error(f"Config Error: unable to list directory {parent_dir}: {e}")
                 return
         else:
+            self._add_source(full_path)
             if not os.path.isfile(full_path):
                 logging.error(f"Config Error: include file '{full_path}' does not exist")
                 return
             files_to_process.append(full_path)
 
         for fp in files_to_process:
+            self._add_source(fp)
             try:
                 with open(fp, "r", encoding="utf-8") as f:
                     cfg_text = f.read()
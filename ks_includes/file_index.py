@@ -0,0 +1,105 @@
+import os
+import re
+from bisect import bisect_left
+
+TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    return TOKEN.findall(text.casefold())
+
+
+class FileIndex:
+    """Search index of the gcode files, matching every query word as a prefix of a file word
+
+    Words come from the file name, the filament type, the slicer and the estimated time
+    in hours ("2h"). Orderings by name, date and size are sorted once and reused until
+    the files change.
+    """
+
+    FIELDS = ("filament_type", "slicer")
+
+    def __init__(self):
+        self.records = {}
+        self.tokens = {}
+        self.sorted_tokens = None
+        self.orders = {}
+
+    def clear(self):
+        self.records.clear()
+        self.tokens.clear()
+        self.sorted_tokens = None
+        self.orders.clear()
+
+    def update(self, path, fileinfo):
+        name = os.path.splitext(os.path.basename(path))[0]
+        words = set(tokenize(name))
+        for field in self.FIELDS:
+            if isinstance(fileinfo.get(field), str):
+                words.update(tokenize(fileinfo[field]))
+        if isinstance(fileinfo.get("estimated_time"), (int, float)):
+            words.add(f"{int(fileinfo['estimated_time'] // 3600)}h")
+        record = {
+            "name": name.casefold(),
+            "modified": fileinfo.get("modified", 0),
+            "size": fileinfo.get("size", 0),
+            "words": words,
+        }
+        old = self.records.get(path)
+        if old is not None:
+            if old == record:
+                return
+            self._remove_words(path, old["words"] - words)
+            words = words - old["words"]
+        for word in words:
+            if word not in self.tokens:
+                self.tokens[word] = set()
+                self.sorted_tokens = None
+            self.tokens[word].add(path)
+        self.records[path] = record
+        self.orders.clear()
+
+    def remove(self, path):
+        record = self.records.pop(path, None)
+        if record is not None:
+            self._remove_words(path, record["words"])
+            self.orders.clear()
+
+    def _remove_words(self, path, words):
+        for word in words:
+            self.tokens[word].discard(path)
+            if not self.tokens[word]:
+                del self.tokens[word]
+                self.sorted_tokens = None
+
+    def get_order(self, key):
+        if key not in self.orders:
+            self.orders[key] = sorted(self.records, key=lambda path: self.records[path][key])
+        return self.orders[key]
+
+    def match(self, word):
+        if self.sorted_tokens is None:
+            self.sorted_tokens = sorted(self.tokens)
+        paths = set()
+        i = bisect_left(self.sorted_tokens, word)
+        while i < len(self.sorted_tokens) and self.sorted_tokens[i].startswith(word):
+            paths |= self.tokens[self.sorted_tokens[i]]
+            i += 1
+        return paths
+
+    def search(self, query, key="name", reverse=False):
+        words = tokenize(query)
+        if not words:
+            return []
+        paths = self.match(words[0])
+        for word in words[1:]:
+            if not paths:
+                break
+            paths &= self.match(word)
+        order = self.get_order(key)
+        if len(paths) < len(order) // 8:
+            # Few matches: sorting them is cheaper than walking the whole ordering
+            result = sorted(paths, key=lambda path: self.records[path][key])
+        else:
+            result = [path for path in order if path in paths]
+        return result[::-1] if reverse else result
@@ -1,24 +1,64 @@
+import heapq
 import logging
 import os
+import re
+from collections import deque
 
 import gi
 
 gi.require_version("Gtk", "3.0")
+from gi.repository import GLib
+
+from ks_includes import json_codec
+from ks_includes.file_index import FileIndex
+from ks_includes.functions import get_cache_dir
 
 
 class KlippyFiles:
+    MAX_REQUESTS = 4
+    PRIORITY_HIGH = 0
+    PRIORITY_LOW = 10
+    NOTIFY_BATCH = 50
+    # Seconds before a metadata request without a reply gives up its slot
+    METADATA_TIMEOUT = 10
+
     def __init__(self, screen):
         self._screen = screen
         self.callbacks = []
         self.files = {}
         self.directories = []
         self.gcodes_path = None
+        # Metadata requests waiting for a free slot: heap of (priority, order, filename)
+        self.metadata_queue = []
+        self.metadata_queued = {}
+        # Filenames of the requests in flight, with the timeout that releases their slot
+        self.metadata_pending = {}
+        self.metadata_order = 0
+        self.metadata_cache = None
+        self.cache_file = None
+        self.cache_dirty = False
+        self.cache_save = None
+        # server.files.get_directory results by path, patched by notify_filelist_changed
+        self.dir_cache = {}
+        self.index = FileIndex()
+        # Files whose metadata came from the cache, announced a batch per main loop iteration
+        self.notify_queue = deque()
+        self.notify_source = None
 
     def reinit(self):
+        self.save_cache()
         self.callbacks.clear()
         self.files.clear()
         self.directories.clear()
         self.gcodes_path = None
+        self.reset_requests()
+        self.metadata_cache = None
+        self.dir_cache.clear()
+        self.index.clear()
+        self.notify_queue.clear()
+        if self.notify_source is not None:
+            GLib.source_remove(self.notify_source)
+            self.notify_source = None
 
     def set_gcodes_path(self):
         virtual_sdcard = self._screen.printer.get_config_section("virtual_sdcard")
@@ -27,53 +67,114 @@ class KlippyFiles:
         logging.info(f"Gcodes path: {self.gcodes_path}")
 
     def _callback(self, result, method, params):
+        if method == "server.files.metadata":
+            self._release_request(params["filename"])
+            self._send_metadata_requests()
         if "error" in result:
             logging.debug(result["error"])
             return
         if method == "server.files.list":
+            self.load_cache()
+            listed = set()
+            cached_files = []
             for item in result["result"]:
                 self.files[item["path"]] = item
-                self.request_metadata(item["path"])
-        elif method == "server.files.metadata":
-            for x in result["result"]:
-                if params["filename"] not in self.files:
-                    self.files[params["filename"]] = {}
-                self.files[params["filename"]][x] = result["result"][x]
-            if "path" not in self.files[params["filename"]]:
-                self.files[params["filename"]]["path"] = params["filename"]
-            if "thumbnails" in self.files[params["filename"]]:
-                self.files[params["filename"]]["thumbnails"].sort(
-                    key=lambda y: y["size"], reverse=True
-                )
-                for thumbnail in self.files[params["filename"]]["thumbnails"]:
-                    thumbnail["local"] = False
-                    if self.gcodes_path is not None:
-                        path = os.path.join(
-                            os.path.dirname(os.path.join(self.gcodes_path, params["filename"])),
-                            thumbnail["relative_path"],
-                        )
-                        if os.access(path, os.R_OK):
-                            thumbnail["local"] = True
-                            thumbnail["path"] = path
-                    if thumbnail["local"] is False:
-                        thumbnail["path"] = os.path.join(
-                            os.path.dirname(params["filename"]), thumbnail["relative_path"]
-                        )
-            self._screen.process_update("notify_metadata_update", params)
-            self.run_callbacks(
-                "modify_file", {"action": "modify_file", "item": self.files[params["filename"]]}
+                listed.add(item["path"])
+                cached = self.metadata_cache.get(item["path"])
+                if (
+                    cached
+                    and cached["modified"] == item["modified"]
+                    and cached["size"] == item["size"]
+                ):
+                    self.set_metadata(item["path"], cached["metadata"])
+                    cached_files.append(item["path"])
+                else:
+                    self.request_metadata(item["path"], self.PRIORITY_LOW)
+                if self.is_gcode(item["path"]):
+                    self.index.update(item["path"], item)
+            stale = self.metadata_cache.keys() - listed
+            for filename in stale:
+                del self.metadata_cache[filename]
+            logging.info(
+                f"Listed {len(listed)} files, {len(self.metadata_queued)} need metadata, "
+                f"{len(stale)} removed from the cache"
             )
+            if stale:
+                self.schedule_cache_save()
+            self.queue_notifications(cached_files)
+        elif method == "server.files.metadata":
+            metadata = result["result"]
+            self.set_metadata(params["filename"], metadata)
+            if self.metadata_cache is not None and "modified" in metadata and "size" in metadata:
+                self.metadata_cache[params["filename"]] = {
+                    "modified": metadata["modified"],
+                    "size": metadata["size"],
+                    "metadata": metadata,
+                }
+                self.schedule_cache_save()
+            self.notify_metadata(params["filename"])
+
+    def notify_metadata(self, filename):
+        if filename not in self.files:
+            return
+        self._screen.process_update("notify_metadata_update", {"filename": filename})
+        self.run_callbacks("modify_file", {"action": "modify_file", "item": self.files[filename]})
+
+    def queue_notifications(self, filenames):
+        self.notify_queue.extend(filenames)
+        if self.notify_queue and self.notify_source is None:
+            self.notify_source = GLib.idle_add(self._send_notifications)
+
+    def _send_notifications(self):
+        # Spread over several iterations like metadata replies, so listing thousands of
+        # cached files doesn't block the main loop with their callbacks
+        for _ in range(min(self.NOTIFY_BATCH, len(self.notify_queue))):
+            self.notify_metadata(self.notify_queue.popleft())
+        if self.notify_queue:
+            return True
+        self.notify_source = None
+        return False
+
+    def set_metadata(self, filename, metadata):
+        if filename not in self.files:
+            self.files[filename] = {}
+        self.files[filename].update(metadata)
+        if "path" not in self.files[filename]:
+            self.files[filename]["path"] = filename
+        if "thumbnails" in self.files[filename]:
+            self.files[filename]["thumbnails"].sort(key=lambda y: y["size"], reverse=True)
+            for thumbnail in self.files[filename]["thumbnails"]:
+                thumbnail["local"] = False
+                if self.gcodes_path is not None:
+                    path = os.path.join(
+                        os.path.dirname(os.path.join(self.gcodes_path, filename)),
+                        thumbnail["relative_path"],
+                    )
+                    if os.access(path, os.R_OK):
+                        thumbnail["local"] = True
+                        thumbnail["path"] = path
+                if thumbnail["local"] is False:
+                    thumbnail["path"] = os.path.join(
+                        os.path.dirname(filename), thumbnail["relative_path"]
+                    )
+        if self.is_gcode(filename):
+            self.index.update(filename, self.files[filename])
 
     def add_file(self, item):
         if "path" not in item:
             logging.info(f"Error adding item, unknown path: {item}")
             return
         self.files[item["path"]] = item
+        self.index.update(item["path"], item)
         self.request_metadata(item["path"])
 
     def remove_file(self, filename):
         if filename in self.files:
             self.files.pop(filename)
+        self.index.remove(filename)
+        if self.metadata_cache and filename in self.metadata_cache:
+            self.metadata_cache.pop(filename)
+            self.schedule_cache_save()
 
     def add_callback(self, callback):
         self.callbacks.append(callback)
@@ -92,6 +193,7 @@ class KlippyFiles:
             and not self.is_gcode(data["item"]["path"])
         ):
             return
+        self.update_dir_cache(data)
         if data["action"] == "create_file":
             self.add_file(data["item"])
         elif data["action"] == "delete_file":
@@ -101,6 +203,25 @@ class KlippyFiles:
         elif data["action"] == "move_file":
             self.files[data["item"]["path"]] = self.files.pop(data["source_item"]["path"])
             self.files[data["item"]["path"]].update(data["item"])
+            self.index.remove(data["source_item"]["path"])
+            self.index.update(data["item"]["path"], self.files[data["item"]["path"]])
+            if self.metadata_cache and data["source_item"]["path"] in self.metadata_cache:
+                self.metadata_cache[data["item"]["path"]] = self.metadata_cache.pop(
+                    data["source_item"]["path"]
+                )
+                self.schedule_cache_save()
+        elif data["action"] == "delete_dir":
+            prefix = f"{data['item']['path']}/"
+            for filename in [f for f in self.files if f.startswith(prefix)]:
+                self.remove_file(filename)
+        elif data["action"] == "move_dir":
+            prefix = f"{data['source_item']['path']}/"
+            for filename in [f for f in self.files if f.startswith(prefix)]:
+                path = os.path.join(data["item"]["path"], filename[len(prefix) :])
+                self.files[path] = self.files.pop(filename)
+                self.files[path]["path"] = path
+                self.index.remove(filename)
+                self.index.update(path, self.files[path])
         self.run_callbacks(data["action"], data)
 
     @staticmethod
@@ -110,23 +231,119 @@ class KlippyFiles:
     def file_metadata_exists(self, filename):
         return filename in self.files and "slicer" in self.files[filename]
 
-    def get_thumbnail_location(self, filename, small=False):
+    def get_thumbnail(self, filename, small=False):
         if all((small, len(self.files[filename]["thumbnails"]) > 1)):
-            thumb = self.files[filename]["thumbnails"][1]
-        else:
-            thumb = self.files[filename]["thumbnails"][0]
+            return self.files[filename]["thumbnails"][1]
+        return self.files[filename]["thumbnails"][0]
+
+    def get_thumbnail_location(self, filename, small=False):
+        thumb = self.get_thumbnail(filename, small)
         return ["file", thumb["path"]] if thumb["local"] else ["http", thumb["path"]]
 
+    def get_thumbnail_key(self, filename, small=False):
+        if "modified" not in self.files[filename]:
+            return None
+        return (
+            filename,
+            self.files[filename]["modified"],
+            self.get_thumbnail(filename, small)["size"],
+        )
+
     def has_thumbnail(self, filename):
         return filename in self.files and "thumbnails" in self.files[filename]
 
-    def request_metadata(self, filename):
-        if self.is_gcode(filename):
-            self._screen._ws.api.get_file_metadata(filename, self._callback)
-        else:
+    def request_metadata(self, filename, priority=PRIORITY_HIGH):
+        if not self.is_gcode(filename):
             logging.info("Not a gcode")
+            return
+        if filename in self.metadata_queued and self.metadata_queued[filename] <= priority:
+            return
+        # Re-queuing with a higher priority leaves a stale heap entry that is skipped when popped
+        self.metadata_queued[filename] = priority
+        self.metadata_order += 1
+        heapq.heappush(self.metadata_queue, (priority, self.metadata_order, filename))
+        self._send_metadata_requests()
+
+    def prioritize(self, filenames):
+        for filename in filenames:
+            if filename in self.metadata_queued:
+                self.request_metadata(filename)
+
+    def _send_metadata_requests(self):
+        while self.metadata_queue and len(self.metadata_pending) < self.MAX_REQUESTS:
+            priority, _, filename = heapq.heappop(self.metadata_queue)
+            if self.metadata_queued.get(filename) != priority:
+                continue
+            del self.metadata_queued[filename]
+            if not self._screen._ws.api.get_file_metadata(filename, self._callback):
+                logging.debug("Unable to request metadata, dropping the queue")
+                self.metadata_queue.clear()
+                self.metadata_queued.clear()
+                break
+            self.metadata_pending[filename] = GLib.timeout_add_seconds(
+                self.METADATA_TIMEOUT, self._metadata_timeout, filename
+            )
+        if not self.metadata_queue and not self.metadata_pending:
+            self.save_cache()
+
+    def _release_request(self, filename):
+        source = self.metadata_pending.pop(filename, None)
+        if source is not None:
+            GLib.source_remove(source)
+
+    def _metadata_timeout(self, filename):
+        logging.info(f"No metadata received for {filename}")
+        self.metadata_pending.pop(filename, None)
+        self._send_metadata_requests()
+        return False
+
+    def reset_requests(self):
+        """Forgets the queued and pending metadata requests, their replies won't arrive"""
+        for source in self.metadata_pending.values():
+            GLib.source_remove(source)
+        self.metadata_pending.clear()
+        self.metadata_queue.clear()
+        self.metadata_queued.clear()
+
+    def load_cache(self):
+        if self.metadata_cache is not None:
+            return
+        self.metadata_cache = {}
+        name = re.sub(r"[^\w.-]", "_", self._screen.state.printer_name or "default")
+        try:
+            self.cache_file = os.path.join(get_cache_dir(), f"metadata-{name}.json")
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, "rb") as file:
+                    self.metadata_cache = json_codec.loads(file.read())
+        except (OSError, ValueError) as e:
+            logging.error(f"Unable to read the metadata cache: {e}")
+            self.metadata_cache = {}
+        logging.info(f"Metadata cache: {len(self.metadata_cache)} files")
+
+    def schedule_cache_save(self):
+        self.cache_dirty = True
+        if self.cache_save is None:
+            self.cache_save = GLib.timeout_add_seconds(10, self._save_cache_timeout)
+
+    def _save_cache_timeout(self):
+        self.cache_save = None
+        self.save_cache()
+        return False
+
+    def save_cache(self):
+        if not self.cache_dirty or self.metadata_cache is None or self.cache_file is None:
+            return
+        self.cache_dirty = False
+        try:
+            with open(f"{self.cache_file}.tmp", "w") as file:
+                file.write(json_codec.dumps(self.metadata_cache))
+            os.replace(f"{self.cache_file}.tmp", self.cache_file)
+        except OSError as e:
+            logging.error(f"Unable to write the metadata cache: {e}")
 
     def refresh_files(self):
+        # Changes made while Moonraker was unreachable were never notified
+        self.dir_cache.clear()
         self._screen._ws.api.get_file_list(self._callback)
 
     def run_callbacks(self, action, item):
@@ -140,5 +357,46 @@ class KlippyFiles:
             return {}
         return self.files[path]
 
-    def get_dir_info(self, directory):
-        self._screen._ws.api.get_dir_info(self._callback, directory=directory)
+    def search(self, query, key="name", reverse=False):
+        return self.index.search(query, key, reverse)
+
+    def get_directory(self, directory, callback, refresh=False):
+        if directory in self.dir_cache and not refresh:
+            callback({"result": self.dir_cache[directory]}, "server.files.get_directory", {})
+            return
+        self._screen._ws.api.get_dir_info(self._directory_callback, directory, callback)
+
+    def _directory_callback(self, result, method, params, callback):
+        if isinstance(result.get("result"), dict):
+            self.dir_cache[params["path"]] = result["result"]
+        callback(result, method, params)
+
+    def update_dir_cache(self, data):
+        action = data["action"]
+        kind, key = ("dirs", "dirname") if action.endswith("_dir") else ("files", "filename")
+        if action in {"delete_file", "delete_dir", "move_file", "move_dir"}:
+            old = data["source_item"] if action.startswith("move") else data["item"]
+            path = os.path.join(old["root"], old["path"])
+            listing = self.dir_cache.get(os.path.dirname(path))
+            if listing is not None:
+                name = os.path.basename(path)
+                listing[kind] = [entry for entry in listing[kind] if entry[key] != name]
+            if kind == "dirs":
+                for directory in list(self.dir_cache):
+                    if directory == path or directory.startswith(f"{path}/"):
+                        del self.dir_cache[directory]
+        if action in {"create_file", "create_dir", "modify_file", "move_file", "move_dir"}:
+            item = data["item"]
+            path = os.path.join(item["root"], item["path"])
+            listing = self.dir_cache.get(os.path.dirname(path))
+            if listing is not None:
+                name = os.path.basename(path)
+                listing[kind] = [entry for entry in listing[kind] if entry[key] != name]
+                listing[kind].append(
+                    {
+                        key: name,
+                        "modified": item.get("modified", 0),
+                        "size": item.get("size", 0),
+                        "permissions": item.get("permissions", ""),
+                    }
+                )
@@ -1,4 +1,5 @@
 import ctypes
+import json
 import logging
 import logging.handlers
 import os
@@ -55,7 +56,59 @@ except Exception as e:
     logging.error(f"An unexpected error occurred: {e}")
 
 
+_software_version = None
+
+
 def get_software_version():
+    global _software_version
+    if _software_version is None:
+        _software_version = _get_cached_version()
+    return _software_version
+
+
+def _get_checkout_state():
+    # Changes when git moves HEAD, updates refs or the index, like a commit, update or tag
+    git_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".git")
+    try:
+        with open(os.path.join(git_dir, "HEAD")) as f:
+            head = f.read().strip()
+    except OSError:
+        return None
+    state = [head]
+    paths = ["index", "packed-refs", os.path.join("refs", "tags")]
+    if head.startswith("ref: "):
+        paths.append(head[5:])
+    for path in paths:
+        try:
+            state.append(os.stat(os.path.join(git_dir, path)).st_mtime_ns)
+        except OSError:
+            state.append(0)
+    return state
+
+
+def _get_cached_version():
+    """git describe forks a process, its result is kept until the checkout changes"""
+    state = _get_checkout_state()
+    path = os.path.join(get_cache_dir(), "version.json")
+    if state is not None:
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+            if cached["state"] == state:
+                return cached["version"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    version = _describe_version()
+    if state is not None and version != "?":
+        try:
+            with open(path, "w") as f:
+                json.dump({"state": state, "version": version}, f)
+        except OSError as e:
+            logging.debug(f"Unable to cache the version: {e}")
+    return version
+
+
+def _describe_version():
     prog = (
         "git",
         "-C",
@@ -87,6 +140,13 @@ def get_software_version():
     return "?"
 
 
+def get_cache_dir(*subdirs):
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "KlipperScreen", *subdirs)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
 def parse_bool(value):
     return value.lower() == "true"
 
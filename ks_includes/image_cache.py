@@ -0,0 +1,101 @@
+import logging
+import threading
+from collections import OrderedDict
+
+
+class ImageCache:
+    """Decoded pixbufs bounded by the size of their pixel data, least recently used go first
+
+    Keys are tuples that start with the kind of image, so one kind can be cleared.
+    The budget shrinks while the system is low on memory. Protected kinds, like the theme
+    icons, share the budget but are evicted after the other images, as long as they use
+    less than PROTECTED_SHARE of the full budget, even when it's reduced.
+    """
+
+    # Fraction of available system memory below which the budget is reduced
+    LOW_MEMORY = 0.2
+    # Part of the full budget where protected kinds are only evicted once the others are gone
+    PROTECTED_SHARE = 0.25
+
+    def __init__(self, max_bytes, protected=()):
+        self.max_bytes = max_bytes
+        self.limit = max_bytes
+        self.protected = frozenset(protected)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._protected = OrderedDict()
+        self._protected_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def pixbuf_size(pixbuf):
+        return pixbuf.get_rowstride() * pixbuf.get_height()
+
+    def get(self, key):
+        with self._lock:
+            entries = self._protected if key[0] in self.protected else self._entries
+            if key in entries:
+                entries.move_to_end(key)
+                self.hits += 1
+                return entries[key][0]
+            self.misses += 1
+            return None
+
+    def put(self, key, pixbuf):
+        if pixbuf is None:
+            return
+        size = self.pixbuf_size(pixbuf)
+        with self._lock:
+            if key[0] in self.protected:
+                self._protected_bytes += size - self._protected.pop(key, (None, 0))[1]
+                self._protected[key] = (pixbuf, size)
+            else:
+                self._bytes += size - self._entries.pop(key, (None, 0))[1]
+                self._entries[key] = (pixbuf, size)
+            self._trim()
+
+    def clear(self, *kinds):
+        with self._lock:
+            for key in [key for key in self._entries if not kinds or key[0] in kinds]:
+                self._bytes -= self._entries.pop(key)[1]
+            for key in [key for key in self._protected if not kinds or key[0] in kinds]:
+                self._protected_bytes -= self._protected.pop(key)[1]
+
+    def update_memory(self, system_memory):
+        if not system_memory.get("total") or "available" not in system_memory:
+            return
+        available = system_memory["available"] / system_memory["total"]
+        limit = self.max_bytes if available >= self.LOW_MEMORY else self.max_bytes // 4
+        if limit != self.limit:
+            logging.info(
+                f"Image cache limit {limit >> 20} MiB, {available * 100:.0f}% memory available"
+            )
+            with self._lock:
+                self.limit = limit
+                self._trim()
+
+    def _trim(self):
+        while self._bytes + self._protected_bytes > self.limit:
+            if self._protected and (
+                not self._entries or self._protected_bytes > self.max_bytes * self.PROTECTED_SHARE
+            ):
+                self._protected_bytes -= self._protected.popitem(last=False)[1][1]
+            else:
+                self._bytes -= self._entries.popitem(last=False)[1][1]
+            self.evictions += 1
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries) + len(self._protected),
+                "bytes": self._bytes + self._protected_bytes,
+                "limit": self.limit,
+                "protected": len(self._protected),
+                "protected_bytes": self._protected_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,166 @@
+import logging
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import GLib
+
+
+class Histogram:
+    """Durations counted in buckets of growing width, with their total and maximum"""
+
+    BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2)
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed):
+        self.buckets[bisect_left(self.BOUNDS, elapsed)] += 1
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket that holds the fraction
+        seen = 0
+        for bound, count in zip((*self.BOUNDS, self.max), self.buckets):
+            seen += count
+            if seen >= self.count * fraction:
+                return min(bound, self.max)
+        return self.max
+
+    def format(self):
+        if not self.count:
+            return "n=0"
+        return (
+            f"n={self.count} total={self.total * 1000:.0f}ms "
+            f"avg={self.total / self.count * 1000:.1f}ms "
+            f"p95<={self.percentile(0.95) * 1000:.1f}ms max={self.max * 1000:.1f}ms"
+        )
+
+    def format_buckets(self):
+        labels = [f"<{bound * 1000:g}ms" for bound in self.BOUNDS] + [f">{self.BOUNDS[-1]:g}s"]
+        return " ".join(f"{label}:{n}" for label, n in zip(labels, self.buckets) if n)
+
+
+class Instrumentation:
+    """Opt-in timing of what runs on the main loop and a watchdog for stalls
+
+    GLib sources, notification handling and panel methods are timed into histograms that
+    are logged every LOG_INTERVAL seconds. A thread logs the stack of the main thread when
+    the loop has not run for longer than the threshold.
+    """
+
+    HEARTBEAT = 50  # ms
+    LOG_INTERVAL = 300  # s
+    TOP = 15
+
+    def __init__(self, threshold=0.2):
+        self.threshold = threshold
+        self.histograms = {}
+        self.stalls = Histogram()
+        self.current = None
+        self.heartbeat = time.monotonic()
+        self._main_thread = threading.main_thread().ident
+        self._originals = {}
+
+    def install(self):
+        for name, position in (("idle_add", 0), ("timeout_add", 1), ("timeout_add_seconds", 1)):
+            self._originals[name] = getattr(GLib, name)
+            setattr(GLib, name, self._wrap_source(self._originals[name], position))
+        # Sources of the instrumentation itself are not timed
+        self._originals["timeout_add"](self.HEARTBEAT, self._beat)
+        self._originals["timeout_add_seconds"](self.LOG_INTERVAL, self.log_stats)
+        threading.Thread(target=self._watch, name="watchdog", daemon=True).start()
+        logging.info(f"Instrumentation enabled, stall threshold {self.threshold * 1000:.0f} ms")
+
+    def _wrap_source(self, add, position):
+        def add_source(*args, **kwargs):
+            if len(args) > position and callable(args[position]):
+                args = list(args)
+                args[position] = self.wrap(self.get_name(args[position]), args[position])
+            return add(*args, **kwargs)
+
+        return add_source
+
+    @staticmethod
+    def get_name(func):
+        name = getattr(func, "__qualname__", None) or type(func).__name__
+        module = getattr(func, "__module__", None)
+        return f"{module}.{name}" if module else name
+
+    def wrap(self, name, func):
+        def timed(*args, **kwargs):
+            with self.measure(name):
+                return func(*args, **kwargs)
+
+        return timed
+
+    def wrap_methods(self, obj, prefix, *names):
+        for name in names:
+            if hasattr(obj, name):
+                setattr(obj, name, self.wrap(f"{prefix}.{name}", getattr(obj, name)))
+
+    @contextmanager
+    def measure(self, name):
+        if threading.get_ident() != self._main_thread:
+            # Only the main loop is measured, calls from worker threads are not
+            yield
+            return
+        previous, self.current = self.current, name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current = previous
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, elapsed):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        self.histograms[name].add(elapsed)
+
+    def _beat(self):
+        now = time.monotonic()
+        late = now - self.heartbeat - self.HEARTBEAT / 1000
+        self.heartbeat = now
+        if late > self.threshold:
+            self.stalls.add(late)
+            logging.warning(f"Main loop stalled for {late * 1000:.0f} ms")
+        return True
+
+    def _watch(self):
+        reported = None
+        while True:
+            time.sleep(self.threshold / 2)
+            beat = self.heartbeat
+            if beat == reported or time.monotonic() - beat < self.threshold + self.HEARTBEAT / 1000:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(self._main_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            logging.warning(
+                f"Main loop blocked for over {self.threshold * 1000:.0f} ms "
+                f"in {self.current or 'unknown'}:\n{stack}"
+            )
+
+    def get_top(self, count=TOP):
+        return sorted(self.histograms.items(), key=lambda item: -item[1].total)[:count]
+
+    def log_stats(self):
+        lines = [f"Stalls: {self.stalls.format()}"]
+        lines.extend(
+            f"{name}: {histogram.format()} [{histogram.format_buckets()}]"
+            for name, histogram in self.get_top()
+        )
+        logging.info("Main loop timings\n" + "\n".join(lines))
+        return True
@@ -0,0 +1,36 @@
+import json
+import logging
+
+# Decoding errors of every backend are subclasses of ValueError
+try:
+    import orjson
+
+    backend = "orjson"
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+
+except ImportError:
+    try:
+        import ujson
+
+        backend = "ujson"
+
+        def loads(data):
+            return ujson.loads(data)
+
+        def dumps(obj):
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+
+    except ImportError:
+        backend = "json"
+        loads = json.loads
+
+        def dumps(obj):
+            return json.dumps(obj)
+
+
+logging.debug(f"JSON backend: {backend}")
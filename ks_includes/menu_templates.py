@@ -0,0 +1,117 @@
+import logging
+from collections import OrderedDict
+
+from jinja2 import nodes
+
+_MISSING = object()
+
+
+def find_inputs(node):
+    """Returns the variable paths read by a template, like ('printer', 'fans', 'count')"""
+    inputs = set()
+    _collect_inputs(node, inputs)
+    return tuple(sorted(inputs, key=str))
+
+
+def _collect_inputs(node, inputs):
+    path = _get_path(node)
+    if path is not None:
+        inputs.add(path)
+        return
+    for child in node.iter_child_nodes():
+        _collect_inputs(child, inputs)
+
+
+def _get_path(node):
+    attrs = []
+    while True:
+        if isinstance(node, nodes.Getattr):
+            attrs.append(node.attr)
+        elif isinstance(node, nodes.Getitem) and isinstance(node.arg, nodes.Const):
+            attrs.append(node.arg.value)
+        else:
+            break
+        node = node.node
+    if isinstance(node, nodes.Name) and node.ctx == "load":
+        return (node.name, *reversed(attrs))
+    return None
+
+
+def _resolve(data, path):
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return _MISSING
+        data = data[key]
+    return data
+
+
+class MenuTemplate:
+    """A compiled template and its last result, kept until one of its inputs changes"""
+
+    __slots__ = ("template", "inputs", "key", "result")
+
+    def __init__(self, env, source):
+        self.template = env.from_string(source)
+        self.inputs = find_inputs(env.parse(source))
+        self.key = None
+        self.result = None
+
+    def render(self, data):
+        key = tuple(_resolve(data, path) for path in self.inputs)
+        if self.key is None or key != self.key:
+            self.result = self.template.render(data)
+            self.key = key
+        return self.result
+
+
+class MenuTemplates:
+    """Menu templates compiled once for the whole process
+
+    The options of every menu item are compiled when the config is loaded. Each template
+    records the variables it reads, so rendering it again with data where those did not
+    change returns the previous result without running the template. Other text, like
+    titles and confirmations, is kept in a small LRU as it can be anything, a file path
+    or an object name, and would otherwise grow the cache without bound.
+    """
+
+    OPTIONS = ("name", "icon", "style", "params", "enable", "confirm")
+    OTHER_SIZE = 32
+
+    def __init__(self, env):
+        self.env = env
+        self.templates = {}
+        self.other = OrderedDict()
+
+    def load(self, config):
+        # Translations are part of the environment, so everything is compiled again
+        self.templates.clear()
+        self.other.clear()
+        for section in config.sections():
+            if not section.startswith("menu "):
+                continue
+            for option in self.OPTIONS:
+                source = config[section].get(option, None)
+                if not source:
+                    continue
+                try:
+                    if source not in self.templates:
+                        self.templates[source] = MenuTemplate(self.env, source)
+                except Exception as e:
+                    logging.error(f"Error compiling [{section}] {option}: {source}\n{e}")
+        logging.debug(f"Compiled {len(self.templates)} menu templates")
+
+    def get(self, source):
+        template = self.templates.get(source)
+        if template is not None:
+            return template
+        template = self.other.get(source)
+        if template is None:
+            template = self.other[source] = MenuTemplate(self.env, source)
+            if len(self.other) > self.OTHER_SIZE:
+                self.other.popitem(last=False)
+        else:
+            self.other.move_to_end(source)
+        return template
+
+    def render(self, source, data=None):
+        return self.get(source).render({} if data is None else data)
@@ -79,6 +79,9 @@ class NotificationHandler:
         if self._screen.files is not None:
             if "action" in data and data["action"] == "modify_file":
                 self._screen.gtk.clear_file_image_cache()
+            if "action" in data and data["action"] in {"modify_file", "delete_file", "move_file"}:
+                item = data["source_item"] if data["action"] == "move_file" else data["item"]
+                self._screen.gtk.evict_thumbnail(item["path"])
             self._screen.files.process_update(data)
         return True
 
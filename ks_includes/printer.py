@@ -5,10 +5,17 @@ import gi
 gi.require_version("Gtk", "3.0")
 from gi.repository import GLib
 
+from ks_includes.temperature_store import TemperatureStore
+
 
 class Printer:
     def __init__(self, state_cb, state_callbacks):
         self.config = {}
+        # Config sections indexed by type, see _index_config()
+        self.sections = {}
+        self.section_order = {}
+        self.section_names = []
+        self.macros = None
         self.data = {}
         self.state = "disconnected"
         self.state_cb = state_cb
@@ -22,8 +29,7 @@ class Printer:
         self.pwm_tools_count = 0
         self.output_pin_count = 0
         self.store_timeout = None
-        self.tempstore = {}
-        self.tempstore_size = 1200
+        self.tempstore = TemperatureStore()
         self.cameras = []
         self.available_commands = {}
         self.spoolman = False
@@ -33,10 +39,22 @@ class Printer:
         self.temp_devices = self.sensors = None
         self.system_info = {}
         self.warnings = []
+        # Built on demand by get_printer_status_data() and dropped when its inputs change
+        self.status_data = None
+        # Incremented on every update that changes a value, see StateWatcher
+        self.revision = 0
+        self.reset_revision = 0
+        self.revisions = {}
+        self.changed = []
 
     def reinit(self, printer_info, data):
         self.config = data["configfile"]["config"]
+        self._index_config()
         self.data = data
+        self.revision += 1
+        self.reset_revision = self.revision
+        self.revisions.clear()
+        self.changed = []
         self.tools.clear()
         self.extrudercount = 0
         self.tempdevcount = 0
@@ -45,7 +63,7 @@ class Printer:
         self.output_pin_count = 0
         self.pwm_tools_count = 0
         self.tempstore.clear()
-        self.tempstore_size = 1200
+        self.tempstore.resize(1200)
         self.available_commands.clear()
         self.temp_devices = self.sensors = None
         self.stop_tempstore_updates()
@@ -87,6 +105,7 @@ class Printer:
                 self.ledcount += 1
 
         self.tools = sorted(self.tools)
+        self.status_data = None
         self.log_counts(printer_info)
         self.process_update(data)
 
@@ -99,6 +118,7 @@ class Printer:
                 if obj not in self.config:
                     logging.info(f"Registering dynamic sensor: {obj}")
                     self.config[obj] = {}
+                    self._index_section(obj)
                     self.data[obj] = {"temperature": 0}
                     self.tempdevcount += 1
 
@@ -117,15 +137,27 @@ class Printer:
             self.store_timeout = None
 
     def process_update(self, data):
+        changed = []
         for x in data:
             if x == "configfile":
                 if "config" in data[x]:
                     self.config.update(data[x]["config"])
+                    for section in data[x]["config"]:
+                        self._index_section(section)
+                    self.macros = None
+                    self.status_data = None
                 if "warnings" in data[x]:
                     self.warnings = data[x]["warnings"]
             if x not in self.data:
                 self.data[x] = {}
-            self.data[x].update(data[x])
+            current = self.data[x]
+            changed.extend(
+                (x, field)
+                for field, value in data[x].items()
+                if field not in current or current[field] != value
+            )
+            current.update(data[x])
+        self.set_changed(changed)
 
         if "webhooks" in data or "print_stats" in data or "idle_timeout" in data:
             self.process_status_update()
@@ -161,6 +193,7 @@ class Printer:
         if state != self.state:
             logging.debug(f"Changing state from '{self.state}' to '{state}'")
             self.state = state
+            self.status_data = None
         if self.state_callbacks[state] is not None:
             logging.debug(f"Adding callback for state: {state}")
             GLib.idle_add(self.state_cb, state, self.state_callbacks[state])
@@ -171,21 +204,50 @@ class Printer:
         logging.debug(f"Processing power devices: {data}")
         for x in data["devices"]:
             self.power_devices[x["device"]] = {"status": "on" if x["status"] == "on" else "off"}
+        self.status_data = None
         logging.debug(f"Power devices: {self.power_devices}")
 
     def configure_cameras(self, data):
         self.cameras = data
+        self.status_data = None
         logging.debug(f"Cameras: {self.cameras}")
 
+    def _index_config(self):
+        self.sections = {}
+        self.section_order = {}
+        self.section_names = []
+        self.macros = None
+        for section in self.config:
+            self._index_section(section)
+
+    def _index_section(self, section):
+        if section in self.section_order:
+            return
+        self.section_order[section] = len(self.section_names)
+        self.section_names.append(section)
+        self.sections.setdefault(section.split(" ", 1)[0], []).append(section)
+        self.status_data = None
+
     def get_config_section_list(self, search=""):
-        if getattr(self, "config", None) is not None:
-            return [i for i in self.config if i.startswith(search)]
-        return []
+        if not search:
+            return list(self.section_names)
+        section_type, space, _ = search.partition(" ")
+        if space:
+            types = [section_type] if section_type in self.sections else []
+        else:
+            types = [t for t in self.sections if t.startswith(search)]
+        found = [name for t in types for name in self.sections[t] if name.startswith(search)]
+        if len(types) > 1:
+            found.sort(key=self.section_order.get)
+        return found
 
     def get_config_section(self, section):
         return self.config[section] if section in self.config else False
 
     def get_macro(self, macro):
+        section = f"gcode_macro {macro}"
+        if section in self.config:
+            return self.config[section]
         return next(
             (self.config[key] for key in self.config.keys() if key.find(macro) > -1),
             False,
@@ -206,15 +268,16 @@ class Printer:
         return self.get_config_section_list("output_pin ")
 
     def get_gcode_macros(self):
-        macros = []
-        for macro in self.get_config_section_list("gcode_macro "):
-            macro = macro[12:].strip()
-            if macro.startswith("_") or macro.upper() in ("LOAD_FILAMENT", "UNLOAD_FILAMENT"):
-                continue
-            if self.get_macro(macro) and "rename_existing" in self.get_macro(macro):
-                continue
-            macros.append(macro)
-        return macros
+        if self.macros is None:
+            self.macros = []
+            for section in self.get_config_section_list("gcode_macro "):
+                macro = section[12:].strip()
+                if macro.startswith("_") or macro.upper() in ("LOAD_FILAMENT", "UNLOAD_FILAMENT"):
+                    continue
+                if "rename_existing" in self.config[section]:
+                    continue
+                self.macros.append(macro)
+        return list(self.macros)
 
     def get_heaters(self):
         heaters = self.get_config_section_list("heater_generic ")
@@ -243,7 +306,11 @@ class Printer:
         return None
 
     def get_printer_status_data(self):
-        return {
+        # Shared by every caller, it must not be modified
+        if self.status_data is not None:
+            return self.status_data
+        macros = self.get_gcode_macros()
+        self.status_data = {
             "moonraker": {
                 "power_devices": {"count": len(self.get_power_devices())},
                 "cameras": {"count": len(self.cameras)},
@@ -257,14 +324,15 @@ class Printer:
                 "output_pins": {"count": self.output_pin_count},
                 "pwm_tools": {"count": self.pwm_tools_count},
                 "gcode_macros": {
-                    "count": len(self.get_gcode_macros()),
-                    "list": self.get_gcode_macros(),
+                    "count": len(macros),
+                    "list": macros,
                 },
                 "leds": {"count": self.ledcount},
-                "config_sections": list(self.config.keys()),
-                "available_commands": self.available_commands,
+                "config_sections": list(self.section_names),
+                "available_commands": dict(self.available_commands),
             },
         }
+        return self.status_data
 
     def get_leds(self):
         return [
@@ -316,7 +384,22 @@ class Printer:
         if stat not in self.data:
             logging.error(f"Stat '{stat}' not found in data")
             return
-        self.data[stat].update(data)
+        current = self.data[stat]
+        changed = [
+            (stat, field)
+            for field, value in data.items()
+            if field not in current or current[field] != value
+        ]
+        current.update(data)
+        self.set_changed(changed)
+
+    def set_changed(self, changed):
+        if not changed:
+            return
+        self.revision += 1
+        for path in changed:
+            self.revisions[path] = self.revision
+        self.changed = changed
 
     def get_fan_speed(self, fan="fan"):
         speed = 0
@@ -356,22 +439,26 @@ class Printer:
             return False
 
         if section is not False:
-            if section not in self.tempstore[device]:
-                return False
-            if results == 0 or results >= len(self.tempstore[device][section]):
-                return self.tempstore[device][section]
-            return self.tempstore[device][section][-results:]
-
-        temp = {}
-        for section in self.tempstore[device]:
-            if results == 0 or results >= len(self.tempstore[device][section]):
-                temp[section] = self.tempstore[device][section]
-            else:
-                temp[section] = self.tempstore[device][section][-results:]
-        return temp
+            return self.tempstore.get(device, section, results) or False
+
+        return {
+            section: self.tempstore.get(device, section, results)
+            for section in self.tempstore.sections(device)
+        }
+
+    def get_temp_store_envelope(self, device, section, columns):
+        return self.tempstore.envelope(device, section, columns) or False
 
     def get_tempstore_size(self):
-        return self.tempstore_size
+        return self.tempstore.size
+
+    @property
+    def tempstore_size(self):
+        return self.tempstore.size
+
+    @tempstore_size.setter
+    def tempstore_size(self, size):
+        self.tempstore.resize(size)
 
     def get_temp_devices(self):
         if self.temp_devices is None:
@@ -390,21 +477,9 @@ class Printer:
     def init_temp_store(self, tempstore):
         if self.tempstore and set(self.tempstore) != set(tempstore):
             logging.debug("Tempstore has changed")
-        existing_devices = set(self.tempstore) if self.tempstore else set()
-        new_devices = set(tempstore)
-        for device in new_devices - existing_devices:
-            self.tempstore[device] = tempstore[device]
-        for device in existing_devices | new_devices:
-            if device in tempstore:
-                for section in tempstore[device]:
-                    self.tempstore[device][section] = tempstore[device][section]
-        for device in self.tempstore:
-            for x in self.tempstore[device]:
-                length = len(self.tempstore[device][x])
-                if length < self.tempstore_size:
-                    self.tempstore[device][x] = [0] * (
-                        self.tempstore_size - length
-                    ) + self.tempstore[device][x]
+        for device in tempstore:
+            for section in tempstore[device]:
+                self.tempstore.load(device, section, tempstore[device][section])
         logging.info(f"Temp store: {list(self.tempstore)}")
         if not self.store_timeout:
             self.store_timeout = GLib.timeout_add_seconds(1, self._update_temp_store)
@@ -413,23 +488,75 @@ class Printer:
         return section in self.config or section + " " in self.config
 
     def _update_temp_store(self):
-        if self.tempstore is None:
+        if not self.tempstore:
             return False
-        for device in self.tempstore:
-            for x in self.tempstore[device]:
-                self.tempstore[device][x].pop(0)
-                temp = self.get_stat(device, x[:-1])
-                if not temp:
-                    # If the temperature is not available, set it to 0.
-                    temp = 0
-                self.tempstore[device][x].append(temp)
+        self.tempstore.tick(self._temp_store_sample)
         return True
 
-    def enable_spoolman(self):
-        logging.info("Enabling Spoolman")
-        self.spoolman = True
+    def _temp_store_sample(self, device, section):
+        # If the temperature is not available, set it to 0.
+        return self.get_stat(device, section[:-1]) or 0
+
+    def enable_spoolman(self, enabled=True):
+        logging.info(f"{'Enabling' if enabled else 'Disabling'} Spoolman")
+        self.spoolman = enabled
+        self.status_data = None
+
+    def set_available_commands(self, commands):
+        self.available_commands = commands
+        self.status_data = None
 
     def set_active_spool(self, spool_data):
         self.active_spool = spool_data
         if isinstance(spool_data, dict) and "id" in spool_data:
             self.active_spool_id = spool_data["id"]
+
+
+class StateWatcher:
+    """Calls back when watched fields of printer objects change
+
+    A watcher remembers the revision of the printer it last delivered, so when it is
+    updated again, after a panel was hidden for a while, only the fields that changed
+    since then are delivered. Callbacks get the object name and a dict of changed fields.
+    """
+
+    def __init__(self):
+        self.watched = {}
+        self.printer = None
+        self.revision = 0
+
+    def watch(self, obj, fields, callback):
+        if isinstance(fields, str):
+            fields = (fields,)
+        for field in fields:
+            self.watched.setdefault((obj, field), []).append(callback)
+        # The next update delivers the current values
+        self.printer = None
+
+    def clear(self):
+        self.watched.clear()
+
+    def update(self, printer):
+        if not self.watched:
+            return
+        if self.printer is not printer or self.revision < printer.reset_revision:
+            paths = list(self.watched)
+        elif self.revision == printer.revision:
+            return
+        elif self.revision == printer.revision - 1:
+            paths = [path for path in printer.changed if path in self.watched]
+        else:
+            paths = [
+                path for path in self.watched if printer.revisions.get(path, 0) > self.revision
+            ]
+        self.printer = printer
+        self.revision = printer.revision
+        changes = {}
+        for obj, field in paths:
+            data = printer.data.get(obj)
+            if data is None or field not in data:
+                continue
+            for callback in self.watched[(obj, field)]:
+                changes.setdefault((callback, obj), {})[field] = data[field]
+        for (callback, obj), fields in changes.items():
+            callback(obj, fields)
@@ -4,9 +4,10 @@ import logging
 import gi
 
 gi.require_version("Gtk", "3.0")
-from gi.repository import GLib, Gtk, Pango
+from gi.repository import Gtk, Pango
 
 from ks_includes.KlippyGtk import find_widget
+from ks_includes.printer import StateWatcher
 
 
 class ScreenPanel:
@@ -16,6 +17,8 @@ class ScreenPanel:
     _printer = None
     _gtk = None
     ks_printer_cfg = None
+    # Printer objects and fields needed while the panel is shown, on top of the base set
+    subscriptions = {}
 
     def __init__(self, screen, title, **kwargs):
         self.menu = []
@@ -26,6 +29,8 @@ class ScreenPanel:
         ScreenPanel._gtk = screen.gtk
         self.labels = {}
         self.control = {}
+        # Printer fields watched by the panel, delivered while it is shown
+        self.watcher = StateWatcher()
         self.title = title
         self.devices = {}
         self.active_heaters = []
@@ -51,28 +56,32 @@ class ScreenPanel:
         else:
             self._screen._ws.api.emergency_stop()
 
-    def load_image_async(self, filename, width, height, small=False, callback=None):
+    def load_image_async(self, filename, width, height, small=False, callback=None, priority=0):
         if not self._files.has_thumbnail(filename):
             if callback:
                 callback(None)
-            return
+            return None
         loc = self._files.get_thumbnail_location(filename, small)
         if loc is None:
             if callback:
                 callback(None)
-            return
+            return None
         width = width if width is not None else self._gtk.img_width
         height = height if height is not None else self._gtk.img_height
+        thumbnail_key = self._files.get_thumbnail_key(filename, small)
         if loc[0] == "file":
 
             def _load():
-                pixbuf = self._gtk.PixbufFromFile(loc[1], width, height)
-                if callback:
-                    GLib.idle_add(callback, pixbuf)
-
-            self._gtk._executor.submit(_load)
-        else:
-            self._gtk.PixbufFromHttpAsync(loc[1], width, height, callback)
+                pixbuf = self._gtk.PixbufFromCache(thumbnail_key, width, height)
+                if pixbuf is None:
+                    pixbuf = self._gtk.PixbufFromFile(loc[1], width, height)
+                    self._gtk.store_thumbnail(thumbnail_key, width, height, pixbuf)
+                return pixbuf
+
+            return self._gtk.submit_image(_load, callback, priority)
+        return self._gtk.PixbufFromHttpAsync(
+            loc[1], width, height, callback, thumbnail_key, priority
+        )
 
     def menu_item_clicked(self, widget, item):
         panel_args = {}
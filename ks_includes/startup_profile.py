@@ -0,0 +1,49 @@
+import logging
+import os
+import time
+
+
+def get_process_age():
+    """Seconds since the process was started, 0 when it can't be read"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may have spaces, starttime is the 20th field after it
+            start = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return 0
+    return max(uptime - start / os.sysconf("SC_CLK_TCK"), 0)
+
+
+class StartupProfile:
+    """Timeline of the startup phases, logged once the printer is initialized
+
+    The first phase starts with the process, so it holds the interpreter startup and the
+    module imports. Marks after finish() are ignored, reconnections are not part of it.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.done = not enabled
+        self.start = time.monotonic() - (get_process_age() if enabled else 0)
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, phase):
+        if self.done:
+            return
+        now = time.monotonic()
+        self.phases.append((phase, now - self.last, now - self.start))
+        self.last = now
+
+    def finish(self, phase):
+        if self.done:
+            return
+        self.mark(phase)
+        self.done = True
+        lines = [
+            f"{phase:<20} {elapsed * 1000:8.0f} ms {total * 1000:8.0f} ms"
+            for phase, elapsed, total in self.phases
+        ]
+        logging.info("Startup timeline (phase, duration, since start):\n" + "\n".join(lines))
@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import GLib
+
+
+class StatusDispatcher:
+    """Coalesces notify_status_update messages before they reach the main loop
+
+    Status deltas received on the I/O thread are merged per object and field,
+    then delivered as one update at most `rate` times per second.
+    Other notifications flush the pending status first to keep the order.
+    """
+
+    def __init__(self, callback, rate=10):
+        self._callback = callback
+        self._interval = 1 / rate if rate and rate > 0 else 0
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._scheduled = False
+        self._last_flush = 0
+        self.received = 0
+        self.merged = 0
+        self.delivered = 0
+
+    def notify(self, method, params):
+        if method != "notify_status_update" or not self._interval:
+            GLib.idle_add(self._deliver, method, params, priority=GLib.PRIORITY_HIGH_IDLE)
+            return
+        with self._lock:
+            self.received += 1
+            if self._pending:
+                self.merged += 1
+            for obj, fields in params.items():
+                self._pending.setdefault(obj, {}).update(fields)
+            if self._scheduled:
+                return
+            self._scheduled = True
+            delay = self._last_flush + self._interval - time.monotonic()
+        if delay > 0:
+            GLib.timeout_add(int(delay * 1000), self.flush, priority=GLib.PRIORITY_HIGH_IDLE)
+        else:
+            GLib.idle_add(self.flush, priority=GLib.PRIORITY_HIGH_IDLE)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._scheduled = False
+            self._last_flush = time.monotonic()
+        if pending:
+            self.delivered += 1
+            self._callback("notify_status_update", pending)
+        return False
+
+    def _deliver(self, method, params):
+        self.flush()
+        self._callback(method, params)
+        return False
+
+    def get_stats(self):
+        return {"received": self.received, "merged": self.merged, "delivered": self.delivered}
+
+    def log_stats(self):
+        if self.received:
+            logging.info(
+                f"Status updates: {self.received} received, {self.merged} merged, "
+                f"{self.delivered} delivered"
+            )
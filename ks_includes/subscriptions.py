@@ -0,0 +1,99 @@
+import logging
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import GLib
+
+
+class Subscriptions:
+    """Printer objects subscribed on Moonraker, a base set plus the fields of the shown panels
+
+    Panels declare the objects and fields they need in their `subscriptions` attribute.
+    Every printer.objects.subscribe replaces the previous one of the connection, so the
+    union is only sent again when it changes.
+    """
+
+    def __init__(self, screen):
+        self._screen = screen
+        self.base = {}
+        self.declared = {}
+        self.subscribed = None
+        self.update_source = None
+
+    def reset(self):
+        # Nothing is sent until the printer is initialized again
+        if self.update_source is not None:
+            GLib.source_remove(self.update_source)
+            self.update_source = None
+        self.base = {}
+        self.subscribed = None
+
+    def set_base(self, objects):
+        self.base = objects
+        # A new connection has no subscription yet
+        self.subscribed = None
+        self.update()
+
+    def declare(self, owner, objects):
+        if objects:
+            self.declared[owner] = objects
+        else:
+            self.declared.pop(owner, None)
+        self.queue_update()
+
+    def get_objects(self):
+        objects = {}
+        for source in (self.base, *self.declared.values()):
+            for name, fields in source.items():
+                if fields is None or (name in objects and objects[name] is None):
+                    objects[name] = None
+                else:
+                    objects[name] = sorted(set(objects.get(name, ())) | set(fields))
+        return objects
+
+    def queue_update(self):
+        if self.update_source is None:
+            self.update_source = GLib.idle_add(self.update)
+
+    def update(self):
+        if self.update_source is not None:
+            GLib.source_remove(self.update_source)
+            self.update_source = None
+        if not self.base or self._screen._ws is None:
+            return False
+        objects = self.get_objects()
+        if objects == self.subscribed:
+            return False
+        # The initial query has the values of the first subscription, later ones only
+        # need the values of what was not subscribed before
+        added = [
+            name
+            for name, fields in objects.items()
+            if self.subscribed is not None
+            and (
+                name not in self.subscribed
+                or fields is None
+                or (
+                    self.subscribed[name] is not None
+                    and not set(fields) <= set(self.subscribed[name])
+                )
+            )
+        ]
+        if self._screen._ws.api.object_subscription(
+            {"objects": objects}, self._subscription_callback, added
+        ):
+            logging.debug(f"Subscribed to {len(objects)} objects, new: {added}")
+            self.subscribed = objects
+        return False
+
+    def _subscription_callback(self, result, method, params, added):
+        if "error" in result:
+            logging.error(f"Error subscribing to printer objects: {result['error']}")
+            self.subscribed = None
+            return
+        status = result["result"]["status"]
+        status = {name: status[name] for name in added if name in status}
+        if status:
+            self._screen.printer.process_update(status)
+            self._screen.process_update("notify_status_update", status)
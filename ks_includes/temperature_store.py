@@ -0,0 +1,142 @@
+import logging
+from array import array
+from collections import deque
+
+
+class TemperatureStore:
+    """Fixed-size ring buffers for the temperature history of each device
+
+    Every series is stored twice back to back in a single float array,
+    so the newest `size` samples are always a contiguous slice and can be
+    handed out as a memoryview without copying.
+    """
+
+    def __init__(self, size=1200):
+        self._size = max(int(size), 1)
+        self._series = {}
+        self._head = 0
+        # Global index of the next sample, the window is [count - size, count)
+        self._count = self._size
+        self._envelopes = {}
+
+    @property
+    def size(self):
+        return self._size
+
+    def __bool__(self):
+        return bool(self._series)
+
+    def __contains__(self, device):
+        return device in self._series
+
+    def __iter__(self):
+        return iter(self._series)
+
+    def __len__(self):
+        return len(self._series)
+
+    def clear(self):
+        self._series.clear()
+        self._envelopes.clear()
+        self._head = 0
+        self._count = self._size
+
+    def resize(self, size):
+        size = max(int(size), 1)
+        if size == self._size:
+            return
+        logging.debug(f"Resizing temperature store from {self._size} to {size}")
+        history = {
+            device: {section: self.get(device, section) for section in self._series[device]}
+            for device in self._series
+        }
+        self._size = size
+        self.clear()
+        for device, sections in history.items():
+            for section, values in sections.items():
+                self.load(device, section, values)
+
+    def sections(self, device):
+        return list(self._series.get(device, ()))
+
+    def load(self, device, section, values):
+        """Replace a series with `values`, zero padding the oldest samples"""
+        values = [0.0 if v is None else v for v in values[-self._size :]]
+        ordered = [0.0] * (self._size - len(values)) + values
+        # Rotate so that the oldest sample sits at the shared head position
+        ordered = ordered[self._size - self._head :] + ordered[: self._size - self._head]
+        self._series.setdefault(device, {})[section] = array("f", ordered * 2)
+        self._envelopes.pop((device, section), None)
+
+    def get(self, device, section, results=0):
+        if device not in self._series or section not in self._series[device]:
+            return None
+        if results <= 0 or results > self._size:
+            results = self._size
+        end = self._head + self._size
+        return memoryview(self._series[device][section])[end - results : end]
+
+    def tick(self, sample):
+        """Store one sample per series, `sample(device, section)` returns the value"""
+        for device, sections in self._series.items():
+            for section, buf in sections.items():
+                buf[self._head] = buf[self._head + self._size] = sample(device, section)
+        self._head = (self._head + 1) % self._size
+        self._count += 1
+
+    def envelope(self, device, section, columns):
+        """Decimate a series to at most two points per column
+
+        Returns a list of (index, value) pairs, index being the position of
+        the sample in the full window. Results are cached per column count
+        and only the buckets touched by new samples are recomputed.
+        """
+        view = self.get(device, section)
+        if view is None:
+            return None
+        cache = self._envelopes.setdefault((device, section), {})
+        env = cache.get(columns)
+        if env is None:
+            env = cache[columns] = _Envelope(self._size, columns)
+        return env.update(view, self._count)
+
+
+class _Envelope:
+    def __init__(self, size, columns):
+        self.size = size
+        self.bucket = max(1, -(-size // max(int(columns), 1)))
+        self.buckets = deque()
+        self.count = None
+
+    def _compute(self, view, start, b):
+        lo = max(b * self.bucket, start) - start
+        hi = min((b + 1) * self.bucket, start + self.size) - start
+        values = view[lo:hi].tolist()
+        low = min(values)
+        high = max(values)
+        # Keep global indices so buckets stay valid while the window slides
+        low_i = start + lo + values.index(low)
+        high_i = start + lo + values.index(high)
+        if low_i == high_i:
+            return b, ((low_i, low),)
+        if low_i < high_i:
+            return b, ((low_i, low), (high_i, high))
+        return b, ((high_i, high), (low_i, low))
+
+    def update(self, view, count):
+        start = count - self.size
+        first = start // self.bucket
+        last = (count - 1) // self.bucket
+        if self.count is None or count - self.count >= self.size:
+            self.buckets = deque(self._compute(view, start, b) for b in range(first, last + 1))
+        elif count != self.count:
+            while self.buckets and self.buckets[0][0] < first:
+                self.buckets.popleft()
+            changed = self.count // self.bucket
+            while self.buckets and self.buckets[-1][0] >= changed:
+                self.buckets.pop()
+            self.buckets.extend(self._compute(view, start, b) for b in range(changed, last + 1))
+            if self.buckets[0][0] * self.bucket < start:
+                self.buckets[0] = self._compute(view, start, self.buckets[0][0])
+        self.count = count
+        return [(i - start, v) for _, points in self.buckets for i, v in points]
@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+
+class ThumbnailCache:
+    """Scaled thumbnails stored as PNG files, evicted least recently used first
+
+    Entries are keyed by gcode path, modified time, thumbnail size and the size
+    they were scaled to, so a modified file never hits an entry of its previous version.
+    File names start with a hash of the gcode path to evict all the sizes of a file at once.
+    The directory is scanned on first use, from the image workers, not at startup.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        # Files evicted before the scan, their entries are removed once it's done
+        self._evicted = set()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            try:
+                files = [
+                    (entry.name, entry.stat())
+                    for entry in os.scandir(self.directory)
+                    if entry.name.endswith(".png")
+                ]
+            except OSError as e:
+                logging.error(f"Unable to read the thumbnail cache: {e}")
+                files = []
+            files.sort(key=lambda x: x[1].st_mtime)
+            with self._lock:
+                for name, stat in files:
+                    self._entries[name] = stat.st_size
+                    self._bytes += stat.st_size
+                for prefix in self._evicted:
+                    self._remove_prefix(prefix)
+                self._evicted.clear()
+                self._evict()
+                self._loaded = True
+            logging.info(f"Thumbnail cache: {len(self._entries)} files, {self._bytes >> 10} KiB")
+
+    @staticmethod
+    def _prefix(path):
+        return hashlib.sha1(path.encode()).hexdigest()[:16]
+
+    def _name(self, key, width, height):
+        path, modified, size = key
+        variant = hashlib.sha1(f"{modified}:{size}:{int(width)}x{int(height)}".encode())
+        return f"{self._prefix(path)}-{variant.hexdigest()[:16]}.png"
+
+    def get(self, key, width, height):
+        self._load()
+        name = self._name(key, width, height)
+        with self._lock:
+            if name not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+        path = os.path.join(self.directory, name)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, width, height, pixbuf):
+        self._load()
+        name = self._name(key, width, height)
+        path = os.path.join(self.directory, name)
+        try:
+            pixbuf.savev(f"{path}.tmp", "png", [], [])
+            os.replace(f"{path}.tmp", path)
+            size = os.path.getsize(path)
+        except Exception as e:
+            logging.error(f"Unable to store thumbnail {key[0]}: {e}")
+            return
+        with self._lock:
+            self._bytes += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._evict()
+
+    def evict(self, path):
+        # Called from the main loop, so it never waits for the scan
+        prefix = self._prefix(path)
+        with self._lock:
+            if not self._loaded:
+                self._evicted.add(prefix)
+            self._remove_prefix(prefix)
+
+    def _remove_prefix(self, prefix):
+        for name in [name for name in self._entries if name.startswith(prefix)]:
+            self._remove(name)
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, name):
+        self._bytes -= self._entries.pop(name)
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def get_stats(self):
+        return {
+            "files": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
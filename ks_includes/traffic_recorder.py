@@ -0,0 +1,64 @@
+import gzip
+import logging
+import re
+import threading
+import time
+
+# Values of credentials, like the api_key sent with server.connection.identify
+_SECRETS = ("api_key", "token", "password")
+_SECRET_VALUE = re.compile(rf'("\w*(?:{"|".join(_SECRETS)})"\s*:\s*)"(?:[^"\\]|\\.)*"')
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class TrafficRecorder:
+    """Writes every JSON-RPC frame exchanged with Moonraker to a log, one line per frame
+
+    A line is the time in seconds since the recording started, ">" for sent or "<" for
+    received, and the frame as it was on the wire. Logs ending in .gz are compressed.
+    Credentials are redacted, as logs are meant to be shared to reproduce a problem.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = _open(path, "wt")
+        self._start = time.monotonic()
+        self.frames = 0
+        logging.info(f"Recording Moonraker traffic to {path}")
+
+    def record(self, direction, frame):
+        if isinstance(frame, (bytes, bytearray, memoryview)):
+            frame = bytes(frame).decode("utf-8", errors="replace")
+        if any(secret in frame for secret in _SECRETS):
+            frame = redact(frame)
+        # Frames and replies arrive on the I/O thread, requests are sent from the main loop
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(f"{time.monotonic() - self._start:.6f} {direction} {frame}\n")
+            self.frames += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                logging.info(f"Recorded {self.frames} frames to {self.path}")
+
+
+def redact(frame):
+    """Replaces the string values of the credential keys of a frame"""
+    return _SECRET_VALUE.sub(r'\1"<redacted>"', frame)
+
+
+def read_log(path):
+    """Yields (seconds, direction, frame) for every line of a recording"""
+    with _open(path, "rt") as f:
+        for line in f:
+            stamp, direction, frame = line.rstrip("\n").split(" ", 2)
+            yield float(stamp), direction, frame
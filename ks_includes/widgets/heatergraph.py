@@ -5,6 +5,7 @@ import math
 import gi
 
 gi.require_version("Gtk", "3.0")
+from cairo import Content
 from cairo import Context as cairoContext
 from gi.repository import Gdk, GLib, Gtk
 
@@ -38,6 +39,8 @@ class HeaterGraph(Gtk.DrawingArea):
                     float(self.printer.get_config_section(section)["max_temp"]), self.max_temp
                 )
         self.max_temp = min(self.max_temp, 999)
+        self.static_layer = None
+        self.static_key = None
 
     def update_graph(self):
         self.queue_draw()
@@ -67,25 +70,17 @@ class HeaterGraph(Gtk.DrawingArea):
             self.store.update({name: {"show": True}})
         self.store[name].update({ev_type: {"dashed": dashed, "fill": fill, "rgb": rgb}})
 
-    def get_max_num(self, data_points=0):
+    def get_max_num(self, series):
         mnum = [0]
-        for device in self.store:
-            if self.store[device]["show"]:
-                temp = self.printer.get_temp_store(device, "temperatures", data_points)
-                if isinstance(temp, list):
-                    mnum.append(max([v for v in temp if v is not None]))
-                target = self.printer.get_temp_store(device, "targets", data_points)
-                if isinstance(target, list):
-                    mnum.append(max([v for v in target if v is not None]))
+        for name, dev_type, points in series:
+            if dev_type in ("temperatures", "targets"):
+                mnum.append(max(v for _, v in points))
         return max(mnum)
 
     def draw_graph(self, da: Gtk.DrawingArea, ctx: cairoContext):
         if not self.printer.tempstore:
             return
         style_context = da.get_style_context()
-        Gtk.render_background(
-            style_context, ctx, 0, 0, da.get_allocated_width(), da.get_allocated_height()
-        )
         success, color = style_context.lookup_color("lines")
         if not success:
             color = Gdk.RGBA(0.5, 0.5, 0.5, 1.0)
@@ -95,42 +90,81 @@ class HeaterGraph(Gtk.DrawingArea):
         height = da.get_allocated_height() - self.font_size * 2
         gsize = [[x, y], [width, height]]
 
-        ctx.set_source_rgb(color.red, color.green, color.blue)
-        ctx.set_line_width(1)
-        ctx.set_tolerance(1)
-
-        ctx.rectangle(x, y, width - x, height - y)
-
         graph_width = gsize[1][0] - gsize[0][0]
-        points_per_pixel = self.printer.get_tempstore_size() / graph_width
-        data_points = int(round(graph_width * points_per_pixel, 0))
-        max_num = math.ceil(self.get_max_num(data_points) * 1.1 / 10) * 10
-        if points_per_pixel == 0:
+        data_points = self.printer.get_tempstore_size()
+        points_per_pixel = data_points / graph_width
+        if points_per_pixel <= 0:
             logging.info(f"Data points: {data_points}")
             return
         d_width = 1 / points_per_pixel
 
-        d_height_scale = self.graph_lines(ctx, gsize, max_num, color)
-        self.graph_time(ctx, gsize, points_per_pixel, color)
-
+        # Reduce every series to a min/max envelope per pixel column before drawing
+        series = []
         for name in self.store:
             if not self.store[name]["show"]:
                 continue
             for dev_type in self.store[name]:
-                if d := self.printer.get_temp_store(name, dev_type, data_points):
-                    self.graph_data(
-                        ctx,
-                        d,
-                        gsize,
-                        d_height_scale,
-                        d_width,
-                        self.store[name][dev_type]["rgb"],
-                        self.store[name][dev_type]["dashed"],
-                        self.store[name][dev_type]["fill"],
-                    )
+                if points := self.printer.get_temp_store_envelope(name, dev_type, graph_width):
+                    series.append((name, dev_type, points))
+        max_num = math.ceil(self.get_max_num(series) * 1.1 / 10) * 10
+
+        nscale, rows, d_height_scale = self.graph_scale(gsize, max_num)
+        now = datetime.datetime.now()
+        first = gsize[1][0] - (now.second + ((now.minute % 2) * 60)) / points_per_pixel
+        # The axes only change with the allocation, the scale or the theme, the time ticks
+        # slide with the data so they are drawn on every frame
+        key = (
+            da.get_allocated_width(),
+            da.get_allocated_height(),
+            nscale,
+            rows,
+            color.to_string(),
+        )
+        if key != self.static_key:
+            self.static_layer = self.draw_static_layer(
+                da, ctx, gsize, nscale, rows, d_height_scale, color
+            )
+            self.static_key = key
+        ctx.set_source_surface(self.static_layer, 0, 0)
+        ctx.paint()
+
+        ctx.set_line_width(1)
+        ctx.set_tolerance(1)
+        self.graph_time(ctx, gsize, first, points_per_pixel, now, color)
+        for name, dev_type, points in series:
+            self.graph_data(
+                ctx,
+                points,
+                data_points,
+                gsize,
+                d_height_scale,
+                d_width,
+                self.store[name][dev_type]["rgb"],
+                self.store[name][dev_type]["dashed"],
+                self.store[name][dev_type]["fill"],
+            )
+
+    def draw_static_layer(self, da, target, gsize, nscale, rows, hscale, color):
+        width = da.get_allocated_width()
+        height = da.get_allocated_height()
+        surface = target.get_target().create_similar(Content.COLOR_ALPHA, width, height)
+        ctx = cairoContext(surface)
+        Gtk.render_background(da.get_style_context(), ctx, 0, 0, width, height)
+
+        ctx.set_source_rgb(color.red, color.green, color.blue)
+        ctx.set_line_width(1)
+        ctx.set_tolerance(1)
+        ctx.rectangle(
+            gsize[0][0], gsize[0][1], gsize[1][0] - gsize[0][0], gsize[1][1] - gsize[0][1]
+        )
+
+        self.graph_lines(ctx, gsize, nscale, rows, hscale, color)
+        return surface
 
     @staticmethod
-    def graph_data(ctx: cairoContext, data, gsize, hscale, swidth, rgb, dashed=False, fill=False):
+    def graph_data(
+        ctx: cairoContext, points, length, gsize, hscale, swidth, rgb, dashed=False, fill=False
+    ):
         if fill:
             ctx.set_source_rgba(rgb[0], rgb[1], rgb[2], 0.25)
             ctx.set_dash([1, 0])
@@ -140,15 +174,12 @@ class HeaterGraph(Gtk.DrawingArea):
         else:
             ctx.set_source_rgba(rgb[0], rgb[1], rgb[2], 1)
             ctx.set_dash([1, 0])
-        d_len = len(data) - 1
+        d_len = length - 1
 
         start_x = gsize[1][0]
         end_x = gsize[0][0]
 
-        for i, d in enumerate(data):
-            if d is None:
-                continue
-
+        for n, (i, d) in enumerate(points):
             p_x = i * swidth + gsize[0][0] if i != d_len else gsize[1][0] - 1
             start_x = min(start_x, p_x)
             end_x = max(end_x, p_x)
@@ -156,7 +187,7 @@ class HeaterGraph(Gtk.DrawingArea):
                 p_y = gsize[1][1] - (d * (gsize[1][1] - gsize[0][1]))
             else:
                 p_y = max(gsize[0][1], min(gsize[1][1], gsize[1][1] - 1 - (d * hscale)))
-            if i == 0:
+            if n == 0:
                 ctx.move_to(gsize[0][0], p_y)
             ctx.line_to(p_x, p_y)
         if fill:
@@ -167,13 +198,16 @@ class HeaterGraph(Gtk.DrawingArea):
         else:
             ctx.stroke()
 
-    def graph_lines(self, ctx: cairoContext, gsize, max_num, color):
+    def graph_scale(self, gsize, max_num):
         nscale = 10
         max_num = min(max_num, self.max_temp)
         while (max_num / nscale) > 5:
             nscale += 10
         r = int(max_num / nscale) + 1
         hscale = (gsize[1][1] - gsize[0][1]) / (r * nscale)
+        return nscale, r, hscale
+
+    def graph_lines(self, ctx: cairoContext, gsize, nscale, r, hscale, color):
         ctx.set_font_size(self.font_size)
 
         for i in range(r):
@@ -186,11 +220,8 @@ class HeaterGraph(Gtk.DrawingArea):
             ctx.move_to(gsize[0][0], lheight)
             ctx.line_to(gsize[1][0], lheight)
             ctx.stroke()
-        return hscale
 
-    def graph_time(self, ctx: cairoContext, gsize, points_per_pixel, color):
-        now = datetime.datetime.now()
-        first = gsize[1][0] - (now.second + ((now.minute % 2) * 60)) / points_per_pixel
+    def graph_time(self, ctx: cairoContext, gsize, first, points_per_pixel, now, color):
         steplen = 120 / points_per_pixel  # For 120s
 
         font_size_multiplier = round(self.font_size * 1.5)
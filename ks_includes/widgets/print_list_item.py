@@ -1,16 +1,14 @@
-import gi
+class PrintListItem:
+    """A file or directory of the print list, rows of the list show it when visible"""
 
-gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk
-
-
-class PrintListItem(Gtk.FlowBoxChild):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, item):
+        self.item = item
         self.date = None
         self.size = None
         self.dir = 0
         self.path = None
+        self.name = None
+        self.basename = None
 
     def set_date(self, date):
         self.date = date
@@ -24,6 +22,10 @@ class PrintListItem(Gtk.FlowBoxChild):
     def set_path(self, path):
         self.path = path
 
+    def set_name(self, basename):
+        self.basename = basename
+        self.name = basename.casefold()
+
     def get_date(self):
         return self.date
 
@@ -35,3 +37,12 @@ class PrintListItem(Gtk.FlowBoxChild):
 
     def get_path(self):
         return self.path
+
+    def get_name(self):
+        return self.name
+
+    def get_basename(self):
+        return self.basename
+
+    def get_kind(self):
+        return "dir" if self.dir else "file"
@@ -0,0 +1,236 @@
+import logging
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import GLib, Gtk
+
+
+class VirtualList(Gtk.Layout):
+    """Scrollable grid that only keeps widgets for the entries around the viewport
+
+    Rows are built by create_row(kind), filled by bind_row(row, entry) and released by
+    unbind_row(row). Rows that scroll away are hidden and reused for other entries of the
+    same kind. Visible rows are bound right away, the ones within a page of the viewport
+    in idle time. row.distance is the number of rows between a row and the viewport.
+    """
+
+    BATCH = 4
+
+    def __init__(self, create_row, bind_row, unbind_row=None, columns=1, overscan=1.0):
+        super().__init__(hexpand=True, vexpand=True)
+        self.create_row = create_row
+        self.bind_row = bind_row
+        self.unbind_row = unbind_row
+        self.columns = columns
+        self.overscan = overscan
+        self.entries = []
+        self.sort_key = None
+        self.sort_reverse = False
+        self.sort_group = None
+        self.bound = {}
+        self.pool = {}
+        self.row_height = 0
+        self.visible = (0, 0)
+        self.view_width = 0
+        self.adjustment = None
+        self.idle_source = None
+        self.update_source = None
+        self.connect("size-allocate", self._on_size_allocate)
+        self.connect("destroy", self._on_destroy)
+
+    def set_columns(self, columns):
+        self.columns = columns
+        # Cells change their size and layout, so rows are rebuilt for the new mode
+        for row in self.bound.values():
+            if self.unbind_row is not None:
+                self.unbind_row(row)
+            row.destroy()
+        for row in [row for rows in self.pool.values() for row in rows]:
+            row.destroy()
+        self.bound.clear()
+        self.pool.clear()
+        self.row_height = 0
+        self.queue_update()
+
+    def set_entries(self, entries, presorted=False):
+        self.entries = list(entries)
+        if not presorted:
+            self._sort()
+        self.queue_update()
+
+    def clear(self):
+        self.set_entries([])
+
+    def add_entry(self, entry):
+        # Binary search keeps a single insertion from re-sorting the whole list
+        low, high = 0, len(self.entries)
+        if self.sort_key is not None:
+            while low < high:
+                mid = (low + high) // 2
+                if self._before(entry, self.entries[mid]):
+                    high = mid
+                else:
+                    low = mid + 1
+        self.entries.insert(low, entry)
+        self.queue_update()
+
+    def remove_entry(self, match):
+        for i, entry in enumerate(self.entries):
+            if match(entry):
+                del self.entries[i]
+                self.queue_update()
+                return True
+        return False
+
+    def set_sort_key(self, key, reverse=False, group=None):
+        """Sorts by key, entries of a lower group first whatever the direction"""
+        self.sort_key = key
+        self.sort_reverse = reverse
+        self.sort_group = group
+        self._sort()
+        self.queue_update()
+
+    def _sort(self):
+        if self.sort_key is None:
+            return
+        self.entries.sort(key=self.sort_key, reverse=self.sort_reverse)
+        if self.sort_group is not None:
+            self.entries.sort(key=self.sort_group)
+
+    def _before(self, a, b):
+        if self.sort_group is not None and self.sort_group(a) != self.sort_group(b):
+            return self.sort_group(a) < self.sort_group(b)
+        if self.sort_reverse:
+            return self.sort_key(a) > self.sort_key(b)
+        return self.sort_key(a) < self.sort_key(b)
+
+    def get_entries(self):
+        return self.entries
+
+    def get_rows(self):
+        return list(self.bound.values())
+
+    def get_visible_entries(self):
+        first, last = self._visible_range(0)
+        return self.entries[first:last]
+
+    def queue_update(self):
+        if self.update_source is None:
+            self.update_source = GLib.idle_add(self._update, priority=GLib.PRIORITY_HIGH_IDLE)
+
+    def _on_size_allocate(self, widget, allocation):
+        if self.adjustment is None and self.get_vadjustment() is not None:
+            self.adjustment = self.get_vadjustment()
+            self.adjustment.connect("value-changed", lambda adj: self._update())
+        if allocation.width != self.view_width:
+            self.view_width = allocation.width
+            self.queue_update()
+
+    def _on_destroy(self, widget):
+        for source in (self.idle_source, self.update_source):
+            if source is not None:
+                GLib.source_remove(source)
+        self.idle_source = self.update_source = None
+
+    def _cell_width(self):
+        return max(self.view_width // self.columns, 1)
+
+    def _visible_range(self, overscan):
+        if not self.entries or self.adjustment is None or self.row_height <= 0:
+            return 0, min(self.columns, len(self.entries))
+        page = self.adjustment.get_page_size()
+        top = self.adjustment.get_value() - page * overscan
+        bottom = self.adjustment.get_value() + page * (1 + overscan)
+        first = max(int(top // self.row_height), 0) * self.columns
+        last = (int(bottom // self.row_height) + 1) * self.columns
+        return first, min(last, len(self.entries))
+
+    def _update(self):
+        self.update_source = None
+        if self.view_width <= 1:
+            return False
+        if self.entries and self.row_height <= 0:
+            # The first row gives the height of every row until a taller one is bound
+            self._bind(0, self.entries[0])
+        self.visible = self._visible_range(0)
+        wanted = range(*self._visible_range(self.overscan))
+        keep = {id(self.entries[i]) for i in wanted}
+        for key in [key for key in self.bound if key not in keep]:
+            row = self.bound.pop(key)
+            if self.unbind_row is not None:
+                self.unbind_row(row)
+            row.hide()
+            row.set_no_show_all(True)
+            self.pool.setdefault(row.kind, []).append(row)
+        for i in range(*self.visible):
+            self._bind(i, self.entries[i])
+        for i in wanted:
+            if id(self.entries[i]) in self.bound:
+                self._place(i, self.bound[id(self.entries[i])])
+        rows = -(-len(self.entries) // self.columns)
+        self.set_size(self.view_width, rows * self.row_height)
+        if self.idle_source is None and len(self.bound) < len(wanted):
+            self.idle_source = GLib.idle_add(self._bind_idle, priority=GLib.PRIORITY_LOW)
+        return False
+
+    def _bind_idle(self):
+        pending = [
+            i
+            for i in range(*self._visible_range(self.overscan))
+            if id(self.entries[i]) not in self.bound
+        ]
+        for i in pending[: self.BATCH]:
+            self._bind(i, self.entries[i])
+        if len(pending) > self.BATCH:
+            return True
+        self.idle_source = None
+        return False
+
+    def _bind(self, index, entry):
+        if id(entry) in self.bound:
+            return self.bound[id(entry)]
+        kind = entry.get_kind()
+        if self.pool.get(kind):
+            row = self.pool[kind].pop()
+        else:
+            row = self.create_row(kind)
+            row.kind = kind
+            self.put(row, 0, 0)
+        row.entry = entry
+        row.position = None
+        row.distance = self._distance(index)
+        self.bind_row(row, entry)
+        row.set_size_request(self._cell_width(), -1)
+        row.set_no_show_all(False)
+        row.show_all()
+        height = row.get_preferred_height_for_width(self._cell_width())[1]
+        self.bound[id(entry)] = row
+        if height > self.row_height:
+            logging.debug(f"Row height: {height}")
+            self.row_height = height
+            for i, e in enumerate(self.entries):
+                if id(e) in self.bound:
+                    self._place(i, self.bound[id(e)])
+        else:
+            self._place(index, row)
+        return row
+
+    def _distance(self, index):
+        first, last = self.visible
+        if index < first:
+            return (first - index - 1) // self.columns + 1
+        if index >= last:
+            return (index - last) // self.columns + 1
+        return 0
+
+    def _place(self, index, row):
+        row.distance = self._distance(index)
+        position = (
+            (index % self.columns) * self._cell_width(),
+            (index // self.columns) * self.row_height,
+        )
+        if position != row.position:
+            row.position = position
+            row.set_size_request(self._cell_width(), self.row_height)
+            self.move(row, *position)
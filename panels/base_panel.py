@@ -10,7 +10,6 @@ from datetime import datetime
 from math import log
 
 from gi.repository import GdkPixbuf, Gio, GLib, Gtk, Pango
-from jinja2 import Environment
 
 from ks_includes.screen_panel import ScreenPanel
 from ks_includes.svg_gradient import apply_filament_gradient, filament_colors_from_dict
@@ -295,6 +294,12 @@ class BasePanel(ScreenPanel):
                 self.add_spoolman_box()
                 n += 1
 
+            for device in devices:
+                self.watcher.watch(device, "temperature", self.update_titlebar_temp)
+            if self.current_extruder:
+                self.watcher.watch("toolhead", "extruder", self.update_titlebar_extruder)
+            self.watcher.update(self._printer)
+
             self.control["item_box"].show_all()
             self.titlebar_populated = True
         except Exception as e:
@@ -307,6 +312,7 @@ class BasePanel(ScreenPanel):
         for child in list(self.control["item_box"].get_children()):
             self.control["item_box"].remove(child)
         self.titlebar_labels.clear()
+        self.watcher.clear()
         self.titlebar_populated = False
 
     def add_spoolman_box(self):
@@ -435,7 +441,7 @@ class BasePanel(ScreenPanel):
             return
         if action == "notify_spoolman_status_changed":
             connected = data.get("spoolman_connected", False)
-            self._printer.spoolman = connected
+            self._printer.enable_spoolman(connected)
             self.update_spoolman_weight_label()
             if not connected:
                 if self.spoolman_update is not None:
@@ -446,6 +452,7 @@ class BasePanel(ScreenPanel):
                     self.set_spoolman_refresh()
             return
         if action == "notify_proc_stat_update":
+            self._gtk.image_cache.update_memory(data["system_memory"])
             cpu = data["system_cpu_usage"]["cpu"]
             memory = (data["system_memory"]["used"] / data["system_memory"]["total"]) * 100
             error = "message_popup_error"
@@ -490,46 +497,32 @@ class BasePanel(ScreenPanel):
                         for dialog in self._screen.dialogs:
                             self._gtk.remove_dialog(dialog)
             return
-        if action != "notify_status_update" or self._printer is None:
-            return
-        devices = self._printer.get_temp_devices()
-        if not devices:
-            return
-        for device in devices:
-            temp = self._printer.get_stat(device, "temperature")
-            if temp and device in self.titlebar_labels:
-                name = ""
-                if not (device.startswith("extruder") or device.startswith("heater_bed")):
-                    if self.titlebar_name_type == "full":
-                        name = device.split()[1] if len(device.split()) > 1 else device
-                        name = f"{self.prettify(name)}: "
-                    elif self.titlebar_name_type == "short":
-                        name = device.split()[1] if len(device.split()) > 1 else device
-                        name = f"{name[:1].upper()}: "
-                self.titlebar_labels[device].set_label(f"{name}{temp:.0f}°")
 
-        if (
-            self.current_extruder
-            and "toolhead" in data
-            and "extruder" in data["toolhead"]
-            and data["toolhead"]["extruder"] != self.current_extruder
-        ):
-            current_key = f"{self.current_extruder}_eventbox"
-            new_key = f"{data['toolhead']['extruder']}_eventbox"
-            if current_key in self.titlebar_labels and new_key in self.titlebar_labels:
-                self.control["item_box"].remove(
-                    self.titlebar_labels[f"{self.current_extruder}_eventbox"]
-                )
-                self.current_extruder = data["toolhead"]["extruder"]
-                self.control["item_box"].pack_start(
-                    self.titlebar_labels[f"{self.current_extruder}_eventbox"], True, True, 3
-                )
-                self.control["item_box"].reorder_child(
-                    self.titlebar_labels[f"{self.current_extruder}_eventbox"], 0
-                )
-                self.control["item_box"].show_all()
+    def update_titlebar_temp(self, device, changes):
+        temp = changes["temperature"]
+        if temp and device in self.titlebar_labels:
+            name = ""
+            if not (device.startswith("extruder") or device.startswith("heater_bed")):
+                if self.titlebar_name_type == "full":
+                    name = device.split()[1] if len(device.split()) > 1 else device
+                    name = f"{self.prettify(name)}: "
+                elif self.titlebar_name_type == "short":
+                    name = device.split()[1] if len(device.split()) > 1 else device
+                    name = f"{name[:1].upper()}: "
+            self.titlebar_labels[device].set_label(f"{name}{temp:.0f}°")
 
-        return False
+    def update_titlebar_extruder(self, obj, changes):
+        extruder = changes["extruder"]
+        if not self.current_extruder or extruder == self.current_extruder:
+            return
+        current_key = f"{self.current_extruder}_eventbox"
+        new_key = f"{extruder}_eventbox"
+        if current_key in self.titlebar_labels and new_key in self.titlebar_labels:
+            self.control["item_box"].remove(self.titlebar_labels[current_key])
+            self.current_extruder = extruder
+            self.control["item_box"].pack_start(self.titlebar_labels[new_key], True, True, 3)
+            self.control["item_box"].reorder_child(self.titlebar_labels[new_key], 0)
+            self.control["item_box"].show_all()
 
     def remove(self, widget):
         self.content.remove(widget)
@@ -631,10 +624,7 @@ class BasePanel(ScreenPanel):
             self.titlelbl.set_label(f"{printer}")
             return
         try:
-            env = Environment(extensions=["jinja2.ext.i18n"], autoescape=True)
-            env.install_gettext_translations(self._config.get_lang())
-            j2_temp = env.from_string(title)
-            title = j2_temp.render()
+            title = self._screen.menu_templates.render(title)
         except Exception as e:
             logging.debug(f"Error parsing jinja for title: {title}\n{e}")
 
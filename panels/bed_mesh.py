@@ -12,6 +12,8 @@ from ks_includes.widgets.bedmap import BedMap
 
 
 class Panel(ScreenPanel):
+    subscriptions = {"bed_mesh": ["probed_matrix", "profiles"]}
+
     def __init__(self, screen, title):
         title = title or _("Bed Mesh")
         super().__init__(screen, title)
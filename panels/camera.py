@@ -1,7 +1,6 @@
 import logging
 
 import gi
-import mpv
 
 gi.require_version("Gtk", "3.0")
 from contextlib import suppress
@@ -77,6 +76,9 @@ class Panel(ScreenPanel):
             vf_list.append(f"rotate:{cam['rotation'] * 3.14159 / 180}")
         logging.info(f"video filters: {vf_list}")
 
+        # mpv loads libmpv, it's imported when a stream is played instead of with the panel
+        import mpv
+
         if self.mpv:
             self.mpv.terminate()
         self.mpv = mpv.MPV(fullscreen=True, log_handler=self.log, vo="gpu,wlshm,xv,x11")
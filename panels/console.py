@@ -1,12 +1,14 @@
 import re
 import time
+from collections import deque
+from itertools import islice
 
 import gi
 
 gi.require_version("Gtk", "3.0")
 from datetime import datetime
 
-from gi.repository import Gtk
+from gi.repository import GLib, Gtk
 
 from ks_includes.screen_panel import ScreenPanel
 
@@ -20,10 +22,18 @@ COLORS = {
 
 
 class Panel(ScreenPanel):
+    MAX_LINES = 999
+    TRIM_LINES = 100
+    FLUSH_INTERVAL = 50  # ms
+
     def __init__(self, screen, title):
         title = title or _("Console")
         super().__init__(screen, title)
         self.autoscroll = True
+        # Parsed messages, the last `pending` of them are not in the text buffer yet
+        self.backlog = deque(maxlen=self.MAX_LINES)
+        self.pending = 0
+        self.flush_source = None
 
         o1_button = self._gtk.Button(
             "arrow-down", _("Auto-scroll") + " ", None, self.bts, Gtk.PositionType.RIGHT, 1
@@ -45,8 +55,8 @@ class Panel(ScreenPanel):
         sw = Gtk.ScrolledWindow(hexpand=True, vexpand=True)
 
         tb = Gtk.TextBuffer()
+        self.end_mark = tb.create_mark("end", tb.get_end_iter(), False)
         tv = Gtk.TextView(buffer=tb, editable=False, cursor_visible=False)
-        tv.connect("size-allocate", self._autoscroll)
         tv.connect("touch-event", self._screen.remove_keyboard)
         tv.connect("button-press-event", self._screen.remove_keyboard)
 
@@ -82,6 +92,8 @@ class Panel(ScreenPanel):
 
     def clear(self, widget=None):
         self.labels["tb"].set_text("")
+        self.backlog.clear()
+        self.pending = 0
 
     def add_gcode(self, msgtype, msgtime, message):
         if msgtype == "command":
@@ -97,21 +109,40 @@ class Panel(ScreenPanel):
         else:
             color = COLORS["response"]
 
-        message = f'<span color="{color}"><b>{message}</b></span>'
+        # Pending messages are inserted as one markup string, a stray < or & would drop them all
+        message = f'<span color="{color}"><b>{GLib.markup_escape_text(message)}</b></span>'
 
         message = message.replace("\n", "\n         ")
 
-        self.labels["tb"].insert_markup(
-            self.labels["tb"].get_end_iter(),
+        self.backlog.append(
             f'\n<span color="{COLORS["time"]}">'
-            f"{datetime.fromtimestamp(msgtime).strftime('%H:%M:%S')}</span> {message}",
-            -1,
+            f"{datetime.fromtimestamp(msgtime).strftime('%H:%M:%S')}</span> {message}"
         )
-        # Limit the length
-        if self.labels["tb"].get_line_count() > 999:
-            self.labels["tb"].delete(
-                self.labels["tb"].get_iter_at_line(0), self.labels["tb"].get_iter_at_line(1)
-            )
+        self.pending += 1
+        if self.flush_source is None:
+            self.flush_source = GLib.timeout_add(self.FLUSH_INTERVAL, self.flush)
+
+    def flush(self):
+        if self.flush_source is not None:
+            GLib.source_remove(self.flush_source)
+            self.flush_source = None
+        if not self.pending:
+            return False
+        tb = self.labels["tb"]
+        if self.pending >= len(self.backlog):
+            # Everything in the buffer is older than the backlog, rebuild it in one go
+            tb.set_text("")
+            tb.insert_markup(tb.get_end_iter(), "".join(self.backlog), -1)
+        else:
+            start = len(self.backlog) - self.pending
+            tb.insert_markup(tb.get_end_iter(), "".join(islice(self.backlog, start, None)), -1)
+            # Trim in chunks instead of one line per message
+            lines = tb.get_line_count()
+            if lines > self.MAX_LINES + self.TRIM_LINES:
+                tb.delete(tb.get_start_iter(), tb.get_iter_at_line(lines - self.MAX_LINES))
+        self.pending = 0
+        self._autoscroll()
+        return False
 
     def gcode_response(self, result, method, params):
         if method != "server.gcode_store":
@@ -119,6 +150,7 @@ class Panel(ScreenPanel):
 
         for resp in result["result"]["gcode_store"]:
             self.add_gcode(resp["type"], resp["time"], resp["message"])
+        self.flush()
 
     def process_update(self, action, data):
         if action == "notify_gcode_response":
@@ -137,8 +169,8 @@ class Panel(ScreenPanel):
 
     def _autoscroll(self, *args):
         if self.autoscroll:
-            adj = self.labels["sw"].get_vadjustment()
-            adj.set_value(adj.get_upper() - adj.get_page_size())
+            # The view scrolls once the new text has been laid out
+            self.labels["tv"].scroll_to_mark(self.end_mark, 0, False, 0, 1)
 
     def _send_command(self, *args):
         cmd = self.labels["entry"].get_text()
@@ -0,0 +1,60 @@
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import GLib, Gtk, Pango
+
+from ks_includes.screen_panel import ScreenPanel
+
+
+class Panel(ScreenPanel):
+    def __init__(self, screen, title):
+        title = title or _("Debug")
+        super().__init__(screen, title)
+        self.tb = Gtk.TextBuffer()
+        tv = Gtk.TextView(editable=False, cursor_visible=False, wrap_mode=Pango.WrapMode.WORD_CHAR)
+        tv.set_buffer(self.tb)
+
+        scroll = Gtk.ScrolledWindow(hexpand=True, vexpand=True)
+        scroll.add(tv)
+
+        refresh = self._gtk.Button(
+            "refresh", _("Refresh") + " ", None, self.bts, Gtk.PositionType.RIGHT, 1
+        )
+        refresh.get_style_context().add_class("buttons_slim")
+        refresh.set_vexpand(False)
+        refresh.connect("clicked", self.refresh)
+
+        content_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        content_box.add(refresh)
+        content_box.add(scroll)
+        self.content.add(content_box)
+
+    def activate(self):
+        self.refresh()
+
+    def refresh(self, widget=None):
+        lines = ["<b>Panels</b>  (import / init, ms)"]
+        timings = self._screen.panel_timings
+        for panel in sorted(timings, key=lambda p: -sum(timings[p].values())):
+            load = timings[panel].get("import")
+            init = timings[panel].get("init")
+            lines.append(
+                f"{panel}: {'-' if load is None else f'{load * 1000:.1f}'}"
+                f" / {'-' if init is None else f'{init * 1000:.1f}'}"
+            )
+        lines.append("\n<b>Images</b>")
+        lines.extend(f"{k}: {v}" for k, v in self._gtk.get_image_stats().items())
+        lines.append("\n<b>Image cache</b>")
+        lines.extend(f"{k}: {v}" for k, v in self._gtk.image_cache.get_stats().items())
+        if self._screen.instrumentation is not None:
+            instrumentation = self._screen.instrumentation
+            lines.append("\n<b>Main loop</b>")
+            lines.append(f"stalls: {instrumentation.stalls.format()}")
+            for name, histogram in instrumentation.get_top():
+                lines.append(f"{GLib.markup_escape_text(name)}: {histogram.format()}")
+                lines.append(f"    {GLib.markup_escape_text(histogram.format_buckets())}")
+        if self._screen._ws is not None:
+            lines.append("\n<b>Status updates</b>")
+            lines.extend(f"{k}: {v}" for k, v in self._screen._ws.dispatcher.get_stats().items())
+        self.tb.set_text("")
+        self.tb.insert_markup(self.tb.get_end_iter(), "\n".join(lines), -1)
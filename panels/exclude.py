@@ -10,6 +10,8 @@ from ks_includes.widgets.objectmap import ObjectMap
 
 
 class Panel(ScreenPanel):
+    subscriptions = {"exclude_object": ["current_object", "objects", "excluded_objects"]}
+
     def __init__(self, screen, title):
         title = title or _("Exclude Object")
         super().__init__(screen, title)
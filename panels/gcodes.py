@@ -6,11 +6,12 @@ import gi
 gi.require_version("Gtk", "3.0")
 from datetime import datetime
 
-from gi.repository import Gtk, Pango
+from gi.repository import GLib, Gtk, Pango
 
 from ks_includes.KlippyGtk import find_widget
 from ks_includes.screen_panel import ScreenPanel
-from ks_includes.widgets.flowboxchild_extended import PrintListItem
+from ks_includes.widgets.print_list_item import PrintListItem
+from ks_includes.widgets.virtual_list import VirtualList
 
 
 def format_label(widget):
@@ -42,6 +43,7 @@ class Panel(ScreenPanel):
         self.showing_rename = False
         self.loading = False
         self.cur_directory = "gcodes"
+        self.job_history = {}
         self.list_button_size = self._gtk.img_scale * self.bts
 
         self.headerbox = Gtk.Box(hexpand=True, vexpand=False)
@@ -60,9 +62,18 @@ class Panel(ScreenPanel):
             self.headerbox.add(s)
             n += 1
 
+        self.search_query = ""
+        self.search_update = None
+        self.labels["search"] = Gtk.Entry(hexpand=True, placeholder_text=_("Search"))
+        self.labels["search"].connect("changed", self.search_changed)
+        self.labels["search"].connect("activate", lambda entry: self._screen.remove_keyboard())
+        self.labels["search"].connect("touch-event", self._screen.show_keyboard)
+        self.labels["search"].connect("button-press-event", self._screen.show_keyboard)
+        self.headerbox.add(self.labels["search"])
+
         self.refresh = self._gtk.Button("refresh", style=f"color{n % 4 + 1}", scale=self.bts)
         self.refresh.get_style_context().add_class("buttons_slim")
-        self.refresh.connect("clicked", self._refresh_files)
+        self.refresh.connect("clicked", self._refresh_files, True)
         n += 1
         self.headerbox.add(self.refresh)
 
@@ -78,22 +89,15 @@ class Panel(ScreenPanel):
         self.thumbsize = self._gtk.img_scale * self._gtk.button_image_scale * 2.5
         logging.info(f"Thumbsize: {self.thumbsize:.1f}")
 
-        self.flowbox = Gtk.FlowBox(
-            selection_mode=Gtk.SelectionMode.NONE, column_spacing=0, row_spacing=0
-        )
         list_mode = self._config.get_main_config().get("print_view", "thumbs")
         logging.info(list_mode)
         self.list_mode = list_mode == "list"
-        if self.list_mode:
-            self.flowbox.set_min_children_per_line(1)
-            self.flowbox.set_max_children_per_line(1)
-        else:
-            columns = 3 if self._screen.vertical_mode else 4
-            self.flowbox.set_min_children_per_line(columns)
-            self.flowbox.set_max_children_per_line(columns)
+        self.files_list = VirtualList(
+            self.create_row, self.bind_row, self.unbind_row, self.get_columns()
+        )
 
         self.scroll = self._gtk.ScrolledWindow()
-        self.scroll.add(self.flowbox)
+        self.scroll.add(self.files_list)
 
         self.main = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, vexpand=True)
         self.main.add(self.headerbox)
@@ -101,18 +105,17 @@ class Panel(ScreenPanel):
         self.main.add(self.scroll)
         self.content.add(self.main)
         self.set_loading(True)
-        self._screen._ws.api.get_dir_info(self.load_files, self.cur_directory)
+        self._screen.files.get_directory(self.cur_directory, self.load_files)
+
+    def get_columns(self):
+        if self.list_mode:
+            return 1
+        return 3 if self._screen.vertical_mode else 4
 
     def switch_view_mode(self, widget):
         self.list_mode ^= True
         logging.info(f"lista {self.list_mode}")
-        if self.list_mode:
-            self.flowbox.set_min_children_per_line(1)
-            self.flowbox.set_max_children_per_line(1)
-        else:
-            columns = 3 if self._screen.vertical_mode else 4
-            self.flowbox.set_min_children_per_line(columns)
-            self.flowbox.set_max_children_per_line(columns)
+        self.files_list.set_columns(self.get_columns())
         self._config.set("main", "print_view", "list" if self.list_mode else "thumbs")
         self._config.save_user_config_options()
         self._refresh_files()
@@ -120,111 +123,128 @@ class Panel(ScreenPanel):
     def activate(self):
         if self.cur_directory != "gcodes":
             self.change_dir()
+        else:
+            for row in self.files_list.get_rows():
+                if row.image_request is not None and row.image_request.cancelled:
+                    self.bind_row(row, row.entry)
         self._screen.files.add_callback(self._callback)
 
     def deactivate(self):
         self._screen.files.remove_callback(self._callback)
+        for row in self.files_list.get_rows():
+            if row.image_request is not None:
+                row.image_request.cancel()
 
     def create_item(self, item):
-        fbchild = PrintListItem()
-        fbchild.set_date(item["modified"])
-        fbchild.set_size(item["size"])
-        is_file = "filename" in item
-        is_dir = "dirname" in item
-        if is_dir:
+        entry = PrintListItem(item)
+        entry.set_date(item["modified"])
+        entry.set_size(item["size"])
+        if "dirname" in item:
             name = item["dirname"]
             if name.startswith("."):
                 return None
-            path = f"{self.cur_directory}/{name}"
-            basename = name
-            fbchild.set_as_dir(True)
-        elif is_file:
+            entry.set_path(f"{self.cur_directory}/{name}")
+            entry.set_as_dir(True)
+        elif "filename" in item:
             name = item["filename"]
             if name.startswith("."):
                 return None
-            basename, ext = os.path.splitext(name)
+            name, ext = os.path.splitext(name)
             if ext not in {".gcode", ".gco", ".g"}:
                 return None
-            path = f"{self.cur_directory}/{name}".replace("gcodes/", "")
+            entry.set_path(f"{self.cur_directory}/{item['filename']}".replace("gcodes/", ""))
         else:
             logging.error(f"Unknown item {item}")
             return None
-        fbchild.set_path(path)
-        fbchild.set_name(basename.casefold())
-        if self.list_mode:
-            info = Gtk.Label(
-                hexpand=True,
-                halign=Gtk.Align.START,
-                xalign=0,
-                wrap=True,
-                wrap_mode=Pango.WrapMode.WORD_CHAR,
-            )
-            info.get_style_context().add_class("print-info")
-            info.set_markup(self.get_info_str(item, path))
-            delete = Gtk.Button(
-                hexpand=False, vexpand=False, can_focus=False, always_show_image=True
-            )
-            delete.get_style_context().add_class("color1")
-            delete.set_image(
-                self._gtk.Image("delete", self.list_button_size, self.list_button_size)
-            )
-            rename = Gtk.Button(
-                hexpand=False, vexpand=False, can_focus=False, always_show_image=True
-            )
-            rename.get_style_context().add_class("color2")
-            rename.set_image(self._gtk.Image("edit", self.list_button_size, self.list_button_size))
-            itemname = Gtk.Label(
-                hexpand=True, halign=Gtk.Align.START, ellipsize=Pango.EllipsizeMode.END
-            )
-            itemname.get_style_context().add_class("print-filename")
-            itemname.set_markup(f"<big><b>{basename}</b></big>")
-            icon = Gtk.Button()
-            row = Gtk.Grid(hexpand=True, vexpand=False, valign=Gtk.Align.CENTER)
-            row.get_style_context().add_class("frame-item")
-            if self._screen.width >= 400:
-                row.attach(icon, 0, 0, 1, 2)
-            row.attach(itemname, 1, 0, 3, 1)
-            row.attach(info, 1, 1, 1, 1)
-            row.attach(rename, 2, 1, 1, 1)
-            row.attach(delete, 3, 1, 1, 1)
-            if is_file:
-                icon.connect("clicked", self.confirm_print, path)
-                self.image_load(path, icon, self.thumbsize / 2, True, "file")
-                delete.connect("clicked", self.confirm_delete_file, f"gcodes/{path}")
-                rename.connect("clicked", self.show_rename, f"gcodes/{path}")
+        entry.set_name(name)
+        return entry
+
+    def create_row(self, kind):
+        if not self.list_mode:  # Thumbnail view
+            row = self._gtk.Button(label="")
+            row.connect("clicked", self.row_activated, row)
+            row.image_request = None
+            return row
+        row = Gtk.Grid(hexpand=True, vexpand=False, valign=Gtk.Align.CENTER)
+        row.image_request = None
+        row.get_style_context().add_class("frame-item")
+        row.info = Gtk.Label(
+            hexpand=True,
+            halign=Gtk.Align.START,
+            xalign=0,
+            wrap=True,
+            wrap_mode=Pango.WrapMode.WORD_CHAR,
+        )
+        row.info.get_style_context().add_class("print-info")
+        delete = Gtk.Button(hexpand=False, vexpand=False, can_focus=False, always_show_image=True)
+        delete.get_style_context().add_class("color1")
+        delete.set_image(self._gtk.Image("delete", self.list_button_size, self.list_button_size))
+        delete.connect("clicked", self.row_delete, row)
+        rename = Gtk.Button(hexpand=False, vexpand=False, can_focus=False, always_show_image=True)
+        rename.get_style_context().add_class("color2")
+        rename.set_image(self._gtk.Image("edit", self.list_button_size, self.list_button_size))
+        rename.connect("clicked", self.row_rename, row)
+        row.itemname = Gtk.Label(
+            hexpand=True, halign=Gtk.Align.START, ellipsize=Pango.EllipsizeMode.END
+        )
+        row.itemname.get_style_context().add_class("print-filename")
+        row.icon = Gtk.Button()
+        row.icon.connect("clicked", self.row_activated, row)
+        if self._screen.width >= 400:
+            row.attach(row.icon, 0, 0, 1, 2)
+        row.attach(row.itemname, 1, 0, 3, 1)
+        row.attach(row.info, 1, 1, 1, 1)
+        row.attach(rename, 2, 1, 1, 1)
+        row.attach(delete, 3, 1, 1, 1)
+        if kind == "dir" or self._screen.width >= 400:
+            if kind == "dir":
+                action = self._gtk.Button("load", style="color3")
+            else:
                 action_icon = "printer" if self._printer.extrudercount > 0 else "load"
                 action = self._gtk.Button(action_icon, style="color3")
-                action.connect("clicked", self.confirm_print, path)
-                action.set_hexpand(False)
-                action.set_vexpand(False)
-                action.set_halign(Gtk.Align.END)
-                if self._screen.width >= 400:
-                    row.attach(action, 4, 0, 1, 2)
-                else:
-                    icon.get_style_context().add_class("color3")
-                    row.attach(icon, 4, 0, 1, 2)
-            elif is_dir:
-                icon.connect("clicked", self.change_dir, path)
-                self.image_load(None, icon, self.thumbsize / 2, True, "folder")
-                delete.connect("clicked", self.confirm_delete_directory, path)
-                rename.connect("clicked", self.show_rename, path)
-                action = self._gtk.Button("load", style="color3")
-                action.connect("clicked", self.change_dir, path)
-                action.set_hexpand(False)
-                action.set_vexpand(False)
-                action.set_halign(Gtk.Align.END)
-                row.attach(action, 4, 0, 1, 2)
-            fbchild.add(row)
-        else:  # Thumbnail view
-            icon = self._gtk.Button(label=basename)
-            if is_file:
-                icon.connect("clicked", self.confirm_print, path)
-                self.image_load(path, icon, self.thumbsize, False, "file")
-            elif is_dir:
-                icon.connect("clicked", self.change_dir, path)
-                self.image_load(None, icon, self.thumbsize, False, "folder")
-            fbchild.add(icon)
-        return fbchild
+            action.connect("clicked", self.row_activated, row)
+            action.set_hexpand(False)
+            action.set_vexpand(False)
+            action.set_halign(Gtk.Align.END)
+            row.attach(action, 4, 0, 1, 2)
+        else:
+            row.icon.get_style_context().add_class("color3")
+            row.attach(row.icon, 4, 0, 1, 2)
+        return row
+
+    def bind_row(self, row, entry):
+        path = entry.get_path()
+        filepath, iconname = (None, "folder") if entry.get_is_dir() else (path, "file")
+        if self.list_mode:
+            row.itemname.set_markup(f"<big><b>{entry.get_basename()}</b></big>")
+            row.info.set_markup(self.get_info_str(entry.item, path))
+            self.image_load(filepath, row.icon, self.thumbsize / 2, True, iconname, row)
+        else:
+            row.set_label(entry.get_basename())
+            self.image_load(filepath, row, self.thumbsize, False, iconname, row)
+
+    def unbind_row(self, row):
+        if row.image_request is not None:
+            row.image_request.cancel()
+            row.image_request = None
+
+    def row_activated(self, widget, row):
+        if row.entry.get_is_dir():
+            self.change_dir(widget, row.entry.get_path())
+        else:
+            self.confirm_print(widget, row.entry.get_path())
+
+    def row_delete(self, widget, row):
+        if row.entry.get_is_dir():
+            self.confirm_delete_directory(widget, row.entry.get_path())
+        else:
+            self.confirm_delete_file(widget, f"gcodes/{row.entry.get_path()}")
+
+    def row_rename(self, widget, row):
+        if row.entry.get_is_dir():
+            self.show_rename(widget, row.entry.get_path())
+        else:
+            self.show_rename(widget, f"gcodes/{row.entry.get_path()}")
 
     def show_path(self):
         self.labels["path"].set_vexpand(False)
@@ -234,19 +254,34 @@ class Panel(ScreenPanel):
             self.labels["path"].set_text(self.cur_directory)
             self.labels["path"].show()
 
-    def image_load(self, filepath, widget, size=-1, small=True, iconname=None):
+    def image_load(self, filepath, widget, size=-1, small=True, iconname=None, row=None):
         widget.set_image(self._gtk.Image(iconname, size, size))
         format_label(widget)
 
-        self.load_image_async(
+        if row is None:
+            self.load_image_async(
+                filepath,
+                size,
+                size,
+                small,
+                lambda pixbuf: self._update_image(widget, pixbuf, iconname, size),
+            )
+            return
+        if row.image_request is not None:
+            row.image_request.cancel()
+        # Rows closer to the viewport load first, following the scroll position
+        row.image_request = self.load_image_async(
             filepath,
             size,
             size,
             small,
-            lambda pixbuf: self._update_image(widget, pixbuf, iconname, size),
+            lambda pixbuf: self._update_image(widget, pixbuf, iconname, size, row),
+            lambda: row.distance,
         )
 
-    def _update_image(self, widget, pixbuf, iconname, size):
+    def _update_image(self, widget, pixbuf, iconname, size, row=None):
+        if row is not None:
+            row.image_request = None
         if not widget.get_parent():
             return
         if pixbuf is not None:
@@ -273,6 +308,9 @@ class Panel(ScreenPanel):
         if self.showing_rename:
             self.hide_rename()
             return True
+        if self.search_query:
+            self.labels["search"].set_text("")
+            return True
         if self.cur_directory != "gcodes":
             self.change_dir(None, os.path.dirname(self.cur_directory))
             return True
@@ -309,35 +347,66 @@ class Panel(ScreenPanel):
         self._config.save_user_config_options()
 
     def set_sort(self):
+        if self.search_query:
+            self.show_search_results()
+            return
         reverse = self.sort_current[1] != 0
+        # Directories stay first in both directions
         if self.sort_current[0] == "name":
-            self.flowbox.set_sort_func(self.sort_names, reverse)
+            self.files_list.set_sort_key(self.sort_names, reverse, PrintListItem.get_is_dir)
         elif self.sort_current[0] == "date":
-            self.flowbox.set_sort_func(self.sort_dates, reverse)
+            self.files_list.set_sort_key(self.sort_dates, reverse, PrintListItem.get_is_dir)
         elif self.sort_current[0] == "size":
-            self.flowbox.set_sort_func(self.sort_sizes, reverse)
+            self.files_list.set_sort_key(self.sort_sizes, reverse, PrintListItem.get_is_dir)
 
     @staticmethod
-    def sort_names(a: PrintListItem, b: PrintListItem, reverse):
-        if a.get_is_dir() - b.get_is_dir() != 0:
-            return a.get_is_dir() - b.get_is_dir()
-        if a.get_name() < b.get_name():
-            return 1 if reverse else -1
-        if a.get_name() > b.get_name():
-            return -1 if reverse else 1
-        return 0
+    def sort_names(item: PrintListItem):
+        return item.get_name()
 
     @staticmethod
-    def sort_sizes(a: PrintListItem, b: PrintListItem, reverse):
-        if a.get_is_dir() - b.get_is_dir() != 0:
-            return a.get_is_dir() - b.get_is_dir()
-        return b.get_size() - a.get_size() if reverse else a.get_size() - b.get_size()
+    def sort_sizes(item: PrintListItem):
+        return item.get_size()
 
     @staticmethod
-    def sort_dates(a: PrintListItem, b: PrintListItem, reverse):
-        if a.get_is_dir() - b.get_is_dir() != 0:
-            return a.get_is_dir() - b.get_is_dir()
-        return b.get_date() - a.get_date() if reverse else a.get_date() - b.get_date()
+    def sort_dates(item: PrintListItem):
+        return item.get_date()
+
+    def search_changed(self, entry):
+        query = entry.get_text().strip()
+        if query == self.search_query:
+            return
+        self.search_query = query
+        if query:
+            self.show_search_results()
+        else:
+            self._refresh_files()
+
+    def show_search_results(self):
+        if self.search_update is not None:
+            GLib.source_remove(self.search_update)
+            self.search_update = None
+        if not self.search_query:
+            return False
+        key = {"name": "name", "date": "modified", "size": "size"}[self.sort_current[0]]
+        paths = self._screen.files.search(self.search_query, key, self.sort_current[1] != 0)
+        self.labels["path"].set_text(_("Search") + f": {len(paths)}")
+        self.labels["path"].show()
+        self.files_list.set_entries(map(self.create_search_item, paths), presorted=True)
+        return False
+
+    def create_search_item(self, path):
+        fileinfo = self._screen.files.get_file_info(path)
+        item = {
+            "filename": os.path.basename(path),
+            "modified": fileinfo.get("modified", 0),
+            "size": fileinfo.get("size", 0),
+        }
+        entry = PrintListItem(item)
+        entry.set_date(item["modified"])
+        entry.set_size(item["size"])
+        entry.set_path(path)
+        entry.set_name(os.path.splitext(item["filename"])[0])
+        return entry
 
     def confirm_print(self, widget, filename):
         action = _("Print") if self._printer.extrudercount > 0 else _("Start")
@@ -382,6 +451,7 @@ class Panel(ScreenPanel):
             ellipsize=Pango.EllipsizeMode.END,
         )
         info_box.pack_start(fileinfo, True, True, 0)
+        self.load_last_duration(filename, fileinfo)
 
         inside_box.pack_start(info_box, True, True, 0)
         main_box.pack_start(inside_box, True, True, 0)
@@ -481,17 +551,35 @@ class Panel(ScreenPanel):
             info += (
                 _("Estimated Time") + f": <b>{self.format_time(fileinfo['estimated_time'])}</b>\n"
             )
-        if "job_id" in fileinfo:
-            history = self._screen.restApi.send_request(
-                f"server/history/job?uid={fileinfo['job_id']}"
-            )
-            if history and history["job"]["status"] == "completed":
-                info += (
-                    _("Last Duration")
-                    + f": <b>{self.format_time(history['job']['print_duration'])}</b>"
-                )
         return info
 
+    def load_last_duration(self, filename, label):
+        job_id = self._screen.files.get_file_info(filename).get("job_id")
+        if job_id is None:
+            return
+        if job_id in self.job_history:
+            self._add_last_duration(label, self.job_history[job_id])
+            return
+        self._screen._ws.api.get_single_job_history(job_id, self._job_history_cb, label)
+
+    def _job_history_cb(self, result, method, params, label):
+        if "error" in result or "job" not in result.get("result", {}):
+            logging.debug(f"Unable to get job history for {params['uid']}: {result}")
+            return
+        job = result["result"]["job"]
+        if job["status"] != "in_progress":
+            self.job_history[params["uid"]] = job
+        if label.get_parent():
+            self._add_last_duration(label, job)
+
+    def _add_last_duration(self, label, job):
+        if job["status"] == "completed":
+            label.set_markup(
+                label.get_label()
+                + _("Last Duration")
+                + f": <b>{self.format_time(job['print_duration'])}</b>"
+            )
+
     def load_files(self, result, method, params):
         start = datetime.now()
         self.set_loading(True)
@@ -507,23 +595,23 @@ class Panel(ScreenPanel):
             self.set_loading(False)
             return
 
-        for item in items:
-            fbchild = self.create_item(item)
-            if fbchild is not None:
-                self.flowbox.add(fbchild)
-
+        directory = self.cur_directory.replace("gcodes", "", 1).lstrip("/")
+        self._screen.files.prioritize(
+            os.path.join(directory, item["filename"]) for item in result["result"]["files"]
+        )
         self.set_sort()
+        self.files_list.set_entries(
+            entry for entry in map(self.create_item, items) if entry is not None
+        )
         self.set_loading(False)
         elapsed = (datetime.now() - start).total_seconds()
         logging.info(f"Loaded {total} items in {elapsed:.3f} seconds")
 
     def delete_from_list(self, path):
         logging.info(f"deleting {path}")
-        for item in self.flowbox.get_children():
-            if item.get_path() in {path, f"gcodes/{path}"}:
-                logging.info("found removing")
-                self.flowbox.remove(item)
-                return True
+        if self.files_list.remove_entry(lambda entry: entry.get_path() in {path, f"gcodes/{path}"}):
+            logging.info("found removing")
+            return True
 
     def add_item_from_callback(self, action, data):
         item = data["item"]
@@ -538,14 +626,17 @@ class Panel(ScreenPanel):
             item.update({"path": path, "dirname": os.path.split(item["path"])[1]})
         else:
             item.update({"path": path, "filename": os.path.split(item["path"])[1]})
-        fbchild = self.create_item(item)
-        if fbchild:
-            self.flowbox.add(fbchild)
-            self.flowbox.invalidate_sort()
-            self.flowbox.show_all()
+        entry = self.create_item(item)
+        if entry:
+            self.files_list.add_entry(entry)
 
     def _callback(self, action, data):
         logging.info(f"{action}: {data}")
+        if self.search_query:
+            # Metadata keeps arriving in the background, update the results at most twice a second
+            if self.search_update is None:
+                self.search_update = GLib.timeout_add(500, self.show_search_results)
+            return
         if action in {"create_dir", "create_file"}:
             self.add_item_from_callback(action, data)
         elif action == "delete_file":
@@ -557,12 +648,13 @@ class Panel(ScreenPanel):
                 data["item"]["path"] = data["item"]["path"][7:]
             self.add_item_from_callback(action, data)
 
-    def _refresh_files(self, *args):
+    def _refresh_files(self, widget=None, refresh=False):
         logging.info("Refreshing")
+        self.search_query = ""
+        self.labels["search"].set_text("")
         self.set_loading(True)
-        for child in self.flowbox.get_children():
-            self.flowbox.remove(child)
-        self._screen._ws.api.get_dir_info(self.load_files, self.cur_directory)
+        self.files_list.clear()
+        self._screen.files.get_directory(self.cur_directory, self.load_files, refresh)
 
     def set_loading(self, loading):
         self.loading = loading
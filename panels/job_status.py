@@ -16,6 +16,11 @@ from ks_includes.screen_panel import ScreenPanel
 
 
 class Panel(ScreenPanel):
+    subscriptions = {
+        "motion_report": ["live_position", "live_velocity", "live_extruder_velocity"],
+        "exclude_object": ["current_object", "objects", "excluded_objects"],
+    }
+
     def __init__(self, screen, title):
         title = title or _("Job Status")
         super().__init__(screen, title)
@@ -167,6 +172,37 @@ class Panel(ScreenPanel):
         self.switch_info(info=self.status_grid)
         self.content.add(self.grid)
 
+        for device in self._printer.get_temp_devices():
+            self.watcher.watch(device, ("temperature", "target", "power"), self.update_device)
+        self.watcher.watch("display_status", "message", self.update_display_status)
+        self.watcher.watch("toolhead", ("extruder", "max_accel"), self.update_toolhead)
+        self.watcher.watch("extruder", "pressure_advance", self.update_advance)
+        self.watcher.watch(
+            "gcode_move",
+            ("gcode_position", "extrude_factor", "speed_factor", "speed", "homing_origin"),
+            self.update_gcode_move,
+        )
+        self.watcher.watch(
+            "motion_report",
+            ("live_position", "live_velocity", "live_extruder_velocity"),
+            self.update_motion_report,
+        )
+        for fan in self.fans:
+            self.watcher.watch(fan, "speed", self.update_fans)
+        self.watcher.watch(
+            "print_stats",
+            (
+                "state",
+                "message",
+                "filename",
+                "filament_used",
+                "info",
+                "total_duration",
+                "print_duration",
+            ),
+            self.update_print_stats,
+        )
+
     def create_status_grid(self, widget=None):
         buttons = {
             "speed": self._gtk.Button("speed+", "-", None, self.bts, Gtk.PositionType.LEFT, 1),
@@ -377,6 +413,10 @@ class Panel(ScreenPanel):
         ctx.stroke()
 
     def activate(self):
+        # Only what changed is delivered when the panel is shown again, not the state
+        title = self.get_state_title(self.state)
+        if title:
+            self._screen.set_panel_title(title)
         if self.flow_timeout is None:
             self.flow_timeout = GLib.timeout_add_seconds(2, self.update_flow)
         if self.animation_timeout is None:
@@ -545,156 +585,126 @@ class Panel(ScreenPanel):
                 self.set_state("paused")
             elif "action:resumed" in data:
                 self.set_state("printing")
-            return
         elif action == "notify_metadata_update" and data["filename"] == self.filename:
             self._gtk.clear_file_image_cache()
             self.get_file_metadata(response=True)
-        elif action != "notify_status_update":
-            return
 
-        for x in self._printer.get_temp_devices():
-            if x in data:
-                self.update_temp(
-                    x,
-                    self._printer.get_stat(x, "temperature"),
-                    self._printer.get_stat(x, "target"),
-                    self._printer.get_stat(x, "power"),
-                    digits=0,
-                )
-                if x in self.buttons["extruder"]:
-                    self.buttons["extruder"][x].set_label(self.labels[x].get_text())
-                elif x in self.buttons["heater"]:
-                    self.buttons["heater"][x].set_label(self.labels[x].get_text())
-
-        if "display_status" in data and "message" in data["display_status"]:
-            if data["display_status"]["message"]:
-                self.labels["lcdmessage"].set_label(f"{data['display_status']['message']}")
-                self.labels["lcdmessage"].show()
-            else:
-                self.labels["lcdmessage"].hide()
-
-        if "toolhead" in data:
-            if (
-                "extruder" in data["toolhead"]
-                and data["toolhead"]["extruder"] != self.current_extruder
-            ):
-                self.current_extruder = data["toolhead"]["extruder"]
-                if not self.idex:
-                    self.labels["temp_grid"].remove_column(0)
-                    self.labels["temp_grid"].insert_column(0)
-                    self.labels["temp_grid"].attach(
-                        self.buttons["extruder"][self.current_extruder], 0, 0, 1, 1
-                    )
-                self._screen.show_all()
-            if "max_accel" in data["toolhead"]:
-                self.labels["max_accel"].set_label(
-                    f"{data['toolhead']['max_accel']:.0f} {self.mms2}"
-                )
-        if "extruder" in data and "pressure_advance" in data["extruder"]:
-            self.labels["advance"].set_label(f"{data['extruder']['pressure_advance']:.3f}")
-
-        if "gcode_move" in data:
-            if "gcode_position" in data["gcode_move"]:
-                self.pos_z = round(float(data["gcode_move"]["gcode_position"][2]), 2)
-                self.buttons["z"].set_label(
-                    f"Z: {self.pos_z:6.2f}{f'/{self.oheight}' if self.oheight > 0 else ''} "
-                    f"{f'{self.mm}' if self._screen.width > 500 else ''}"
-                )
-            if "extrude_factor" in data["gcode_move"]:
-                self.extrusion = round(float(data["gcode_move"]["extrude_factor"]) * 100)
-                self.labels["extrude_factor"].set_label(f"{self.extrusion:3}%")
-            if "speed_factor" in data["gcode_move"]:
-                self.speed = round(float(data["gcode_move"]["speed_factor"]) * 100)
-                self.speed_factor = float(data["gcode_move"]["speed_factor"])
-                self.labels["speed_factor"].set_label(f"{self.speed:3}%")
-            if "speed" in data["gcode_move"]:
-                self.req_speed = round(float(data["gcode_move"]["speed"]) / 60 * self.speed_factor)
-                mms_unit = (
-                    f"{self.mms}"
-                    if self.vel < 1000 and self.req_speed < 1000 and self._screen.width > 500
-                    else ""
-                )
-                self.labels["req_speed"].set_label(
-                    f"{self.speed}% {self.vel:3.0f}/{self.req_speed:3.0f} {mms_unit}"
-                )
-                self.buttons["speed"].set_label(self.labels["req_speed"].get_label())
-            if "homing_origin" in data["gcode_move"]:
-                self.zoffset = float(data["gcode_move"]["homing_origin"][2])
-                self.labels["zoffset"].set_label(f"{self.zoffset:.3f} {self.mm}")
-        if "motion_report" in data:
-            if "live_position" in data["motion_report"]:
-                self.labels["pos_x"].set_label(
-                    f"X: {data['motion_report']['live_position'][0]:6.2f}"
-                )
-                self.labels["pos_y"].set_label(
-                    f"Y: {data['motion_report']['live_position'][1]:6.2f}"
-                )
-                self.labels["pos_z"].set_label(
-                    f"Z: {data['motion_report']['live_position'][2]:6.2f}"
-                )
-                pos = data["motion_report"]["live_position"]
-                now = time()
-                if self.prev_pos is not None:
-                    interval = now - self.prev_pos[1]
-                    # Calculate Flowrate
-                    evelocity = (pos[3] - self.prev_pos[0][3]) / interval
-                    self.flowstore.append(self.fila_section * evelocity)
-                self.prev_pos = [pos, now]
-            if "live_velocity" in data["motion_report"]:
-                self.vel = float(data["motion_report"]["live_velocity"])
-                mms_unit = (
-                    f"{self.mms}"
-                    if self.vel < 1000 and self.req_speed < 1000 and self._screen.width > 500
-                    else ""
-                )
-                self.labels["req_speed"].set_label(
-                    f"{self.speed}% {self.vel:3.0f}/{self.req_speed:3.0f} {mms_unit}"
-                )
-                self.buttons["speed"].set_label(self.labels["req_speed"].get_label())
-            if "live_extruder_velocity" in data["motion_report"]:
-                self.flowstore.append(
-                    self.fila_section * float(data["motion_report"]["live_extruder_velocity"])
+    def update_device(self, device, changes):
+        self.update_temp(
+            device,
+            self._printer.get_stat(device, "temperature"),
+            self._printer.get_stat(device, "target"),
+            self._printer.get_stat(device, "power"),
+            digits=0,
+        )
+        if device in self.buttons["extruder"]:
+            self.buttons["extruder"][device].set_label(self.labels[device].get_text())
+        elif device in self.buttons["heater"]:
+            self.buttons["heater"][device].set_label(self.labels[device].get_text())
+
+    def update_display_status(self, obj, changes):
+        if changes["message"]:
+            self.labels["lcdmessage"].set_label(f"{changes['message']}")
+            self.labels["lcdmessage"].show()
+        else:
+            self.labels["lcdmessage"].hide()
+
+    def update_toolhead(self, obj, changes):
+        if "extruder" in changes and changes["extruder"] != self.current_extruder:
+            self.current_extruder = changes["extruder"]
+            if not self.idex:
+                self.labels["temp_grid"].remove_column(0)
+                self.labels["temp_grid"].insert_column(0)
+                self.labels["temp_grid"].attach(
+                    self.buttons["extruder"][self.current_extruder], 0, 0, 1, 1
                 )
+            self._screen.show_all()
+        if "max_accel" in changes:
+            self.labels["max_accel"].set_label(f"{changes['max_accel']:.0f} {self.mms2}")
+
+    def update_advance(self, obj, changes):
+        self.labels["advance"].set_label(f"{changes['pressure_advance']:.3f}")
+
+    def update_gcode_move(self, obj, changes):
+        if "gcode_position" in changes:
+            self.pos_z = round(float(changes["gcode_position"][2]), 2)
+            self.buttons["z"].set_label(
+                f"Z: {self.pos_z:6.2f}{f'/{self.oheight}' if self.oheight > 0 else ''} "
+                f"{f'{self.mm}' if self._screen.width > 500 else ''}"
+            )
+        if "extrude_factor" in changes:
+            self.extrusion = round(float(changes["extrude_factor"]) * 100)
+            self.labels["extrude_factor"].set_label(f"{self.extrusion:3}%")
+        if "speed_factor" in changes:
+            self.speed = round(float(changes["speed_factor"]) * 100)
+            self.speed_factor = float(changes["speed_factor"])
+            self.labels["speed_factor"].set_label(f"{self.speed:3}%")
+        if "speed" in changes:
+            self.req_speed = round(float(changes["speed"]) / 60 * self.speed_factor)
+            self.update_speed_label()
+        if "homing_origin" in changes:
+            self.zoffset = float(changes["homing_origin"][2])
+            self.labels["zoffset"].set_label(f"{self.zoffset:.3f} {self.mm}")
+
+    def update_motion_report(self, obj, changes):
+        if "live_position" in changes:
+            pos = changes["live_position"]
+            self.labels["pos_x"].set_label(f"X: {pos[0]:6.2f}")
+            self.labels["pos_y"].set_label(f"Y: {pos[1]:6.2f}")
+            self.labels["pos_z"].set_label(f"Z: {pos[2]:6.2f}")
+            now = time()
+            if self.prev_pos is not None:
+                interval = now - self.prev_pos[1]
+                # Calculate Flowrate
+                evelocity = (pos[3] - self.prev_pos[0][3]) / interval
+                self.flowstore.append(self.fila_section * evelocity)
+            self.prev_pos = [pos, now]
+        if "live_velocity" in changes:
+            self.vel = float(changes["live_velocity"])
+            self.update_speed_label()
+        if "live_extruder_velocity" in changes:
+            self.flowstore.append(self.fila_section * float(changes["live_extruder_velocity"]))
+
+    def update_speed_label(self):
+        mms_unit = (
+            f"{self.mms}"
+            if self.vel < 1000 and self.req_speed < 1000 and self._screen.width > 500
+            else ""
+        )
+        self.labels["req_speed"].set_label(
+            f"{self.speed}% {self.vel:3.0f}/{self.req_speed:3.0f} {mms_unit}"
+        )
+        self.buttons["speed"].set_label(self.labels["req_speed"].get_label())
+
+    def update_fans(self, obj, changes):
         fan_label = ""
         for fan in self.fans:
             self.fans[fan]["speed"] = f"{self._printer.get_fan_speed(fan) * 100:3.0f}%"
             fan_label += f" {self.fans[fan]['name']}{self.fans[fan]['speed']}"
         if fan_label:
             self.buttons["fan"].set_label(fan_label[:12])
-        if "print_stats" in data:
-            if "state" in data["print_stats"]:
-                self.set_state(
-                    data["print_stats"]["state"],
-                    msg=data["print_stats"].get("message", ""),
-                )
-            if "filename" in data["print_stats"]:
-                self.update_filename(data["print_stats"]["filename"])
-            if "filament_used" in data["print_stats"]:
-                self.labels["filament_used"].set_label(
-                    f"{float(data['print_stats']['filament_used']) / 1000:.1f} m"
-                )
-            if "info" in data["print_stats"]:
-                if (
-                    "total_layer" in data["print_stats"]["info"]
-                    and data["print_stats"]["info"]["total_layer"] is not None
-                ):
-                    self.labels["total_layers"].set_label(
-                        f"{data['print_stats']['info']['total_layer']}"
-                    )
-                if (
-                    "current_layer" in data["print_stats"]["info"]
-                    and data["print_stats"]["info"]["current_layer"] is not None
-                ):
-                    self.labels["layer"].set_label(
-                        f"{data['print_stats']['info']['current_layer']} / "
-                        f"{self.labels['total_layers'].get_text()}"
-                    )
-            if "total_duration" in data["print_stats"]:
-                self.labels["duration"].set_label(
-                    self.format_time(data["print_stats"]["total_duration"])
+
+    def update_print_stats(self, obj, changes):
+        if "state" in changes:
+            self.set_state(changes["state"], msg=changes.get("message", ""))
+        if "filename" in changes:
+            self.update_filename(changes["filename"])
+        if "filament_used" in changes:
+            self.labels["filament_used"].set_label(
+                f"{float(changes['filament_used']) / 1000:.1f} m"
+            )
+        if "info" in changes:
+            info = changes["info"]
+            if info.get("total_layer") is not None:
+                self.labels["total_layers"].set_label(f"{info['total_layer']}")
+            if info.get("current_layer") is not None:
+                self.labels["layer"].set_label(
+                    f"{info['current_layer']} / {self.labels['total_layers'].get_text()}"
                 )
-            if self.state in ["printing", "paused"]:
-                self.update_time_left()
+        if "total_duration" in changes:
+            self.labels["duration"].set_label(self.format_time(changes["total_duration"]))
+        if self.state in ["printing", "paused"]:
+            self.update_time_left()
 
     def update_flow(self):
         if not self.flowstore:
@@ -809,29 +819,32 @@ class Panel(ScreenPanel):
         self.labels["progress_text"].set_label(f"{trunc(progress * 100)}%")
         self.labels["darea"].queue_draw()
 
-    def set_state(self, state, msg=""):
+    def get_state_title(self, state):
         if state == "printing":
-            self._screen.set_panel_title(
-                _("Printing") if self._printer.extrudercount > 0 else _("Working")
-            )
-        elif state == "complete":
+            return _("Printing") if self._printer.extrudercount > 0 else _("Working")
+        return {
+            "complete": _("Complete"),
+            "error": _("Error"),
+            "cancelling": _("Cancelling"),
+            "cancelled": _("Cancelled"),
+            "paused": _("Paused"),
+            "standby": _("Standby"),
+        }.get(state)
+
+    def set_state(self, state, msg=""):
+        cancelled = state == "cancelled" or (state == "standby" and self.state == "cancelled")
+        title = self.get_state_title("cancelled" if cancelled else state)
+        if title:
+            self._screen.set_panel_title(title)
+        if state == "complete":
             self.update_progress(1)
-            self._screen.set_panel_title(_("Complete"))
             self.buttons["left"].set_label("-")
             self._add_timeout(self._config.get_main_config().getint("job_complete_timeout", 0))
         elif state == "error":
-            self._screen.set_panel_title(_("Error"))
             self._screen.show_popup_message(msg)
             self._add_timeout(self._config.get_main_config().getint("job_error_timeout", 0))
-        elif state == "cancelling":
-            self._screen.set_panel_title(_("Cancelling"))
-        elif state == "cancelled" or (state == "standby" and self.state == "cancelled"):
-            self._screen.set_panel_title(_("Cancelled"))
+        elif cancelled:
             self._add_timeout(self._config.get_main_config().getint("job_cancelled_timeout", 0))
-        elif state == "paused":
-            self._screen.set_panel_title(_("Paused"))
-        elif state == "standby":
-            self._screen.set_panel_title(_("Standby"))
         if self.state != state:
             logging.debug(f"Changing job_status state from '{self.state}' to '{state}'")
             self.state = state
@@ -15,7 +15,6 @@ class Panel(ScreenPanel):
         super().__init__(screen, title)
         self.items = items
         self.j2_data = self._printer.get_printer_status_data()
-        self._compiled_enable = {}
         self.create_menu_items()
         self.scroll = self._gtk.ScrolledWindow()
         self.scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
@@ -53,17 +52,10 @@ class Panel(ScreenPanel):
             key = list(self.items[i])[0]
             item = self.items[i][key]
 
-            name = self._screen.env.from_string(item["name"]).render(self.j2_data)
-            icon = (
-                self._screen.env.from_string(item["icon"]).render(self.j2_data)
-                if item["icon"]
-                else None
-            )
-            style = (
-                self._screen.env.from_string(item["style"]).render(self.j2_data)
-                if item["style"]
-                else None
-            )
+            templates = self._screen.menu_templates
+            name = templates.render(item["name"], self.j2_data)
+            icon = templates.render(item["icon"], self.j2_data) if item["icon"] else None
+            style = templates.render(item["style"], self.j2_data) if item["style"] else None
 
             if icon == "notifications" and (
                 bool(self._screen.server_info["warnings"])
@@ -84,7 +76,7 @@ class Panel(ScreenPanel):
 
                 if item["params"] is not False:
                     try:
-                        p = self._screen.env.from_string(item["params"]).render(self.j2_data)
+                        p = templates.render(item["params"], self.j2_data)
                         params = json.loads(p)
                     except Exception as e:
                         logging.exception(f"Unable to parse parameters for [{name}]:\n{e}")
@@ -115,12 +107,7 @@ class Panel(ScreenPanel):
             return self._screen.state.connected
 
         try:
-            tmpl = self._compiled_enable.get(enable)
-            if tmpl is None:
-                tmpl = self._screen.env.from_string(enable)
-                self._compiled_enable[enable] = tmpl
-
-            return tmpl.render(self.j2_data) == "True"
+            return self._screen.menu_templates.render(enable, self.j2_data) == "True"
 
         except Exception as e:
             logging.debug(f"Error evaluating enable statement: {enable}\n{e}")
@@ -7,10 +7,8 @@ gi.require_version("Gtk", "3.0")
 from datetime import datetime
 
 from gi.repository import GLib, Gtk, Pango
-from sdbus_block.networkmanager import enums
 
 from ks_includes.screen_panel import ScreenPanel
-from ks_includes.sdbus_nm import SdbusNm
 
 
 class Panel(ScreenPanel):
@@ -20,6 +18,12 @@ class Panel(ScreenPanel):
         self.last_drop_time = datetime.now()
         self.show_add = False
         try:
+            # sdbus is imported when the panel is created, not when it's preloaded
+            from sdbus_block.networkmanager import enums
+
+            from ks_includes.sdbus_nm import SdbusNm
+
+            self.wifi_type = enums.DeviceType.WIFI
             self.sdbus_nm = SdbusNm(self.popup_callback)
         except Exception as e:
             logging.exception("Failed to initialize")
@@ -113,7 +117,7 @@ class Panel(ScreenPanel):
 
         has_selector = len(self.network_devices) > 1
         primary_is_wifi = self.interface and any(
-            d["interface"] == self.interface and d["type"] == enums.DeviceType.WIFI
+            d["interface"] == self.interface and d["type"] == self.wifi_type
             for d in self.network_devices
         )
 
@@ -244,7 +248,7 @@ class Panel(ScreenPanel):
         selected_dev = next(
             (d for d in self.network_devices if d["interface"] == selected_iface), None
         )
-        is_wifi = selected_dev and selected_dev["type"] == enums.DeviceType.WIFI
+        is_wifi = selected_dev and selected_dev["type"] == self.wifi_type
         if is_wifi:
             self.wifi_toggle_switch.set_sensitive(True)
             self.wifi_toggle_switch.show()
@@ -541,7 +545,7 @@ class Panel(ScreenPanel):
             selected_dev = next(
                 (d for d in self.network_devices if d["interface"] == self.interface), None
             )
-            is_wifi = selected_dev and selected_dev["type"] == enums.DeviceType.WIFI
+            is_wifi = selected_dev and selected_dev["type"] == self.wifi_type
             if is_wifi:
                 if widget:
                     self._gtk.Button_busy(widget, True)
@@ -556,7 +560,7 @@ class Panel(ScreenPanel):
             selected_dev = next(
                 (d for d in self.network_devices if d["interface"] == self.interface), None
             )
-            is_wifi = selected_dev and selected_dev["type"] == enums.DeviceType.WIFI
+            is_wifi = selected_dev and selected_dev["type"] == self.wifi_type
             if is_wifi:
                 if self.reload_button.get_sensitive():
                     self._gtk.Button_busy(self.reload_button, True)
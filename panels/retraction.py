@@ -9,6 +9,15 @@ from ks_includes.screen_panel import ScreenPanel
 
 
 class Panel(ScreenPanel):
+    subscriptions = {
+        "firmware_retraction": [
+            "retract_length",
+            "retract_speed",
+            "unretract_extra_length",
+            "unretract_speed",
+        ]
+    }
+
     def __init__(self, screen, title):
         title = title or _("Retraction")
         super().__init__(screen, title)
@@ -44,6 +44,8 @@ class Panel(ScreenPanel):
             self.grid.attach(self.create_right_panel(), 1, 0, 1, 1)
 
         self.content.add(self.grid)
+        for device in self._printer.get_temp_devices():
+            self.watcher.watch(device, ("temperature", "target", "power"), self.update_device)
 
     def create_right_panel(self):
         cooldown = self._gtk.Button(
@@ -570,21 +572,15 @@ class Panel(ScreenPanel):
         else:
             self.popover_buttons["set_temp"].hide()
 
-    def process_update(self, action, data):
-        if action != "notify_status_update":
+    def update_device(self, device, changes):
+        if device not in self.devices and not self.add_device(device):
             return
-
-        for device in self._printer.get_temp_devices():
-            if device not in data:
-                continue
-            if device not in self.devices and not self.add_device(device):
-                return
-            self.update_temp(
-                device,
-                self._printer.get_stat(device, "temperature"),
-                self._printer.get_stat(device, "target"),
-                self._printer.get_stat(device, "power"),
-            )
+        self.update_temp(
+            device,
+            self._printer.get_stat(device, "temperature"),
+            self._printer.get_stat(device, "target"),
+            self._printer.get_stat(device, "power"),
+        )
 
     def show_numpad(self, widget, device=None):
         for d in self.active_heaters:
@@ -9,6 +9,7 @@ import os
 import pathlib
 import subprocess
 import sys
+import time
 import traceback  # noqa
 from dataclasses import dataclass
 
@@ -26,13 +27,18 @@ from jinja2 import Environment
 from ks_includes import functions
 from ks_includes.config import KlipperScreenConfig
 from ks_includes.files import KlippyFiles
+from ks_includes.instrumentation import Instrumentation
 from ks_includes.KlippyGtk import KlippyGtk
 from ks_includes.KlippyRest import KlippyRest
 from ks_includes.KlippyUDS import KlippyUDS
 from ks_includes.KlippyWebsocket import KlippyWebsocket
+from ks_includes.menu_templates import MenuTemplates
 from ks_includes.notification_handler import NotificationHandler
 from ks_includes.printer import Printer
 from ks_includes.spoolman_api import SpoolmanAPI
+from ks_includes.startup_profile import StartupProfile
+from ks_includes.subscriptions import Subscriptions
+from ks_includes.traffic_recorder import TrafficRecorder
 from ks_includes.widgets.keyboard import Keyboard
 from ks_includes.widgets.lockscreen import LockScreen
 from ks_includes.widgets.prompts import Prompt
@@ -60,15 +66,18 @@ class AppState:
 class KlipperScreen(Gtk.ApplicationWindow):
     MAX_RETRIES = 4
 
-    def __init__(self, args):
+    def __init__(self, args, startup=None):
         try:
             super().__init__(title="KlipperScreen")
         except Exception as e:
             logging.exception(f"{e}\n\n{traceback.format_exc()}")
             raise RuntimeError from e
         self.state: AppState = AppState()
+        self.startup = startup or StartupProfile()
         self.panels = {}
         self.panels_reinit = []
+        self.panel_timings = {}
+        self.preload_source = None
         self._cur_panels = []
 
         self.server_info = None
@@ -77,6 +86,10 @@ class KlipperScreen(Gtk.ApplicationWindow):
         self.printers = None
         self.restApi = None
         self._ws = None
+        self.recorder = None
+        if args.record:
+            self.recorder = TrafficRecorder(os.path.normpath(os.path.expanduser(args.record)))
+        self.subscriptions = Subscriptions(self)
 
         self.keyboard = None
         self.keyboard_cache = {}
@@ -98,11 +111,21 @@ class KlipperScreen(Gtk.ApplicationWindow):
         configfile = os.path.normpath(os.path.expanduser(args.configfile))
 
         self._config = KlipperScreenConfig(configfile, self)
+        self.startup.mark("config")
+        self.instrumentation = None
+        if self._config.get_main_config().getboolean("instrumentation", False):
+            threshold = self._config.get_main_config().getint("stall_threshold", 200)
+            self.instrumentation = Instrumentation(threshold / 1000)
+            self.instrumentation.install()
         self.env = Environment(extensions=["jinja2.ext.i18n"], autoescape=True)
         self.env.install_gettext_translations(self._config.get_lang())
+        self.menu_templates = MenuTemplates(self.env)
+        self.menu_templates.load(self._config.get_config())
+        self.startup.mark("menu templates")
 
         self.connect("key-press-event", self._key_press_event)
         self.connect("configure_event", self.update_size)
+        self.first_draw = self.connect("draw", self._on_first_draw)
         display = Gdk.Display.get_default()
         self.display_number = os.environ.get("DISPLAY") or ":0"
         logging.debug(f"Display for xset: {self.display_number}")
@@ -154,11 +177,17 @@ class KlipperScreen(Gtk.ApplicationWindow):
         self.screensaver = ScreenSaver(self)
         self.lock_screen = LockScreen(self)
         self.gtk = KlippyGtk(self)
+        self.startup.mark("window")
         self.base_css = ""
         self.load_base_styles()
         self.set_icon_from_file(os.path.join(klipperscreendir, "styles", "icon.svg"))
+        self.startup.mark("css")
         self.base_panel = BasePanel(self)
+        if self.instrumentation is not None:
+            self.instrumentation.wrap_methods(self.base_panel, "base_panel", "process_update")
+        self.startup.mark("base panel")
         self.change_theme(self.theme)
+        self.startup.mark("theme")
         self.overlay = Gtk.Overlay()
         self.add(self.overlay)
         self.overlay.add_overlay(self.base_panel.main_grid)
@@ -188,9 +217,8 @@ class KlipperScreen(Gtk.ApplicationWindow):
         autolock = self._config.get_main_config().getint("autolock_timeout", fallback=0)
         self.lock_screen.set_autolock_timeout(autolock)
         self.log_notification("KlipperScreen Started", 1)
-        self.initial_connection()
-        if self._config.get_main_config().getboolean("start_locked", False):
-            self.lock_screen.lock(None)
+        # Connecting waits for the first frame, so the window shows up before the clients load
+        GLib.idle_add(self.start_connection)
         self.set_screenblanking_timeout(self._config.get_main_config().get("screen_blanking"))
 
     def update_cursor(self, show: bool):
@@ -237,6 +265,17 @@ class KlipperScreen(Gtk.ApplicationWindow):
             self.base_panel.show_printer_select(True)
             self.show_printer_select()
 
+    def start_connection(self):
+        self.initial_connection()
+        if self._config.get_main_config().getboolean("start_locked", False):
+            self.lock_screen.lock(None)
+        return False
+
+    def _on_first_draw(self, widget, context):
+        self.disconnect(self.first_draw)
+        self.startup.mark("first paint")
+        return False
+
     def close_connection(self):
         self._ws.close()
         self.printer.state = "disconnected"
@@ -257,17 +296,27 @@ class KlipperScreen(Gtk.ApplicationWindow):
         )
         self.printer = self.printers[ind]["data"]
         moonraker_host = self.printers[ind][name]["moonraker_host"]
+        main_config = self._config.get_main_config()
+        status_rate = main_config.getfloat("status_update_rate", 10)
         is_uds = moonraker_host.startswith(("/", "~"))
         rest_host = "localhost" if is_uds else moonraker_host
 
+        if self.restApi is not None:
+            self.restApi.close()
         self.restApi = KlippyRest(
             rest_host,
             self.printers[ind][name]["moonraker_port"],
             self.printers[ind][name]["moonraker_api_key"],
             self.printers[ind][name]["moonraker_path"],
             self.printers[ind][name]["moonraker_ssl"],
+            retries=main_config.getint("moonraker_retries", 2),
+            timeout=main_config.getfloat("moonraker_timeout", 4),
+            files_timeout=main_config.getfloat("moonraker_files_timeout", 10),
         )
+        if self.instrumentation is not None:
+            self.instrumentation.wrap_methods(self.restApi, "rest", "send_request", "post_request")
         self._notification_handler = NotificationHandler(self)
+        self.subscriptions.reset()
         self.state.printer_is_local = is_uds or moonraker_host in ("localhost", "127.0.0.1")
 
         if is_uds:
@@ -283,6 +332,8 @@ class KlipperScreen(Gtk.ApplicationWindow):
                 self.printers[ind][name]["moonraker_port"],
                 self.printers[ind][name]["moonraker_api_key"],
                 self.printers[ind][name]["moonraker_path"],
+                status_rate=status_rate,
+                recorder=self.recorder,
             )
         else:
             self._ws = KlippyWebsocket(
@@ -297,6 +348,8 @@ class KlipperScreen(Gtk.ApplicationWindow):
                 self.printers[ind][name]["moonraker_api_key"],
                 self.printers[ind][name]["moonraker_path"],
                 self.printers[ind][name]["moonraker_ssl"],
+                status_rate=status_rate,
+                recorder=self.recorder,
             )
         self.spoolman_api = SpoolmanAPI(self._ws)
         if self.files is None:
@@ -311,7 +364,7 @@ class KlipperScreen(Gtk.ApplicationWindow):
     def ws_subscribe(self):
         requested_updates = {
             "objects": {
-                "bed_mesh": ["profile_name", "mesh_max", "mesh_min", "probed_matrix", "profiles"],
+                "bed_mesh": ["profile_name", "mesh_max", "mesh_min"],
                 "configfile": ["config", "warnings"],
                 "display_status": ["progress", "message"],
                 "fan": ["speed"],
@@ -346,14 +399,6 @@ class KlipperScreen(Gtk.ApplicationWindow):
                 ],
                 "virtual_sdcard": ["file_position", "is_active", "progress"],
                 "webhooks": ["state", "state_message"],
-                "firmware_retraction": [
-                    "retract_length",
-                    "retract_speed",
-                    "unretract_extra_length",
-                    "unretract_speed",
-                ],
-                "motion_report": ["live_position", "live_velocity", "live_extruder_velocity"],
-                "exclude_object": ["current_object", "objects", "excluded_objects"],
                 "manual_probe": ["is_active"],
                 "screws_tilt_adjust": ["results", "error", "max_deviation"],
             }
@@ -381,16 +426,79 @@ class KlipperScreen(Gtk.ApplicationWindow):
         for led in self.printer.get_leds():
             requested_updates["objects"][led] = ["color_data"]
 
-        self._ws.api.object_subscription(requested_updates)
+        self.subscriptions.set_base(requested_updates["objects"])
 
-    @staticmethod
-    def _load_panel(panel):
+    def _load_panel(self, panel):
+        module = f"panels.{panel}"
+        if module in sys.modules:
+            return sys.modules[module]
         logging.debug(f"Loading panel: {panel}")
         panel_path = os.path.join(os.path.dirname(__file__), "panels", f"{panel}.py")
         if not os.path.exists(panel_path):
             logging.error(f"Panel {panel} does not exist")
             raise FileNotFoundError(os.strerror(2), "\n" + panel_path)
-        return import_module(f"panels.{panel}")
+        start = time.perf_counter()
+        module = import_module(module)
+        self._log_panel_timing(panel, "import", time.perf_counter() - start)
+        return module
+
+    def _log_panel_timing(self, panel, stage, elapsed):
+        self.panel_timings.setdefault(panel, {})[stage] = elapsed
+        logging.info(f"Panel {panel} {stage} took {elapsed * 1000:.1f} ms")
+        if self.instrumentation is not None:
+            self.instrumentation.record(f"panels.{panel}.{stage}", elapsed)
+
+    def _create_panel(self, panel, title, **kwargs):
+        panel_class = self._load_panel(panel).Panel
+        start = time.perf_counter()
+        instance = panel_class(self, title, **kwargs)
+        self._log_panel_timing(panel, "init", time.perf_counter() - start)
+        if self.instrumentation is not None:
+            self.instrumentation.wrap_methods(
+                instance, f"panels.{panel}", "process_update", "activate", "deactivate"
+            )
+        return instance
+
+    def get_preload_panels(self):
+        # Panels shown without user interaction go first, then the menus in display order
+        panels = ["job_status", "gcodes"]
+        menus = [(menu, "") for menu in ("__main", "__print")]
+        while menus:
+            menu, subsection = menus.pop(0)
+            for item in self._config.get_menu_items(menu, subsection):
+                name = list(item)[0]
+                if item[name]["panel"]:
+                    panels.append(item[name]["panel"])
+                elif not item[name]["method"]:
+                    menus.append((menu, name))
+        panels_dir = os.path.join(os.path.dirname(__file__), "panels")
+        return [
+            panel
+            for panel in dict.fromkeys(panels)
+            if f"panels.{panel}" not in sys.modules
+            and os.path.exists(os.path.join(panels_dir, f"{panel}.py"))
+        ]
+
+    def preload_panels(self):
+        if self.preload_source is not None:
+            return
+        queue = self.get_preload_panels()
+        logging.debug(f"Preloading panels: {queue}")
+        if queue:
+            self.preload_source = GLib.idle_add(
+                self._preload_next, queue, priority=GLib.PRIORITY_LOW
+            )
+
+    def _preload_next(self, queue):
+        panel = queue.pop(0)
+        try:
+            self._load_panel(panel)
+        except Exception as e:
+            logging.error(f"Unable to preload panel {panel}: {e}")
+        if queue:
+            return True
+        self.preload_source = None
+        return False
 
     def show_panel(self, panel, title=None, remove_all=False, panel_name=None, **kwargs):
         if panel_name is None:
@@ -414,7 +522,7 @@ class KlipperScreen(Gtk.ApplicationWindow):
                 self._remove_current_panel()
             if panel_name not in self.panels:
                 try:
-                    self.panels[panel_name] = self._load_panel(panel).Panel(self, title, **kwargs)
+                    self.panels[panel_name] = self._create_panel(panel, title, **kwargs)
                 except Exception as e:
                     self.show_error_modal(
                         f"Unable to load panel {panel}", f"{e}\n\n{traceback.format_exc()}"
@@ -422,7 +530,9 @@ class KlipperScreen(Gtk.ApplicationWindow):
                     return
             elif panel_name in self.panels_reinit:
                 logging.info(f"Reinitializing panel {panel}")
+                start = time.perf_counter()
                 self.panels[panel_name].__init__(self, title, **kwargs)
+                self._log_panel_timing(panel, "init", time.perf_counter() - start)
                 self.panels_reinit.remove(panel_name)
             self._cur_panels.append(panel_name)
             if "extra" in kwargs and hasattr(self.panels[panel], "set_extra"):
@@ -452,10 +562,17 @@ class KlipperScreen(Gtk.ApplicationWindow):
         logging.debug(f"Current panel hierarchy: {' > '.join(self._cur_panels)}")
         while len(self.panels[panel].menu) > 1:
             self.panels[panel].unload_menu()
-        if hasattr(self.panels[panel], "process_update") and self.printer:
-            self.process_update("notify_status_update", self.printer.data)
+        if self.printer:
+            # Watched fields only get what changed while the panel was hidden
+            self.panels[panel].watcher.update(self.printer)
+            if (
+                hasattr(self.panels[panel], "process_update")
+                and not self.panels[panel].watcher.watched
+            ):
+                self.process_update("notify_status_update", self.printer.data)
         if hasattr(self.panels[panel], "activate"):
             self.panels[panel].activate()
+        self.subscriptions.declare("panel", self.panels[panel].subscriptions)
         self.show_all()
 
     def log_notification(self, message, level=0):
@@ -837,6 +954,7 @@ class KlipperScreen(Gtk.ApplicationWindow):
         self.last_error = f"{status}"
 
     def socket_connected(self):
+        self.startup.mark("connect")
         self.printer_initializing(_("Moonraker Connected"))
         self._ws.api.identify_client(functions.get_software_version(), self._ws.api_key)
         self.state.reinit_count = 0
@@ -851,6 +969,8 @@ class KlipperScreen(Gtk.ApplicationWindow):
         logging.debug("### disconnected")
         self.server_info = None
         self.printer.state = "disconnected"
+        if self.files is not None:
+            self.files.reset_requests()
         go_to_splash = self.state.connected  # Go to splashscreen if it was connected
         self.state.connected = False
         self.reconnect(status, go_to_splash)
@@ -939,12 +1059,16 @@ class KlipperScreen(Gtk.ApplicationWindow):
     def change_language(self, widget, lang):
         self._config.install_language(lang)
         self.env.install_gettext_translations(self._config.get_lang())
+        self.menu_templates.load(self._config.get_config())
         self._config._create_configurable_options(self)
         self._config.set("main", "language", lang)
         self._config.save_user_config_options()
         self.reload_panels()
 
     def reload_panels(self, *args):
+        if not self._cur_panels:
+            # Nothing is shown until the connection starts
+            return
         if "printer_select" in self._cur_panels:
             self.show_printer_select()
             return
@@ -957,6 +1081,10 @@ class KlipperScreen(Gtk.ApplicationWindow):
             self.show_panel(home)
 
     def _socket_callback(self, action, data):
+        if self.instrumentation is not None:
+            with self.instrumentation.measure(f"notification.{action}"):
+                self._notification_handler.handle(action, data)
+            return
         self._notification_handler.handle(action, data)
 
     def get_active_spool(self):
@@ -997,6 +1125,10 @@ class KlipperScreen(Gtk.ApplicationWindow):
             self.show_panel(*action)
 
     def process_update(self, *args):
+        if args[0] == "notify_status_update" and self.printer:
+            self.base_panel.watcher.update(self.printer)
+            if self._cur_panels:
+                self.panels[self._cur_panels[-1]].watcher.update(self.printer)
         self.base_panel.process_update(*args)
         if (
             self.printer
@@ -1063,8 +1195,7 @@ class KlipperScreen(Gtk.ApplicationWindow):
         ]
 
         try:
-            j2_temp = self.env.from_string(text)
-            text = j2_temp.render()
+            text = self.menu_templates.render(text)
         except Exception as e:
             logging.debug(
                 f"Error parsing jinja for confirm_send_action\n{e}\n\n{traceback.format_exc()}"
@@ -1105,6 +1236,7 @@ class KlipperScreen(Gtk.ApplicationWindow):
                 GLib.timeout_add(150, self.gtk.Button_busy, x, False)
 
     def printer_initializing(self, msg, go_to_splash=False):
+        self.subscriptions.reset()
         if "splash_screen" not in self.panels or go_to_splash:
             self.show_panel("splash_screen", remove_all=True)
         self.panels["splash_screen"].update_text(msg)
@@ -1250,7 +1382,7 @@ class KlipperScreen(Gtk.ApplicationWindow):
             error_msg = data["error"].get("message", "Unknown error")
             logging.error(f"Error getting available gcode commands: {error_msg}")
             return
-        self.printer.available_commands = data["result"]
+        self.printer.set_available_commands(data["result"])
 
     def set_system_info(self, data, method, params):
         if "error" in data:
@@ -1316,6 +1448,8 @@ class KlipperScreen(Gtk.ApplicationWindow):
         self.state.reinit_count = 0
         self.state.klippy_retry_count = 0
         self.log_notification("Printer Initialized", 1)
+        self.preload_panels()
+        self.startup.finish("_finish_init")
 
     def init_tempstore(self):
         self._ws.api.get_temperature_store(self.set_tempstore)
@@ -1324,23 +1458,19 @@ class KlipperScreen(Gtk.ApplicationWindow):
         temp_devices = self.printer.get_temp_devices()
         if not temp_devices:
             return
+        tempstore = {}
         if "error" in data:
             error_msg = data["error"].get("message", "Unknown error")
             logging.error(f"Error getting temperature store: {error_msg}")
         elif "result" not in data or not data["result"]:
             logging.info("Moonraker tempstore not yet available")
         else:
-            self.printer.tempstore = data["result"]
+            tempstore = data["result"]
 
-        if not self.printer.tempstore:
-            self.printer.tempstore = {}
-            for device in temp_devices:
-                self.printer.tempstore[device] = {
-                    "temperatures": [0] * self.printer.tempstore_size,
-                    "targets": [0] * self.printer.tempstore_size,
-                }
+        if not tempstore and not self.printer.tempstore:
+            tempstore = {device: {"temperatures": [], "targets": []} for device in temp_devices}
 
-        self.printer.init_temp_store(self.printer.tempstore)
+        self.printer.init_temp_store(tempstore)
         if self.panels and self._cur_panels:
             if hasattr(self.panels[self._cur_panels[-1]], "update_graph_visibility"):
                 self.panels[self._cur_panels[-1]].update_graph_visibility()
@@ -1449,18 +1579,22 @@ class KlipperScreen(Gtk.ApplicationWindow):
 
 
 class KlipperScreenApplication(Gtk.Application):
-    def __init__(self, args):
+    def __init__(self, args, startup):
         super().__init__(application_id="org.klipperscreen.KlipperScreen")
         self._args = args
+        self._startup = startup
 
     def do_activate(self):
-        self._win = KlipperScreen(self._args)
+        self._startup.mark("application")
+        self._win = KlipperScreen(self._args, self._startup)
         self._win.connect("destroy", self._on_destroy)
         self.add_window(self._win)
 
     @staticmethod
     def _on_destroy(win):
         win.gtk.shutdown()
+        if win.recorder is not None:
+            win.recorder.close()
 
 
 def main():
@@ -1491,12 +1625,27 @@ def main():
         metavar="<monitor>",
         help="Number of the monitor, that will show Klipperscreen (default: 0)",
     )
+    parser.add_argument(
+        "-r",
+        "--record",
+        default="",
+        metavar="<file>",
+        help="Record the Moonraker traffic to a file for replay, compressed if it ends in .gz",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Log how long each startup phase takes",
+    )
     args = parser.parse_args()
+    startup = StartupProfile(args.profile_startup)
+    startup.mark("imports")
 
     functions.setup_logging(os.path.normpath(os.path.expanduser(args.logfile)))
     functions.patch_threading_excepthook()
+    startup.mark("logging")
 
-    app = KlipperScreenApplication(args)
+    app = KlipperScreenApplication(args, startup)
     app.run()
 
 
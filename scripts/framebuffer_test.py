@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Checks that FrameBuffer returns every frame byte for byte, however the stream is split
+
+Several multi-megabyte frames are joined with the delimiter and fed back in chunks of
+random sizes. Some cuts are placed on and inside the delimiters, so delimiters longer
+than one byte arrive split across two chunks. Exits with an error on the first mismatch.
+
+Examples:
+    scripts/framebuffer_test.py
+    scripts/framebuffer_test.py --rounds 50 --seed 7 --size 8
+"""
+
+import argparse
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DELIMITERS = (b"\x03", b"\r\n", b"\x03\x03\x03")
+
+
+def make_frame(rng, size):
+    # Any byte but the ones the delimiters are made of, and not only whitespace
+    body = rng.getrandbits(size * 8).to_bytes(size, "little")
+    return b"{" + body.translate(None, b"\x03\r\n") + b"}"
+
+
+def make_cuts(rng, stream, delimiter):
+    """Random chunk boundaries, with extra cuts at and around every delimiter"""
+    cuts = set()
+    position = 0
+    while position < len(stream):
+        # Mostly socket sized reads, sometimes a few bytes
+        position += rng.choice((rng.randint(1, 4), rng.randint(1, 256 * 1024)))
+        cuts.add(position)
+    end = stream.find(delimiter)
+    while end != -1:
+        for offset in range(len(delimiter) + 1):
+            if rng.random() < 0.5:
+                cuts.add(end + offset)
+        end = stream.find(delimiter, end + 1)
+    return sorted(cut for cut in cuts if 0 < cut < len(stream)) + [len(stream)]
+
+
+def check(frame_buffer, rng, delimiter, count, size):
+    frame_buffer.clear()
+    frames = [make_frame(rng, rng.randint(1, size)) for _ in range(count)]
+    stream = delimiter.join(frames) + delimiter
+    received = []
+    start = 0
+    for cut in make_cuts(rng, stream, delimiter):
+        received.extend(frame_buffer.feed(stream[start:cut]))
+        start = cut
+    if len(received) != len(frames):
+        sys.exit(f"Expected {len(frames)} frames, got {len(received)}")
+    for i, (frame, expected) in enumerate(zip(received, frames)):
+        if frame != expected:
+            sys.exit(f"Frame {i} differs, {len(frame)} bytes instead of {len(expected)}")
+    if frame_buffer.feed(b""):
+        sys.exit("Frames left in the buffer after the stream ended")
+    return len(stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10, help="streams per delimiter")
+    parser.add_argument("--frames", type=int, default=4, help="frames per stream")
+    parser.add_argument("--size", type=float, default=4, help="largest frame in MB")
+    parser.add_argument("--seed", type=int, default=None, help="to reproduce a failure")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from ks_includes.KlippyUDS import FrameBuffer
+
+    seed = random.randrange(2**32) if args.seed is None else args.seed
+    print(f"Seed {seed}")
+    rng = random.Random(seed)
+    size = int(args.size * 1024 * 1024)
+    for delimiter in DELIMITERS:
+        frame_buffer = FrameBuffer(delimiter)
+        total = sum(
+            check(frame_buffer, rng, delimiter, args.frames, size) for _ in range(args.rounds)
+        )
+        print(f"Delimiter {delimiter!r}: {args.rounds} streams, {total / 1e6:.0f} MB, OK")
+
+
+if __name__ == "__main__":
+    main()
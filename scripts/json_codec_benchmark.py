@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Decodes the frames of a recording with every JSON backend installed and times them
+
+The recording is made with `screen.py --record`, by default only the frames received
+from Moonraker are decoded, as those are the ones parsed on every update.
+
+Examples:
+    scripts/json_codec_benchmark.py ~/traffic.log.gz
+    scripts/json_codec_benchmark.py ~/traffic.log.gz --repeat 10 --bytes --sent
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKENDS = ("orjson", "ujson", "json")
+
+
+def get_backends():
+    backends = {}
+    for name in BACKENDS:
+        try:
+            backends[name] = importlib.import_module(name).loads
+        except ImportError:
+            print(f"{name} is not installed")
+    return backends
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log", help="recording made with screen.py --record")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the frames")
+    parser.add_argument("--sent", action="store_true", help="include the frames sent")
+    parser.add_argument(
+        "--bytes", action="store_true", help="decode bytes as read from the Unix socket"
+    )
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    from ks_includes import json_codec
+    from ks_includes.traffic_recorder import read_log
+
+    directions = ("<", ">") if args.sent else ("<",)
+    frames = [frame for _, direction, frame in read_log(args.log) if direction in directions]
+    if args.bytes:
+        frames = [frame.encode() for frame in frames]
+    if not frames:
+        sys.exit(f"No frames to decode in {args.log}")
+    size = sum(len(frame.encode() if isinstance(frame, str) else frame) for frame in frames)
+    print(f"{len(frames)} frames, {size / 1024:.0f} KB, json_codec uses {json_codec.backend}")
+
+    reference = [json.loads(frame) for frame in frames]
+    results = []
+    for name, loads in get_backends().items():
+        if [loads(frame) for frame in frames] != reference:
+            print(f"{name} decodes the frames differently")
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for frame in frames:
+                loads(frame)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results.append(
+            {"backend": name, "frame": best / len(frames), "throughput": size / best / 1e6}
+        )
+
+    print(f"{'backend':<8} {'per frame':>12} {'throughput':>12}")
+    for result in results:
+        print(
+            f"{result['backend']:<8} {result['frame'] * 1e6:>9.1f} us"
+            f" {result['throughput']:>7.1f} MB/s"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""Local stand-in for Moonraker to reproduce and benchmark KlipperScreen loads
+
+Serves the JSON-RPC API KlipperScreen uses over a websocket or a Unix socket, either from
+a synthetic printer with a chosen number of heaters, macros and files, or by replaying a
+log recorded with `screen.py --record`. Only the standard library is needed.
+
+Examples:
+    scripts/moonraker_standin.py --port 7125 --heaters 8 --macros 200 --files 5000 --rate 20
+    scripts/moonraker_standin.py --socket /tmp/moonraker.sock --replay traffic.log.gz
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ks_includes.traffic_recorder import read_log  # noqa: E402
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+METHOD_NOT_FOUND = -32601
+
+
+class SyntheticPrinter:
+    """A printer with n heaters, m macros and k files whose state changes `rate` times a second"""
+
+    def __init__(self, heaters=2, macros=10, files=100, rate=4.0, seed=0):
+        self.rate = rate
+        self.random = random.Random(seed)
+        self.heaters = ["extruder", "heater_bed"][:heaters]
+        self.heaters += [f"heater_generic heater_{i}" for i in range(2, heaters)]
+        now = time.time()
+        self.files = []
+        self.by_path = {}
+        for i in range(files):
+            path = f"folder_{i % 10}/model_{i}.gcode" if i % 3 else f"model_{i}.gcode"
+            self.files.append(
+                {
+                    "path": path,
+                    "modified": now - i * 3600,
+                    "size": 100000 + i * 977,
+                    "permissions": "rw",
+                }
+            )
+            self.by_path[path] = self.files[-1]
+        self.config = {
+            "printer": {"kinematics": "cartesian", "max_velocity": "300", "max_accel": "3000"},
+            "virtual_sdcard": {"path": "~/printer_data/gcodes"},
+            "fan": {"pin": "PA8"},
+            "stepper_x": {"position_min": "0", "position_max": "235", "position_endstop": "0"},
+            "stepper_y": {"position_min": "0", "position_max": "235", "position_endstop": "0"},
+            "stepper_z": {"position_min": "0", "position_max": "250", "position_endstop": "0"},
+        }
+        for heater in self.heaters:
+            self.config[heater] = {"min_temp": "0", "max_temp": "300"}
+        if "extruder" in self.config:
+            self.config["extruder"].update(
+                {
+                    "nozzle_diameter": "0.4",
+                    "filament_diameter": "1.75",
+                    "max_extrude_only_distance": "100",
+                }
+            )
+        for i in range(macros):
+            self.config[f"gcode_macro MACRO_{i}"] = {"gcode": ""}
+        self.status = {
+            "webhooks": {"state": "ready", "state_message": "Printer is ready"},
+            "configfile": {"config": self.config, "settings": {}, "warnings": []},
+            "print_stats": {
+                "state": "standby",
+                "filename": "",
+                "print_duration": 0,
+                "total_duration": 0,
+                "filament_used": 0,
+                "message": "",
+                "info": {},
+            },
+            "idle_timeout": {"state": "Idle"},
+            "pause_resume": {"is_paused": False},
+            "display_status": {"progress": 0, "message": None},
+            "virtual_sdcard": {"file_position": 0, "is_active": False, "progress": 0},
+            "fan": {"speed": 0},
+            "gcode_move": {
+                "extrude_factor": 1,
+                "speed_factor": 1,
+                "speed": 1500,
+                "gcode_position": [0, 0, 0, 0],
+                "homing_origin": [0, 0, 0, 0],
+            },
+            "toolhead": {
+                "homed_axes": "",
+                "estimated_print_time": 0,
+                "print_time": 0,
+                "position": [0, 0, 0, 0],
+                "extruder": "extruder",
+                "max_accel": 3000,
+                "minimum_cruise_ratio": 0.5,
+                "max_velocity": 300,
+                "square_corner_velocity": 5,
+            },
+            "motion_report": {
+                "live_position": [0, 0, 0, 0],
+                "live_velocity": 0,
+                "live_extruder_velocity": 0,
+            },
+        }
+        for i, heater in enumerate(self.heaters):
+            self.status[heater] = {"temperature": 25.0, "target": 200.0 - i, "power": 0}
+        for i in range(macros):
+            self.status[f"gcode_macro MACRO_{i}"] = {}
+        self.tick = 0
+
+    def step(self):
+        """Advances the state and returns what changed"""
+        self.tick += 1
+        changes = {}
+        for heater in self.heaters:
+            state = self.status[heater]
+            state["temperature"] = round(
+                state["target"] + self.random.uniform(-0.5, 0.5) - 20 * 0.9**self.tick, 2
+            )
+            state["power"] = round(self.random.random(), 3)
+            changes[heater] = {"temperature": state["temperature"], "power": state["power"]}
+        angle = self.tick / max(self.rate, 1)
+        position = [round(100 + 50 * math.cos(angle), 3), round(100 + 50 * math.sin(angle), 3)]
+        self.status["motion_report"]["live_position"][:2] = position
+        changes["motion_report"] = {"live_position": self.status["motion_report"]["live_position"]}
+        self.status["toolhead"]["estimated_print_time"] = self.tick / max(self.rate, 1)
+        changes["toolhead"] = {
+            "estimated_print_time": self.status["toolhead"]["estimated_print_time"]
+        }
+        return changes
+
+    def query(self, objects):
+        result = {}
+        for name, fields in (objects or {}).items():
+            if name not in self.status:
+                continue
+            state = self.status[name]
+            result[name] = (
+                dict(state) if fields is None else {f: state[f] for f in fields if f in state}
+            )
+        return result
+
+    def get_directory(self, path):
+        prefix = path.partition("/")[2]
+        prefix = f"{prefix}/" if prefix else ""
+        dirs = {}
+        files = []
+        for item in self.files:
+            if not item["path"].startswith(prefix):
+                continue
+            name, sep, _ = item["path"][len(prefix) :].partition("/")
+            if sep:
+                dirs[name] = {"dirname": name, "modified": item["modified"], "size": 4096}
+            else:
+                files.append({"filename": name, "modified": item["modified"], "size": item["size"]})
+        return {
+            "dirs": list(dirs.values()),
+            "files": files,
+            "disk_usage": {"total": 32 << 30, "used": 8 << 30, "free": 24 << 30},
+            "root_info": {"name": "gcodes", "permissions": "rw"},
+        }
+
+    def metadata(self, filename):
+        item = self.by_path[filename]
+        return {
+            "filename": filename,
+            "modified": item["modified"],
+            "size": item["size"],
+            "slicer": "PrusaSlicer",
+            "slicer_version": "2.8.0",
+            "estimated_time": 3600 + item["size"] % 36000,
+            "filament_type": "PLA",
+            "filament_total": 1234.5,
+            "layer_height": 0.2,
+            "object_height": 20.0,
+            "thumbnails": [],
+        }
+
+    def handle(self, method, params):
+        if method == "server.connection.identify":
+            return {"connection_id": 1}
+        if method == "server.info":
+            return {
+                "klippy_connected": True,
+                "klippy_state": "ready",
+                "components": ["file_manager", "data_store", "history"],
+                "failed_components": [],
+                "missing_klippy_requirements": [],
+                "warnings": [],
+                "websocket_count": 1,
+                "moonraker_version": "stand-in",
+            }
+        if method == "printer.info":
+            return {
+                "state": "ready",
+                "state_message": "Printer is ready",
+                "hostname": "stand-in",
+                "software_version": "stand-in",
+                "klipper_path": "",
+                "python_path": "",
+                "log_file": "",
+                "config_file": "",
+            }
+        if method == "printer.objects.list":
+            return {"objects": list(self.status)}
+        if method in ("printer.objects.query", "printer.objects.subscribe"):
+            return {"eventtime": time.monotonic(), "status": self.query(params.get("objects"))}
+        if method == "printer.gcode.help":
+            return {name[12:]: "" for name in self.config if name.startswith("gcode_macro ")}
+        if method == "printer.gcode.script":
+            return "ok"
+        if method == "machine.system_info":
+            return {"system_info": {"cpu_info": {"cpu_count": 4}, "distribution": {}}}
+        if method == "server.config":
+            return {"config": {"data_store": {"temperature_store_size": 1200}}}
+        if method == "server.temperature_store":
+            return {
+                heater: {"temperatures": [25.0] * 1200, "targets": [0.0] * 1200}
+                for heater in self.heaters
+            }
+        if method == "server.gcode_store":
+            return {"gcode_store": []}
+        if method == "server.files.roots":
+            return [{"name": "gcodes", "path": "", "permissions": "rw"}]
+        if method == "server.files.list":
+            return self.files
+        if method == "server.files.get_directory":
+            return self.get_directory(params.get("path", "gcodes"))
+        if method == "server.files.metadata":
+            return self.metadata(params["filename"])
+        if method == "server.history.get_job":
+            return {"job": {}}
+        raise LookupError(method)
+
+    def proc_stats(self):
+        return {
+            "moonraker_stats": {"time": time.time(), "cpu_usage": 1.0, "memory": 30000},
+            "cpu_temp": 45.0,
+            "network": {},
+            "system_cpu_usage": {"cpu": 10.0},
+            "system_memory": {"total": 1 << 20, "available": 1 << 19, "used": 1 << 19},
+            "websocket_connections": 1,
+        }
+
+
+class Replay:
+    """Answers requests with the replies of a recording and sends its notifications again
+
+    Requests are matched by method and parameters, or by method alone when the parameters
+    differ. Notifications start once the client subscribes, with their recorded spacing.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.speed = speed
+        self.replies = {}
+        self.notifications = []
+        requests = {}
+        subscribed = None
+        for stamp, direction, frame in read_log(path):
+            message = json.loads(frame)
+            if direction == ">":
+                if "id" in message:
+                    requests[message["id"]] = message
+            elif message.get("id") in requests:
+                request = requests.pop(message["id"])
+                for key in (self._key(request), request["method"]):
+                    self.replies.setdefault(key, deque()).append(message)
+                if request["method"] == "printer.objects.subscribe" and subscribed is None:
+                    subscribed = stamp
+            elif "method" in message and subscribed is not None:
+                self.notifications.append((stamp - subscribed, message))
+        logging.info(
+            f"Loaded {len(self.notifications)} notifications and replies to "
+            f"{sum(1 for key in self.replies if isinstance(key, str))} methods from {path}"
+        )
+
+    @staticmethod
+    def _key(request):
+        return request["method"], json.dumps(request.get("params", {}), sort_keys=True)
+
+    def reply(self, request):
+        for key in (self._key(request), request["method"]):
+            replies = self.replies.get(key)
+            if replies:
+                # The last reply is kept for requests sent more often than in the recording
+                return replies.popleft() if len(replies) > 1 else replies[0]
+        return None
+
+
+class Connection:
+    def __init__(self, server, writer):
+        self.server = server
+        self.writer = writer
+        self.subscription = {}
+        self.tasks = []
+
+    def send(self, message):
+        raise NotImplementedError
+
+    async def handle(self, frame):
+        request = json.loads(frame)
+        method = request.get("method")
+        params = request.get("params") or {}
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        if method == "printer.objects.subscribe":
+            self.subscription = params.get("objects") or {}
+            if not self.tasks:
+                self.tasks.append(asyncio.ensure_future(self.server.stream(self)))
+        recorded = self.server.replay.reply(request) if self.server.replay else None
+        if recorded is not None:
+            reply.update({k: v for k, v in recorded.items() if k in ("result", "error")})
+        else:
+            try:
+                reply["result"] = self.server.printer.handle(method, params)
+            except LookupError as e:
+                code = METHOD_NOT_FOUND if e.args == (method,) else 404
+                reply["error"] = {"code": code, "message": f"Not found: {e}"}
+        self.server.requests += 1
+        self.send(reply)
+
+    def notify(self, method, params):
+        self.send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+
+
+class UnixConnection(Connection):
+    def send(self, message):
+        self.writer.write(json.dumps(message).encode() + b"\x03")
+
+    async def run(self, reader):
+        buffer = b""
+        while data := await reader.read(65536):
+            buffer += data
+            *frames, buffer = buffer.split(b"\x03")
+            for frame in frames:
+                if frame.strip():
+                    await self.handle(frame)
+
+
+class WebsocketConnection(Connection):
+    def send(self, message):
+        payload = json.dumps(message).encode()
+        size = len(payload)
+        if size < 126:
+            header = bytes((0x81, size))
+        elif size < 1 << 16:
+            header = bytes((0x81, 126)) + size.to_bytes(2, "big")
+        else:
+            header = bytes((0x81, 127)) + size.to_bytes(8, "big")
+        self.writer.write(header + payload)
+
+    async def run(self, reader):
+        fragments = []
+        while True:
+            head = await reader.readexactly(2)
+            opcode = head[0] & 0x0F
+            size = head[1] & 0x7F
+            if size == 126:
+                size = int.from_bytes(await reader.readexactly(2), "big")
+            elif size == 127:
+                size = int.from_bytes(await reader.readexactly(8), "big")
+            mask = await reader.readexactly(4) if head[1] & 0x80 else b"\0\0\0\0"
+            data = await reader.readexactly(size)
+            key = int.from_bytes((mask * (size // 4 + 1))[:size], "big")
+            data = (int.from_bytes(data, "big") ^ key).to_bytes(size, "big")
+            if opcode == 0x8:
+                self.writer.write(bytes((0x88, 0)))
+                return
+            if opcode == 0x9:
+                self.writer.write(bytes((0x8A, len(data))) + data)
+                continue
+            if opcode in (0x0, 0x1, 0x2):
+                fragments.append(data)
+                if head[0] & 0x80:
+                    await self.handle(b"".join(fragments))
+                    fragments.clear()
+
+
+class StandinServer:
+    def __init__(self, printer, replay=None, proc_stats=True):
+        self.printer = printer
+        self.replay = replay
+        self.proc_stats = proc_stats
+        self.requests = 0
+        self.notifications = 0
+
+    async def stream(self, connection):
+        if self.replay is not None:
+            start = time.monotonic()
+            for offset, message in self.replay.notifications:
+                delay = start + offset / self.replay.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                connection.send(message)
+                self.notifications += 1
+            logging.info("Replay finished")
+            return
+        interval = 1 / self.printer.rate if self.printer.rate > 0 else None
+        next_stats = time.monotonic()
+        while True:
+            if interval is not None:
+                changes = self.printer.step()
+                status = {
+                    name: {
+                        field: value
+                        for field, value in fields.items()
+                        if connection.subscription[name] is None
+                        or field in connection.subscription[name]
+                    }
+                    for name, fields in changes.items()
+                    if name in connection.subscription
+                }
+                status = {name: fields for name, fields in status.items() if fields}
+                if status:
+                    connection.notify("notify_status_update", [status, time.monotonic()])
+                    self.notifications += 1
+            if self.proc_stats and time.monotonic() >= next_stats:
+                connection.notify("notify_proc_stat_update", [self.printer.proc_stats()])
+                next_stats += 1
+            await asyncio.sleep(interval or 1)
+
+    async def serve_unix(self, reader, writer):
+        await self._serve(UnixConnection(self, writer), reader, writer)
+
+    async def serve_http(self, reader, writer):
+        request = await reader.readuntil(b"\r\n\r\n")
+        lines = request.decode("latin1").split("\r\n")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("upgrade", "").lower() != "websocket":
+            # Thumbnails and other REST calls are not served
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+            writer.close()
+            return
+        accept = base64.b64encode(
+            hashlib.sha1((headers["sec-websocket-key"] + WS_GUID).encode()).digest()
+        ).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        await self._serve(WebsocketConnection(self, writer), reader, writer)
+
+    async def _serve(self, connection, reader, writer):
+        logging.info("Client connected")
+        try:
+            await connection.run(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            connection.close()
+            writer.close()
+            logging.info(
+                f"Client disconnected after {self.requests} requests, "
+                f"{self.notifications} notifications"
+            )
+
+
+async def serve(args):
+    printer = SyntheticPrinter(args.heaters, args.macros, args.files, args.rate, args.seed)
+    replay = Replay(args.replay, args.speed) if args.replay else None
+    server = StandinServer(printer, replay)
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        listener = await asyncio.start_unix_server(server.serve_unix, args.socket)
+        logging.info(f"Listening on {args.socket}")
+    else:
+        listener = await asyncio.start_server(server.serve_http, args.host, args.port)
+        logging.info(f"Listening on ws://{args.host}:{args.port}/websocket")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7125)
+    parser.add_argument("--socket", help="serve on this Unix socket instead of a websocket")
+    parser.add_argument("--heaters", type=int, default=2)
+    parser.add_argument("--macros", type=int, default=10)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=4, help="status updates per second")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", metavar="<log>", help="recording made with --record")
+    parser.add_argument("--speed", type=float, default=1, help="replay speed factor")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
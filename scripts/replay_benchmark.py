@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Runs KlipperScreen against the Moonraker stand-in under Xvfb and reports its load
+
+For every scenario the stand-in is started with a synthetic printer (or a recording), and
+KlipperScreen runs with a probe on its main loop. After the warmup the probe measures how
+late a 10 ms timer fires, the CPU time used and the memory in use for the given duration.
+
+Examples:
+    scripts/replay_benchmark.py
+    scripts/replay_benchmark.py --scenario files --scenario busy --duration 60 --json out.json
+    scripts/replay_benchmark.py --replay traffic.log.gz --transport uds
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STANDIN = os.path.join(ROOT, "scripts", "moonraker_standin.py")
+PROBE_INTERVAL = 10  # ms
+STALL = 0.1  # s
+
+SCENARIOS = {
+    "idle": ["--heaters", "2", "--macros", "10", "--files", "100", "--rate", "4"],
+    "heaters": ["--heaters", "12", "--macros", "10", "--files", "100", "--rate", "20"],
+    "macros": ["--heaters", "2", "--macros", "500", "--files", "100", "--rate", "4"],
+    "files": ["--heaters", "2", "--macros", "10", "--files", "5000", "--rate", "4"],
+    "busy": ["--heaters", "8", "--macros", "200", "--files", "2000", "--rate", "30"],
+}
+
+
+def run_client(stats_path, argv):
+    """Runs KlipperScreen in this process with the main loop probe installed"""
+    sys.path.insert(0, ROOT)
+    sys.argv = [os.path.join(ROOT, "screen.py"), *argv]
+    import gi
+
+    gi.require_version("GLib", "2.0")
+    from gi.repository import GLib
+
+    probe = {"samples": [], "last": time.monotonic(), "start": time.monotonic(), "usage": None}
+
+    def tick():
+        now = time.monotonic()
+        probe["samples"].append(now - probe["last"] - PROBE_INTERVAL / 1000)
+        probe["last"] = now
+        return True
+
+    def start():
+        probe["samples"].clear()
+        probe["start"] = time.monotonic()
+        probe["usage"] = resource.getrusage(resource.RUSAGE_SELF)
+        return True
+
+    def stop():
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        base = probe["usage"] or usage
+        with open("/proc/self/status") as f:
+            rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        with open(stats_path, "w") as f:
+            json.dump(
+                {
+                    "elapsed": time.monotonic() - probe["start"],
+                    "samples": probe["samples"],
+                    "cpu": usage.ru_utime + usage.ru_stime - base.ru_utime - base.ru_stime,
+                    "rss": rss * 1024,
+                    "max_rss": usage.ru_maxrss * 1024,
+                },
+                f,
+            )
+        os._exit(0)
+
+    GLib.timeout_add(PROBE_INTERVAL, tick)
+    GLib.unix_signal_add(GLib.PRIORITY_HIGH, signal.SIGUSR1, start)
+    GLib.unix_signal_add(GLib.PRIORITY_HIGH, signal.SIGTERM, stop)
+    import screen
+
+    screen.main()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    return sorted(values)[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run_scenario(name, standin_args, args, workdir, env):
+    if args.transport == "uds":
+        host = os.path.join(workdir, f"{name}.sock")
+        port = 7125
+        listen = ["--socket", host]
+    else:
+        host = "127.0.0.1"
+        port = free_port()
+        listen = ["--host", host, "--port", str(port)]
+    config = os.path.join(workdir, f"{name}.conf")
+    with open(config, "w") as f:
+        f.write(
+            "[main]\nuse_dpms: False\nscreen_blanking: off\n"
+            f"width: {args.width}\nheight: {args.height}\n\n"
+            f"[printer {name}]\nmoonraker_host: {host}\nmoonraker_port: {port}\n"
+        )
+    stats = os.path.join(workdir, f"{name}.json")
+    with open(os.path.join(workdir, f"{name}-standin.log"), "w") as log:
+        standin = subprocess.Popen(
+            [sys.executable, STANDIN, *listen, *standin_args],
+            stdout=subprocess.DEVNULL,
+            stderr=log,
+        )
+    client = None
+    try:
+        time.sleep(1)
+        client = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--client",
+                stats,
+                "--",
+                "-c",
+                config,
+                "-l",
+                os.path.join(workdir, f"{name}.log"),
+            ],
+            cwd=ROOT,
+            env=env,
+        )
+        time.sleep(args.warmup)
+        client.send_signal(signal.SIGUSR1)
+        time.sleep(args.duration)
+        client.send_signal(signal.SIGTERM)
+        client.wait(timeout=30)
+    finally:
+        for process in (client, standin):
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+    with open(stats) as f:
+        result = json.load(f)
+    samples = result.pop("samples")
+    result.update(
+        {
+            "scenario": name,
+            "ticks": len(samples),
+            "p50": percentile(samples, 0.5),
+            "p95": percentile(samples, 0.95),
+            "p99": percentile(samples, 0.99),
+            "max": max(samples, default=0),
+            "stalls": sum(1 for sample in samples if sample > STALL),
+        }
+    )
+    return result
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--client":
+        run_client(sys.argv[2], sys.argv[4:])
+        return
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario", action="append", choices=list(SCENARIOS), help="default: all of them"
+    )
+    parser.add_argument("--replay", metavar="<log>", help="also run a recording made with --record")
+    parser.add_argument("--speed", default="1", help="replay speed factor")
+    parser.add_argument("--transport", choices=("ws", "uds"), default="ws")
+    parser.add_argument("--warmup", type=float, default=15, help="seconds before measuring")
+    parser.add_argument("--duration", type=float, default=30, help="seconds measured")
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--no-xvfb", action="store_true", help="use the current DISPLAY")
+    parser.add_argument("--json", metavar="<file>", help="write the results to a file")
+    args = parser.parse_args()
+
+    scenarios = {name: SCENARIOS[name] for name in args.scenario or SCENARIOS}
+    if args.replay:
+        replay = os.path.abspath(args.replay)
+        scenarios["replay"] = ["--replay", replay, "--speed", args.speed]
+
+    env = dict(os.environ)
+    xvfb = None
+    if not args.no_xvfb:
+        if shutil.which("Xvfb") is None:
+            sys.exit("Xvfb not found, install it or use --no-xvfb")
+        display = f":{100 + os.getpid() % 100}"
+        xvfb = subprocess.Popen(
+            ["Xvfb", display, "-screen", "0", f"{args.width}x{args.height}x24", "-nolisten", "tcp"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        env["DISPLAY"] = display
+        time.sleep(1)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="ks-benchmark-") as workdir:
+            for name, standin_args in scenarios.items():
+                print(f"Running {name}...", file=sys.stderr)
+                results.append(run_scenario(name, standin_args, args, workdir, env))
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+    print(
+        f"{'scenario':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+        f"{'stalls':>7} {'cpu s':>7} {'cpu %':>6} {'rss MiB':>8} {'peak MiB':>9}"
+    )
+    for r in results:
+        print(
+            f"{r['scenario']:<10} {r['p50'] * 1000:8.2f} {r['p95'] * 1000:8.2f} "
+            f"{r['p99'] * 1000:8.2f} {r['max'] * 1000:8.1f} {r['stalls']:7d} "
+            f"{r['cpu']:7.2f} {r['cpu'] / r['elapsed'] * 100:6.1f} "
+            f"{r['rss'] / 2**20:8.1f} {r['max_rss'] / 2**20:9.1f}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Compares the temperature ring buffers with the list based store they replaced
+
+For every history size the store is filled with the given number of devices, and the
+1 s update is timed. Each case runs in its own process so the memory reported is
+the resident memory added by that store alone.
+
+Examples:
+    scripts/temperature_store_benchmark.py
+    scripts/temperature_store_benchmark.py --devices 12 --ticks 2000 --size 1200 --size 7200
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECTIONS = ("temperatures", "targets", "powers")
+
+
+class ListStore:
+    """The previous store, a list per series with pop(0) and append on every update"""
+
+    def __init__(self, size):
+        self.size = size
+        self.tempstore = {}
+
+    def load(self, device, section, values):
+        values = list(values[-self.size :])
+        self.tempstore.setdefault(device, {})[section] = [0] * (self.size - len(values)) + values
+
+    def tick(self, sample):
+        for device in self.tempstore:
+            for x in self.tempstore[device]:
+                self.tempstore[device][x].pop(0)
+                temp = sample(device, x)
+                if not temp:
+                    temp = 0
+                self.tempstore[device][x].append(temp)
+
+
+def get_rss():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def make_store(name, size):
+    if name == "list":
+        return ListStore(size)
+    from ks_includes.temperature_store import TemperatureStore
+
+    return TemperatureStore(size)
+
+
+def run_case(name, size, devices, ticks):
+    """Runs one case in this process and returns its results"""
+    sys.path.insert(0, ROOT)
+    rng = random.Random(size)
+    samples = [round(rng.uniform(20, 250), 2) for _ in range(997)]
+    make_store(name, 1)
+    rss = get_rss()
+    store = make_store(name, size)
+    for i in range(devices):
+        for section in SECTIONS:
+            # Moonraker sends a new float for every sample, the list store keeps them all
+            history = [round(rng.uniform(20, 250), 2) for _ in range(size)]
+            store.load(f"extruder{i}", section, history)
+    del history
+    rss = get_rss() - rss
+
+    position = [0]
+
+    def sample(device, section):
+        position[0] = (position[0] + 1) % len(samples)
+        return samples[position[0]]
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        store.tick(sample)
+    elapsed = time.perf_counter() - start
+    return {"store": name, "size": size, "tick": elapsed / ticks, "rss": rss}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=6, help="devices with 3 series each")
+    parser.add_argument("--ticks", type=int, default=1000, help="updates timed per case")
+    parser.add_argument(
+        "--size", type=int, action="append", help="history size, 1200 3600 7200 by default"
+    )
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--case", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        name, size = args.case
+        print(json.dumps(run_case(name, int(size), args.devices, args.ticks)))
+        return
+
+    results = []
+    for size in args.size or (1200, 3600, 7200):
+        for name in ("list", "ring"):
+            cmd = [sys.executable, os.path.abspath(__file__), "--case", name, str(size)]
+            cmd += ["--devices", str(args.devices), "--ticks", str(args.ticks)]
+            output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output))
+
+    print(f"{args.devices} devices, {args.devices * len(SECTIONS)} series")
+    print(f"{'store':<6} {'size':>6} {'update':>12} {'rss':>10}")
+    for result in results:
+        print(
+            f"{result['store']:<6} {result['size']:>6} {result['tick'] * 1e6:>9.1f} us"
+            f" {result['rss'] / 1024:>7.0f} KB"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()